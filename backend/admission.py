@@ -0,0 +1,209 @@
+"""
+BugYou Admission Control
+Token buckets per user and per client IP, and a server-wide cap on executions in flight
+
+/api/execute and /api/validate ask the controller before doing any work. A
+request is admitted when its user's bucket and its IP's bucket each hold a
+token and fewer than max_in_flight admitted requests are running across all
+worker processes; otherwise it is refused with AdmissionRejected, which the
+endpoints turn into 429 with Retry-After. Buckets refill at `rate` tokens per
+second up to `burst`, so normal clicking never notices the limit while an
+auto-clicker is held to the refill rate instead of filling the executor queue.
+
+State lives in an anonymous shared mapping created with the controller (by
+create_app() in the preloading master), so the worker processes forked from it
+share one set of buckets and one in-flight count (each worker counts its own requests in a slot; slots of
+workers that died are reclaimed). Buckets are spread over BUCKET_SLOTS slots by
+a hash of the key; a key that lands on a slot held by another starts with a
+full bucket. The table is guarded by a process-shared lock held for a few
+microseconds; if it cannot be taken within LOCK_TIMEOUT the request is
+admitted unchecked rather than stalled.
+"""
+
+import os
+import math
+import mmap
+import time
+import struct
+import hashlib
+import threading
+import multiprocessing
+from contextlib import contextmanager
+
+from metrics import counter, gauge
+
+ADMISSION_REJECTIONS = counter(
+    'bugyou_admission_rejections_total',
+    'Execution requests refused by admission control, by endpoint and reason (user, ip, capacity)',
+    ('endpoint', 'reason')
+)
+ADMISSION_UNCHECKED = counter(
+    'bugyou_admission_unchecked_total',
+    'Execution requests admitted without a check because the admission table was busy',
+    ('endpoint',)
+)
+ADMITTED_IN_FLIGHT = gauge(
+    'bugyou_admission_in_flight',
+    'Admitted execution requests currently running'
+)
+
+BUCKET_SLOTS = 16384
+WORKER_SLOTS = 256
+LOCK_TIMEOUT = 0.05
+_WORKER = struct.Struct('<qq')   # pid, requests in flight
+_BUCKET = struct.Struct('<Qdd')  # key hash, tokens, last refill (monotonic)
+
+
+class AdmissionRejected(Exception):
+    """Too many requests from this user or address, or the server is at capacity"""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _process_shared_lock():
+    try:
+        return multiprocessing.Lock()
+    except (OSError, ImportError):
+        # No POSIX semaphores (some sandboxes): limits then hold per process only
+        return threading.Lock()
+
+
+class AdmissionController:
+    def __init__(self, user_rate=0.5, user_burst=10, ip_rate=5.0, ip_burst=60, max_in_flight=64,
+                 bucket_slots=BUCKET_SLOTS, worker_slots=WORKER_SLOTS):
+        # Rates are tokens per second; 0 turns that limit off
+        self.user_rate, self.user_burst = user_rate, user_burst
+        self.ip_rate, self.ip_burst = ip_rate, ip_burst
+        self.max_in_flight = max_in_flight
+        self.bucket_slots = bucket_slots
+        self.worker_slots = worker_slots
+        self._buckets_offset = worker_slots * _WORKER.size
+        self._table = mmap.mmap(-1, self._buckets_offset + bucket_slots * _BUCKET.size)
+        self._lock = _process_shared_lock()
+        self._slot_pid = None
+        self._slot = None
+        self._unreleased = 0  # releases that could not take the lock; applied on the next one
+
+    def configure(self, user_rate=None, user_burst=None, ip_rate=None, ip_burst=None, max_in_flight=None):
+        if user_rate is not None:
+            self.user_rate = float(user_rate)
+        if user_burst is not None:
+            self.user_burst = max(1, int(user_burst))
+        if ip_rate is not None:
+            self.ip_rate = float(ip_rate)
+        if ip_burst is not None:
+            self.ip_burst = max(1, int(ip_burst))
+        if max_in_flight is not None:
+            self.max_in_flight = int(max_in_flight)
+
+    @contextmanager
+    def admit(self, endpoint, user=None, ip=None):
+        """Hold an execution slot for the body of the with block; raises AdmissionRejected"""
+        if not self._lock.acquire(timeout=LOCK_TIMEOUT):
+            ADMISSION_UNCHECKED.inc(endpoint=endpoint)
+            yield
+            return
+        try:
+            self._check_and_take(endpoint, user, ip)
+        finally:
+            self._lock.release()
+        ADMITTED_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            ADMITTED_IN_FLIGHT.dec()
+            self._release()
+
+    # ────────────── Under the lock ──────────────
+    def _check_and_take(self, endpoint, user, ip):
+        slot = self._worker_slot()
+        if self.max_in_flight > 0 and self._in_flight_total() >= self.max_in_flight:
+            ADMISSION_REJECTIONS.inc(endpoint=endpoint, reason='capacity')
+            raise AdmissionRejected('The code runner is at capacity, please try again shortly', 'capacity', 1)
+        now = time.monotonic()
+        buckets = []
+        for reason, key, rate, burst in (('user', user, self.user_rate, self.user_burst),
+                                         ('ip', ip, self.ip_rate, self.ip_burst)):
+            if not key or rate <= 0:
+                continue
+            offset, key_hash, tokens = self._bucket(f'{reason}:{key}', rate, burst, now)
+            if tokens < 1:
+                ADMISSION_REJECTIONS.inc(endpoint=endpoint, reason=reason)
+                raise AdmissionRejected(
+                    'Too many runs in a short time, please wait a moment' if reason == 'user'
+                    else 'Too many runs from this network, please wait a moment',
+                    reason, max(1, math.ceil((1 - tokens) / rate)))
+            buckets.append((offset, key_hash, tokens))
+        for offset, key_hash, tokens in buckets:
+            _BUCKET.pack_into(self._table, offset, key_hash, tokens - 1, now)
+        pid, count = _WORKER.unpack_from(self._table, slot)
+        _WORKER.pack_into(self._table, slot, pid, max(0, count - self._unreleased) + 1)
+        self._unreleased = 0
+
+    def _bucket(self, key, rate, burst, now):
+        """(offset, key hash, tokens after refill) of key's bucket"""
+        key_hash = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') | 1
+        offset = self._buckets_offset + (key_hash % self.bucket_slots) * _BUCKET.size
+        stored_hash, tokens, refilled_at = _BUCKET.unpack_from(self._table, offset)
+        if stored_hash != key_hash:
+            return offset, key_hash, float(burst)
+        return offset, key_hash, min(float(burst), tokens + (now - refilled_at) * rate)
+
+    def _worker_slot(self):
+        """Offset of this process's in-flight counter, claiming a free or dead worker's slot"""
+        pid = os.getpid()
+        if self._slot_pid == pid:
+            return self._slot
+        self._unreleased = 0  # inherited from the parent; not ours
+        fallback = None
+        for index in range(self.worker_slots):
+            offset = index * _WORKER.size
+            owner, _ = _WORKER.unpack_from(self._table, offset)
+            if owner == pid:
+                fallback = offset  # a dead worker with the same pid: its count is stale too
+                break
+            if fallback is None and (owner == 0 or not _alive(owner)):
+                fallback = offset
+        if fallback is None:
+            fallback = (pid % self.worker_slots) * _WORKER.size  # more workers than slots: share one
+        else:
+            _WORKER.pack_into(self._table, fallback, pid, 0)
+        self._slot_pid, self._slot = pid, fallback
+        return fallback
+
+    def _in_flight_total(self):
+        counts = [_WORKER.unpack_from(self._table, i * _WORKER.size) for i in range(self.worker_slots)]
+        total = sum(count for pid, count in counts if pid)
+        if total < self.max_in_flight:
+            return total
+        # At the cap: make sure it isn't held by workers that were killed mid-request
+        for index, (pid, count) in enumerate(counts):
+            if pid and count and pid != os.getpid() and not _alive(pid):
+                _WORKER.pack_into(self._table, index * _WORKER.size, 0, 0)
+                total -= count
+        return total
+
+    def _release(self):
+        if not self._lock.acquire(timeout=LOCK_TIMEOUT * 20):
+            self._unreleased += 1
+            return
+        try:
+            slot = self._worker_slot()
+            pid, count = _WORKER.unpack_from(self._table, slot)
+            _WORKER.pack_into(self._table, slot, pid, max(0, count - 1 - self._unreleased))
+            self._unreleased = 0
+        finally:
+            self._lock.release()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
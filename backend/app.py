@@ -3,15 +3,20 @@ BugYou Flask Backend API
 Integrates database with frontend for complete debugging challenge platform
 """
 
-from flask import Flask, request, jsonify, send_from_directory, redirect
+import time
+_module_load_started = time.perf_counter()
+
+from flask import Flask, Blueprint, Response, current_app, g, request, jsonify, send_from_directory, redirect, stream_with_context
 from flask_cors import CORS
-import requests
+from werkzeug.middleware.proxy_fix import ProxyFix
 from datetime import datetime
 import os
 import re
-import time
+import threading
 import json
 from functools import wraps
+from contextlib import contextmanager
+import copy
 import hashlib
 from string import Template
 # from concurrent.futures import ThreadPoolExecutor  # Removed - using sequential execution to avoid rate limiting
@@ -40,18 +45,103 @@ from database_config import (
     get_user_leaderboard_position,
     update_leaderboard_entry,
     update_leaderboard_ranks,
-    clear_user_cache
+    clear_user_cache,
+    remember_user,
+    get_user_identity,
+    user_stats_cache,
+    save_canonical_verdicts,
+    build_catalog_snapshot
 )
 
-# --- Additions from app.py for backend optimizations ---
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from metrics import histogram, counter, gauge, record_cache, render_prometheus
+from tracing import configure_tracing, set_request_id, current_request_id, start_trace, finish_trace, span, record_span, traced
+from result_frames import new_frame_marker, harness_prelude, parse_frames, grade_frames
+from test_schema import attach_literals, collect_literals, input_key
+from precheck import configure_precheck, precheck, format_syntax_error
+from result_ledger import ResultLedger, code_hash
+from speculation import SpeculativeRunner
+from password_hashing import PasswordHasher, HashingBusy
+from admission import AdmissionController, AdmissionRejected
+from executor_client import ExecutorClient, ExecutorUnavailable
+from catalog_snapshot import configure_catalog_snapshot, current_snapshot, snapshot_path
+from canonical_verdicts import CanonicalVerdicts, CANONICAL_SOURCES
+from code_fingerprint import fingerprint, code_without_comments
+from single_flight import SingleFlight
+from challenge_bulk import (
+    FORMATS as CHALLENGE_FILE_FORMATS, ChallengeValidationError, validate_challenge, detect_format,
+    import_challenges, export_challenges
+)
+from reference_check import (
+    REFERENCE_CHECKS, ReferenceCheckError, ReferenceRunError, configure_reference_check,
+    run_reference, reconcile, baselines, program_time_limit_ms
+)
+from static_manifest import (
+    StaticManifest,
+    choose_encoding,
+    IMMUTABLE_CACHE_CONTROL,
+    REVALIDATE_CACHE_CONTROL
+)
 
-# Filename sanitization utility
-# Initialize Flask app with multiple static folders
-app = Flask(__name__)
-app.static_folder = '../frontend/main_page'  # Primary static folder
-CORS(app, resources={r"/api/*": {"origins": "*"}})  # Enable CORS for API endpoints
+# All routes live on this blueprint; create_app() builds the Flask app around it
+bp = Blueprint('bugyou', __name__)
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Defaults for create_app(config); override any of them per app
+DEFAULT_CONFIG = {
+    'SECRET_KEY': os.environ.get('BUGYOU_SECRET_KEY', 'thisisasecretkey'),
+    # bcrypt work factor: each hash or check costs 2^BCRYPT_LOG_ROUNDS rounds
+    'BCRYPT_LOG_ROUNDS': int(os.environ.get('BUGYOU_BCRYPT_LOG_ROUNDS', 12)),
+    # Hashing threads per worker process, and how many logins may wait for them (see password_hashing.py);
+    # waiting logins never hold more than REQUEST_THREADS - 1 of a worker's request threads
+    'PASSWORD_HASH_WORKERS': int(os.environ.get('BUGYOU_PASSWORD_HASH_WORKERS', 2)),
+    'PASSWORD_HASH_QUEUE': int(os.environ.get('BUGYOU_PASSWORD_HASH_QUEUE', 1)),
+    'PASSWORD_HASH_MAX_WAIT': float(os.environ.get('BUGYOU_PASSWORD_HASH_MAX_WAIT', 1)),
+    'REQUEST_THREADS': int(os.environ.get('BUGYOU_THREADS', 4)),  # start_server.py --threads
+    # Build the static manifest while creating the app instead of on the first static request
+    'PRELOAD_STATIC': False,
+    # Per-request tracing of /api/* calls (see tracing.py); exported only when a file or collector is set
+    'TRACE_SAMPLE_RATE': float(os.environ.get('BUGYOU_TRACE_SAMPLE_RATE', 0)),
+    'TRACE_SLOW_MS': float(os.environ.get('BUGYOU_TRACE_SLOW_MS', 0)),
+    'TRACE_FILE': os.environ.get('BUGYOU_TRACE_FILE'),
+    'TRACE_COLLECTOR_URL': os.environ.get('BUGYOU_TRACE_COLLECTOR_URL'),
+    # Local syntax check before dispatching to Piston (see precheck.py); empty to turn it off
+    'PRECHECK_LANGUAGES': os.environ.get('BUGYOU_PRECHECK_LANGUAGES', 'python,javascript'),
+    'PRECHECK_TIMEOUT': float(os.environ.get('BUGYOU_PRECHECK_TIMEOUT', 5)),
+    # Opt-in: after a Run passes every visible test, run the hidden ones in the background (see speculation.py)
+    'SPECULATIVE_HIDDEN_TESTS': os.environ.get('BUGYOU_SPECULATIVE_HIDDEN_TESTS', '').lower() in ('1', 'true', 'yes'),
+    # ...but only while fewer executor requests than this are in flight in the worker
+    'SPECULATIVE_BUSY_THRESHOLD': int(os.environ.get('BUGYOU_SPECULATIVE_BUSY_THRESHOLD', 4)),
+    # Run the reference solution against every test of an added challenge (see reference_check.py)
+    'REFERENCE_CHECK': os.environ.get('BUGYOU_REFERENCE_CHECK', '1').lower() in ('1', 'true', 'yes'),
+    'REFERENCE_CHECK_PARALLELISM': int(os.environ.get('BUGYOU_REFERENCE_CHECK_PARALLELISM', 4)),
+    # Upper bound for run time limits derived from reference baselines (Piston's run_timeout limit)
+    'EXECUTION_TIME_LIMIT_MS': int(os.environ.get('BUGYOU_EXECUTION_TIME_LIMIT_MS', 3000)),
+    # Memory-mapped catalog file to serve challenges from (see catalog_snapshot.py)
+    'CATALOG_SNAPSHOT': os.environ.get('BUGYOU_CATALOG_SNAPSHOT'),
+    # Admission control for /api/execute and /api/validate (see admission.py); 0 turns a limit off.
+    # Runs per minute and burst per user and per client IP, and executions in flight server-wide
+    'ADMISSION_USER_PER_MINUTE': float(os.environ.get('BUGYOU_ADMISSION_USER_PER_MINUTE', 30)),
+    'ADMISSION_USER_BURST': int(os.environ.get('BUGYOU_ADMISSION_USER_BURST', 10)),
+    'ADMISSION_IP_PER_MINUTE': float(os.environ.get('BUGYOU_ADMISSION_IP_PER_MINUTE', 300)),
+    'ADMISSION_IP_BURST': int(os.environ.get('BUGYOU_ADMISSION_IP_BURST', 60)),
+    'ADMISSION_MAX_IN_FLIGHT': int(os.environ.get('BUGYOU_ADMISSION_MAX_IN_FLIGHT', 64)),
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted for the client IP
+    # (0: the client IP is the connection's address)
+    'TRUSTED_PROXIES': int(os.environ.get('BUGYOU_TRUSTED_PROXIES', 0)),
+    # Code executors; point BUGYOU_PISTON_API at one or more (comma-separated) self-hosted Pistons
+    # (or the benchmark stand-in). Calls are routed between them by load and health
+    'EXECUTOR_BACKENDS': [url.strip().rstrip('/') for url in
+                          os.environ.get('BUGYOU_PISTON_API', 'https://emkc.org/api/v2/piston').split(',') if url.strip()],
+    # Executor client (see executor_client.py): calls in flight per worker, retries of 429/5xx,
+    # and failures in a row that stop calls for EXECUTOR_BREAKER_RESET seconds
+    'EXECUTOR_MAX_CONCURRENCY': int(os.environ.get('BUGYOU_EXECUTOR_MAX_CONCURRENCY', 8)),
+    'EXECUTOR_RETRIES': int(os.environ.get('BUGYOU_EXECUTOR_RETRIES', 2)),
+    'EXECUTOR_BREAKER_THRESHOLD': int(os.environ.get('BUGYOU_EXECUTOR_BREAKER_THRESHOLD', 5)),
+    'EXECUTOR_BREAKER_RESET': float(os.environ.get('BUGYOU_EXECUTOR_BREAKER_RESET', 15)),
+    # With several executors: also send a call still unanswered after this many seconds to another (0: never)
+    'EXECUTOR_HEDGE_AFTER': float(os.environ.get('BUGYOU_EXECUTOR_HEDGE_AFTER', 3)),
+}
 
 # Additional static folders
 STATIC_FOLDERS = {
@@ -67,6 +157,22 @@ STATIC_FOLDERS = {
     'leaderboard': '../frontend/leaderboard',  # <-- Add leaderboard folder
 }
 
+# Folders that are also reachable as /<name>/<file> (e.g. /home/home.css, /assets/logo.png)
+PREFIXED_STATIC_FOLDERS = ('home', 'guide', 'about', 'user_profile', 'leaderboard', 'assets')
+
+# In-memory static manifest, built on first use (or up front by warm_up())
+_static_manifest = None
+_static_manifest_lock = threading.Lock()
+
+def get_static_manifest():
+    """Return the static manifest, building it once per process"""
+    global _static_manifest
+    if _static_manifest is None:
+        with _static_manifest_lock:
+            if _static_manifest is None:
+                _static_manifest = StaticManifest(APP_ROOT, STATIC_FOLDERS, PREFIXED_STATIC_FOLDERS).build()
+    return _static_manifest
+
 # --- Standard headers/imports for each language ---
 STANDARD_HEADERS = {
     'cpp': '#include <bits/stdc++.h>\nusing namespace std;\n',
@@ -88,15 +194,150 @@ def sanitize_filename(name: str) -> str:
     base, ext = os.path.splitext(name)
     return f"{base}.{ext.lstrip('.')}" if ext else name
 
-# Session with retries for outbound requests
-_session = requests.Session()
-_retries = Retry(
-    total=2,
-    backoff_factor=0.5,
-    status_forcelist=[429, 500, 502, 503, 504],
-    allowed_methods=["POST"]
+# ────────────── Per-app subsystems ──────────────
+class BugYouExtension:
+    """
+    The stateful subsystems of one app, built from its config by create_app() and kept in
+    app.extensions['bugyou']. Code reaches them through subsystems(), so two apps in one
+    process (a test and a CLI tool, say) never share or reconfigure each other's.
+    """
+
+    def __init__(self, app):
+        config = app.config
+        # Pooled keep-alive client for every executor call (see executor_client.py); its session is
+        # created lazily per process so keep-alive sockets are never shared between forked workers
+        self.executor = ExecutorClient(backends=config['EXECUTOR_BACKENDS'],
+                                       max_concurrency=config['EXECUTOR_MAX_CONCURRENCY'],
+                                       retries=config['EXECUTOR_RETRIES'],
+                                       failure_threshold=config['EXECUTOR_BREAKER_THRESHOLD'],
+                                       reset_timeout=config['EXECUTOR_BREAKER_RESET'],
+                                       hedge_after=config['EXECUTOR_HEDGE_AFTER'])
+        # Logins and registrations hash on a small pool instead of request threads (see password_hashing.py)
+        self.password_hasher = PasswordHasher(Bcrypt(app),
+                                              workers=max(1, config['PASSWORD_HASH_WORKERS']),
+                                              max_queue=max(0, config['PASSWORD_HASH_QUEUE']),
+                                              max_wait=config['PASSWORD_HASH_MAX_WAIT'],
+                                              request_threads=config['REQUEST_THREADS'])
+        # Background runs of hidden tests after a passing Run
+        self.speculator = SpeculativeRunner(load=lambda: _executor_in_flight,
+                                            enabled=config['SPECULATIVE_HIDDEN_TESTS'],
+                                            busy_threshold=config['SPECULATIVE_BUSY_THRESHOLD'])
+        # Per-user / per-IP token buckets and the in-flight cap of the execution endpoints; the
+        # shared mapping they live in is created here, before gunicorn forks the workers
+        self.admission = AdmissionController(user_rate=config['ADMISSION_USER_PER_MINUTE'] / 60,
+                                             user_burst=config['ADMISSION_USER_BURST'],
+                                             ip_rate=config['ADMISSION_IP_PER_MINUTE'] / 60,
+                                             ip_burst=config['ADMISSION_IP_BURST'],
+                                             max_in_flight=config['ADMISSION_MAX_IN_FLIGHT'])
+        app.extensions['bugyou'] = self
+
+def subsystems():
+    """The current app's BugYouExtension"""
+    return current_app.extensions['bugyou']
+
+def in_app_context(fn):
+    """fn for a background thread, run in the current app's context so it reaches subsystems()"""
+    app = current_app._get_current_object()
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        with app.app_context():
+            return fn(*args, **kwargs)
+    return run
+
+def get_http_session():
+    """Get the outbound HTTP session for this process"""
+    return subsystems().executor.session()
+
+# ────────────── Metrics ──────────────
+HTTP_REQUEST_DURATION = histogram(
+    'bugyou_http_request_duration_seconds',
+    'Request latency by route, method and status',
+    ('route', 'method', 'status')
+)
+HTTP_REQUESTS_IN_FLIGHT = gauge(
+    'bugyou_http_requests_in_flight',
+    'Requests currently being served'
+)
+EXECUTION_STAGE_DURATION = histogram(
+    'bugyou_execution_stage_seconds',
+    'Code execution latency by stage: build (driver generation), request (executor round trip), '
+    'queue (round trip minus executor-reported compile/run), compile, run',
+    ('language', 'stage')
+)
+EXECUTIONS = counter(
+    'bugyou_executions_total',
+    'Executor calls by language and outcome',
+    ('language', 'outcome')
 )
-_session.mount("https://", HTTPAdapter(max_retries=_retries))
+EXECUTOR_REQUESTS_IN_FLIGHT = gauge(
+    'bugyou_executor_requests_in_flight',
+    'Requests to the code executor currently waiting for a response'
+)
+
+_executor_in_flight = 0
+_executor_in_flight_lock = threading.Lock()
+
+@contextmanager
+def executor_request():
+    """Count a call to the executor (the gauge, and the load speculative jobs yield to)"""
+    global _executor_in_flight
+    with _executor_in_flight_lock:
+        _executor_in_flight += 1
+    EXECUTOR_REQUESTS_IN_FLIGHT.inc()
+    try:
+        yield
+    finally:
+        with _executor_in_flight_lock:
+            _executor_in_flight -= 1
+        EXECUTOR_REQUESTS_IN_FLIGHT.dec()
+
+@bp.before_app_request
+def _start_request_timer():
+    g.request_started = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    g.request_id = set_request_id(request.headers.get('X-Request-ID'))
+    if request.path.startswith('/api/'):
+        route = request.url_rule.rule if request.url_rule else request.path
+        g.trace = start_trace(f"{request.method} {route}")
+
+@bp.after_app_request
+def _record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            route=route, method=request.method, status=response.status_code
+        )
+    finish_trace(g.pop('trace', None), status=response.status_code)
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    return response
+
+@bp.teardown_app_request
+def _release_request_slot(exc):
+    # after_request does not run when a view raises; keep the in-flight gauge honest
+    if g.pop('request_started', None) is not None:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+    finish_trace(g.pop('trace', None), error=type(exc).__name__ if exc else 'unknown')
+
+def record_execution_timings(language, piston_result, round_trip):
+    """Split an executor round trip into compile/run (as reported by Piston) and the rest"""
+    EXECUTION_STAGE_DURATION.observe(round_trip, language=language, stage='request')
+    reported = 0.0
+    for stage in ('compile', 'run'):
+        wall_time = (piston_result.get(stage) or {}).get('wall_time')
+        if wall_time is not None:
+            EXECUTION_STAGE_DURATION.observe(wall_time / 1000, language=language, stage=stage)
+            reported += wall_time / 1000
+    if reported:
+        EXECUTION_STAGE_DURATION.observe(max(round_trip - reported, 0.0), language=language, stage='queue')
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for all workers"""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 # Multi-level caching
 _cache = {}
@@ -105,54 +346,59 @@ _execution_cache = {}
 _execution_cache_timeout = 300  # 5 minutes
 _batch_cache = {}
 _batch_cache_timeout = 600  # 10 minutes
+# Test results per (user, challenge, code): a submit reuses what the last run computed
+result_ledger = ResultLedger()
+# Identical batch runs in flight at the same time share one executor call (see single_flight.py)
+batch_runs = SingleFlight('batch_execution')
+# Stored results of each challenge's buggy_code and reference_solution (see canonical_verdicts.py)
+canonical_verdicts = CanonicalVerdicts(
+    load=lambda key: get_challenge_by_id(*key, with_verdicts=True),
+    save=lambda key, verdicts: save_canonical_verdicts(*key, verdicts)
+)
+# How long a Submit waits for a speculative run of its tests that is already under way
+SPECULATION_WAIT = 25
 
-def cache_result(timeout=300):
-    """Decorator to cache API results"""
+def cache_result(timeout=300, version=None):
+    """
+    Decorator to cache API results. version(*args, **kwargs), if given, stamps each
+    result; a cached result is only served while the stamp is unchanged.
+    """
     def decorator(f):
         from functools import wraps
         @wraps(f)
         def decorated_function(*args, **kwargs):
             cache_key = f.__name__ + str(args) + str(sorted(kwargs.items()))
             current_time = time.time()
+            stamp = version(*args, **kwargs) if version else None
             # Check if cached result exists and is still valid
             if cache_key in _cache:
-                cached_time, cached_result = _cache[cache_key]
-                if current_time - cached_time < timeout:
+                cached_time, cached_result, cached_stamp = _cache[cache_key]
+                if current_time - cached_time < timeout and cached_stamp == stamp:
+                    record_cache('api_response', True)
                     return cached_result
+            record_cache('api_response', False)
             # Execute function and cache result
             result = f(*args, **kwargs)
-            _cache[cache_key] = (current_time, result)
+            _cache[cache_key] = (current_time, result, stamp)
             return result
         return decorated_function
     return decorator
 
 # Cache clearing endpoint
-@app.route('/api/cache/clear')
+@bp.route('/api/cache/clear')
 def clear_cache():
     global _cache, _execution_cache, _batch_cache
     _cache = {}
     _execution_cache = {}
     _batch_cache = {}
+    result_ledger.clear()
+    canonical_verdicts.invalidate()
     return jsonify({
         'success': True,
-        'message': 'All caches cleared successfully (API, execution, batch)',
+        'message': 'All caches cleared successfully (API, execution, batch, result ledger, canonical verdicts)',
         'timestamp': datetime.now().isoformat()
     })
 
-# Example: Add cache_result to ts (do not remove existing decorators)
-try:
-    app.view_functions['get_challenges'] = cache_result(timeout=60)(app.view_functions['get_challenges'])
-except Exception:
-    pass
-try:
-    app.view_functions['get_challenges_by_lang_diff'] = cache_result(timeout=60)(app.view_functions['get_challenges_by_lang_diff'])
-except Exception:
-    pass
-try:
-    app.view_functions['get_first_challenge'] = cache_result(timeout=60)(app.view_functions['get_first_challenge'])
-except Exception:
-    pass
-
 # --- Early syntax validation for Python/JS in code execution endpoint ---
 # (Add this logic at the start of your execute_code endpoint, before sending to Piston API)
 # Example:
@@ -172,7 +418,6 @@ except Exception:
 
 
 # Configuration
-PISTON_API = 'https://emkc.org/api/v2/piston'
 
 # Simple in-memory cache for frequently accessed data
 # _cache = {}
@@ -210,190 +455,127 @@ PISTON_LANGUAGES = {
     },
 }
 
-def get_cache_key(user_code, language, driver_code):
-    key_str = f"{user_code}::{language}::{driver_code}"
-    return hashlib.md5(key_str.encode()).hexdigest()
-
-def get_cached_execution(user_code, language, driver_code):
-    cache_key = get_cache_key(user_code, language, driver_code)
-    if cache_key in _execution_cache:
-        result, timestamp = _execution_cache[cache_key]
-        if time.time() - timestamp < _execution_cache_timeout:
-            return result
-        del _execution_cache[cache_key]
-    return None
-
-def set_cached_execution(user_code, language, driver_code, result):
-    cache_key = get_cache_key(user_code, language, driver_code)
-    _execution_cache[cache_key] = (result, time.time())
-    # Clean old cache entries
-    current_time = time.time()
-    expired_keys = [
-        k for k, (_, t) in _execution_cache.items()
-        if current_time - t > _execution_cache_timeout
-    ]
-    for k in expired_keys:
-        del _execution_cache[k]
-
-def get_batch_cache_key(code, language, test_cases, func_name=None):
-    """Generate a specialized cache key for batch execution"""
-    import hashlib
-    # Use function signature for better cache hits across similar code
-    code_hash = hashlib.md5(code.encode()).hexdigest()
-    test_cases_str = json.dumps(test_cases, sort_keys=True)
-    test_cases_hash = hashlib.md5(test_cases_str.encode()).hexdigest()
-    return f"batch:{language}:{code_hash}:{test_cases_hash}"
-
-def get_cached_batch_execution(code, language, test_cases, func_name=None):
-    """Get cached batch execution result if available"""
-    cache_key = get_batch_cache_key(code, language, test_cases, func_name)
-    if cache_key in _batch_cache:
-        result, timestamp = _batch_cache[cache_key]
-        if time.time() - timestamp < _batch_cache_timeout:
-            print(f"✅ Cache hit for batch execution: {cache_key[:30]}...")
-            return result
-        del _batch_cache[cache_key]
-    return None
-
-def set_cached_batch_execution(code, language, test_cases, result, func_name=None):
-    """Cache batch execution result"""
-    cache_key = get_batch_cache_key(code, language, test_cases, func_name)
-    _batch_cache[cache_key] = (result, time.time())
-    
-    print(f"💾 Cached batch execution: {cache_key[:30]}...")
-    
-    # Clean old cache entries
-    current_time = time.time()
-    expired_keys = [
-        k for k, (_, t) in _batch_cache.items() 
-        if current_time - t > _batch_cache_timeout
-    ]
-    for k in expired_keys:
-        del _batch_cache[k]
-
-# For Java, user_code must be ONLY the method(s), no class, no closing brace. The backend will wrap it.
-def run_all_tests_in_batch(user_code, language, driver_code, test_cases):
-    """
-    Dynamically generate driver code for all test cases using the driver_code as an initialization/call snippet.
-    For each test case, replace TEST_INPUT in driver_code with the test case input, call the function, and print the result.
-    Combine all into a main (or equivalent) function for batch execution.
-    """
-    def java_input_literal(val):
-        # Handles int[], double[], String[], int, double, String, etc.
-        if isinstance(val, str):
-            val = val.strip()
-            # Try to detect array
-            if val.startswith('[') and val.endswith(']'):
-                # Try to detect type: int, double, String
-                items = [x.strip() for x in val[1:-1].split(',') if x.strip()]
-                if all(i.replace('-', '').isdigit() for i in items):
-                    # int array
-                    return f"new int[]{{{','.join(items)}}}"
-                try:
-                    [float(x) for x in items]
-                    return f"new double[]{{{','.join(items)}}}"
-                except Exception:
-                    pass
-                # String array
-                if all((i.startswith('"') and i.endswith('"')) or (i.startswith("'") and i.endswith("'")) for i in items):
-                    return f"new String[]{{{','.join(items)}}}"
-                # Fallback: treat as int array
+def java_batch_input_literal(val):
+    """Java literal for a test input (arrays of int/double/String, scalars, quoted strings)"""
+    # Handles int[], double[], String[], int, double, String, etc.
+    if isinstance(val, str):
+        val = val.strip()
+        # Try to detect array
+        if val.startswith('[') and val.endswith(']'):
+            # Try to detect type: int, double, String
+            items = [x.strip() for x in val[1:-1].split(',') if x.strip()]
+            if all(i.replace('-', '').isdigit() for i in items):
+                # int array
                 return f"new int[]{{{','.join(items)}}}"
-            # If it's a quoted string
-            if (val.startswith('"') and val.endswith('"')) or (val.startswith("'") and val.endswith("'")):
-                return val
-            # Try to parse as int or float
             try:
-                int(val)
-                return val
+                [float(x) for x in items]
+                return f"new double[]{{{','.join(items)}}}"
             except Exception:
                 pass
-            try:
-                float(val)
-                return val
-            except Exception:
-                pass
-            # Fallback: treat as string
-            return f'"{val}"'
-        elif isinstance(val, (int, float)):
-            return str(val)
-        elif isinstance(val, list):
-            # Try to infer type
-            if all(isinstance(x, int) for x in val):
-                return f"new int[]{{{','.join(map(str, val))}}}"
-            elif all(isinstance(x, float) for x in val):
-                return f"new double[]{{{','.join(map(str, val))}}}"
-            elif all(isinstance(x, str) for x in val):
-                return f"new String[]{{{','.join(f'\"{x}\"' for x in val)}}}"
-            else:
-                return f"new Object[]{{{','.join(map(str, val))}}}"
+            # String array
+            if all((i.startswith('"') and i.endswith('"')) or (i.startswith("'") and i.endswith("'")) for i in items):
+                return f"new String[]{{{','.join(items)}}}"
+            # Fallback: treat as int array
+            return f"new int[]{{{','.join(items)}}}"
+        # If it's a quoted string
+        if (val.startswith('"') and val.endswith('"')) or (val.startswith("'") and val.endswith("'")):
+            return val
+        # Try to parse as int or float
+        try:
+            int(val)
+            return val
+        except Exception:
+            pass
+        try:
+            float(val)
+            return val
+        except Exception:
+            pass
+        # Fallback: treat as string
+        return f'"{val}"'
+    elif isinstance(val, (int, float)):
+        return str(val)
+    elif isinstance(val, list):
+        # Try to infer type
+        if all(isinstance(x, int) for x in val):
+            return f"new int[]{{{','.join(map(str, val))}}}"
+        elif all(isinstance(x, float) for x in val):
+            return f"new double[]{{{','.join(map(str, val))}}}"
+        elif all(isinstance(x, str) for x in val):
+            return f"new String[]{{{','.join(json.dumps(x) for x in val)}}}"
         else:
-            return str(val)
-    # Determine the function call/print pattern based on language
+            return f"new Object[]{{{','.join(map(str, val))}}}"
+    else:
+        return str(val)
+
+def generate_batch_driver(language, driver_code, test_cases, marker):
+    """
+    Expand driver_code (the call expression, TEST_INPUT standing for the input) into
+    a main program that runs every test through the result-frame harness
+    (see result_frames.py). Test cases carrying literals pre-rendered from the
+    challenge's test schema use them; others have their input converted here.
+    Returns None for unsupported languages.
+    """
+    def literal(test_case, convert, *args):
+        rendered = (test_case.get('literals') or {}).get(language)
+        return rendered if rendered is not None else convert(test_case.get('input'), *args)
+
     if language == 'cpp':
-        driver_lines = ["int main() {"]
+        # IMPORTANT: Always use cpp_input_literal to convert test_input for C++ driver code.
+        # Do NOT use the raw input string, as it will produce invalid C++ syntax.
+        param_count = driver_code.count('TEST_INPUT') if 'TEST_INPUT' in driver_code else 1
+        driver_lines = [harness_prelude('cpp', marker), "int main() {"]
         for idx, test_case in enumerate(test_cases):
-            test_input = test_case.get('input')
-            # IMPORTANT: Always use cpp_input_literal to convert test_input for C++ driver code.
-            # Do NOT use the raw input string, as it will produce invalid C++ syntax.
-            param_count = driver_code.count('TEST_INPUT') if 'TEST_INPUT' in driver_code else 1
-            # Use a unique variable name for each test case
-            unique_var = f'r{idx}'
-            unique_driver_code = driver_code.replace('auto r', f'auto {unique_var}')
-            # Also update the for-loop to use the correct variable name
-            unique_driver_code = re.sub(r'for\s*\(auto x : r\)', f'for(auto x : {unique_var})', unique_driver_code)
-            snippet = unique_driver_code.replace('TEST_INPUT', cpp_input_literal(test_input, param_count))
-            driver_lines.append(f"    {snippet}")
+            call = driver_code.replace('TEST_INPUT', literal(test_case, cpp_input_literal, param_count))
+            driver_lines.append(f"    __bugyou_run({idx}, []() {{ return __bugyou_json({call}); }});")
         driver_lines.append("    return 0;")
         driver_lines.append("}")
-        generated_driver_code = '\n'.join(driver_lines)
     elif language == 'python':
-        driver_lines = ["import ast", "if __name__ == '__main__':"]
-        for test_case in test_cases:
-            test_input = test_case.get('input')
-            # If input is a string, use ast.literal_eval; otherwise, use as is
-            if isinstance(test_input, str):
-                snippet = driver_code.replace('TEST_INPUT', f"ast.literal_eval({repr(test_input)})")
-            else:
-                snippet = driver_code.replace('TEST_INPUT', repr(test_input))
-            driver_lines.append(f"    print({snippet})")
-        generated_driver_code = '\n'.join(driver_lines)
+        driver_lines = ["import ast", harness_prelude('python', marker), "if __name__ == '__main__':"]
+        for idx, test_case in enumerate(test_cases):
+            call = driver_code.replace('TEST_INPUT', literal(test_case, python_input_literal))
+            driver_lines.append(f"    __bugyou_run({idx}, lambda: {call})")
     elif language == 'java':
         # Expect user_code to be only the method(s), no class, no closing brace
-        driver_lines = ["    public static void main(String[] args) {"]
-        for test_case in test_cases:
-            test_input = test_case.get('input')
-            java_input = java_input_literal(test_input)
-            snippet = driver_code.replace('TEST_INPUT', java_input)
-            driver_lines.append(f"        {snippet}")
+        driver_lines = [harness_prelude('java', marker), "    public static void main(String[] args) {"]
+        for idx, test_case in enumerate(test_cases):
+            call = driver_code.replace('TEST_INPUT', literal(test_case, java_batch_input_literal))
+            driver_lines.append(f"        __bugyouRun({idx}, () -> {call});")
         driver_lines.append("    }")
-        generated_driver_code = '\n'.join(driver_lines)
-        # Always wrap user_code and main in Solution
-        full_code = (
-            f"{STANDARD_HEADERS['java']}\n"
-            f"public class Solution {{\n"
-            f"{user_code}\n"
-            f"{generated_driver_code}\n"
-            f"}}"
-        )
     elif language == 'javascript':
         # Build a single test harness that iterates over all test cases
-        driver_lines = ["const testCases = ["]
+        driver_lines = [harness_prelude('javascript', marker), "const testCases = ["]
         for test_case in test_cases:
-            test_input = test_case.get('input')
-            driver_lines.append(f"  {js_input_literal(test_input)},")
+            driver_lines.append(f"  {literal(test_case, js_input_literal)},")
         driver_lines.append("];")
-        driver_lines.append("for (const tc of testCases) {")
-        driver_lines.append(f"  {driver_code}")
+        driver_lines.append("for (let __bugyouIndex = 0; __bugyouIndex < testCases.length; __bugyouIndex++) {")
+        driver_lines.append("  const tc = testCases[__bugyouIndex];")
+        driver_lines.append(f"  __bugyouRun(__bugyouIndex, () => {driver_code});")
         driver_lines.append("}")
-        generated_driver_code = '\n'.join(driver_lines)
     else:
+        return None
+    return '\n'.join(driver_lines)
+
+# For Java, user_code must be ONLY the method(s), no class, no closing brace. The backend will wrap it.
+@traced()
+def run_all_tests_in_batch(user_code, language, driver_code, test_cases):
+    """
+    Dynamically generate driver code for all test cases using the driver_code as an initialization/call snippet.
+    For each test case, replace TEST_INPUT in driver_code with the test case input, call the function, and print the result.
+    Combine all into a main (or equivalent) function for batch execution.
+    """
+    build_started = time.perf_counter()
+    marker = new_frame_marker()
+    generated_driver_code = generate_batch_driver(language, driver_code, test_cases, marker)
+    if generated_driver_code is None:
         return {
             'success': False,
             'error': f'Unsupported language: {language}',
             'test_results': []
         }
     full_code = build_executable_code(user_code, language, generated_driver_code)
+    EXECUTION_STAGE_DURATION.observe(time.perf_counter() - build_started, language=language, stage='build')
+    record_span('generate_driver', build_started, language=language, tests=len(test_cases))
     print("[DEBUG] Generated code to send to Piston:")
     print(full_code)
     lang_config = PISTON_LANGUAGES.get(language)
@@ -403,6 +585,10 @@ def run_all_tests_in_batch(user_code, language, driver_code, test_cases):
             'error': f'Unsupported language: {language}',
             'test_results': []
         }
+    # Broken programs fail here in milliseconds instead of taking an executor slot
+    precheck_error = precheck(full_code, language)
+    if precheck_error:
+        return {'success': False, 'error': precheck_error, 'test_results': [], 'compile_error': True}
     data = {
         'language': lang_config['lang'],
         'version': lang_config['version'],
@@ -411,129 +597,133 @@ def run_all_tests_in_batch(user_code, language, driver_code, test_cases):
             'content': full_code
         }]
     }
+    # Tests with reference baselines get a limit from them instead of the executor's default
+    time_limit = program_time_limit_ms(test_cases, language)
+    if time_limit:
+        data['run_timeout'] = time_limit
  
     try:
-        response = requests.post(f"{PISTON_API}/execute", json=data, timeout=20)
+        request_started = time.perf_counter()
+        headers = {'X-Request-ID': current_request_id()} if current_request_id() else None
+        with span('executor_request', language=language), executor_request():
+            response = subsystems().executor.post('/execute', data, timeout=20, headers=headers)
         if response.status_code != 200:
+            EXECUTIONS.inc(language=language, outcome='api_error')
             return {'success': False, 'error': f'API Error: {response.status_code}', 'test_results': []}
         result = response.json()
+        record_execution_timings(language, result, time.perf_counter() - request_started)
         if result.get('compile', {}).get('stderr'):
-            return {'success': False, 'error': result['compile']['stderr'], 'test_results': []}
-        if result.get('run', {}).get('stderr'):
-            return {'success': False, 'error': result['run']['stderr'], 'test_results': []}
-        output = result.get('run', {}).get('stdout', '').strip()
-        output_lines = output.split('\n') if output else []
-        test_results = []
-        for i, test_case in enumerate(test_cases):
-            expected = test_case.get('expected_output') or test_case.get('expected', '')
-            actual = output_lines[i].strip() if i < len(output_lines) else None
-            passed = (str(actual).strip() == str(expected).strip())
-            test_results.append({'test_number': i+1, 'passed': passed, 'actual': actual, 'expected': expected})
+            EXECUTIONS.inc(language=language, outcome='compile_error')
+            return {'success': False, 'error': result['compile']['stderr'], 'test_results': [], 'compile_error': True}
+        run = result.get('run', {})
+        frames = parse_frames(run.get('stdout', ''), marker)
+        if run.get('stderr') and not frames:
+            EXECUTIONS.inc(language=language, outcome='runtime_error')
+            return {'success': False, 'error': run['stderr'], 'test_results': []}
+        EXECUTIONS.inc(language=language, outcome='ok')
+        # Tests without a frame ran after a crash; stderr says why
+        missing_error = run.get('stderr') or None
+        if time_limit and run.get('signal') == 'SIGKILL':
+            missing_error = f'Time limit exceeded ({time_limit} ms)'
+        test_results = grade_frames(frames, test_cases, language, missing_error=missing_error)
         return {'success': True, 'test_results': test_results}
+    except ExecutorUnavailable as e:
+        EXECUTIONS.inc(language=language, outcome='unavailable')
+        return {'success': False, 'error': str(e), 'test_results': []}
     except Exception as e:
+        EXECUTIONS.inc(language=language, outcome='exception')
         return {'success': False, 'error': str(e), 'test_results': []}
 
 # ================================
 # SERVE FRONTEND
 # ================================
 
-@app.route('/')
+def send_static_asset(asset, key):
+    """Serve an in-memory asset with ETag/304 handling and a precompressed variant if accepted"""
+    encoding = choose_encoding(asset, request.accept_encodings)
+    response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    if len(asset.variants) > 1:
+        response.headers['Vary'] = 'Accept-Encoding'
+    if get_static_manifest().is_fingerprinted(key, asset):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+    response.set_etag(asset.etag if encoding == 'identity' else f"{asset.etag}-{encoding}")
+    return response.make_conditional(request)
+
+def send_page(folder_name, filename):
+    """Serve an HTML page from the manifest, falling back to disk if it was added after startup"""
+    asset = get_static_manifest().page(folder_name, filename)
+    if asset is None:
+        return send_from_directory(STATIC_FOLDERS[folder_name], filename)
+    return send_static_asset(asset, asset.key)
+
+@bp.route('/')
 def serve_frontend():
     """Serve the home page"""
-    return send_from_directory('../frontend/home', 'home.html')
+    return send_page('home', 'home.html')
 
-@app.route('/main_page')
+@bp.route('/main_page')
 def serve_main_page():
     """Serve the main code editor page"""
-    return send_from_directory(STATIC_FOLDERS['main'], 'index.html')
+    return send_page('main', 'index.html')
 
-@app.route('/login')
+@bp.route('/login')
 def serve_login():
     """Serve the login page"""
-    return send_from_directory(STATIC_FOLDERS['login'], 'login.html')
+    return send_page('login', 'login.html')
 
-@app.route('/signup')
+@bp.route('/signup')
 def serve_signup():
     """Serve the signup page"""
-    return send_from_directory(STATIC_FOLDERS['signup'], 'signup.html')
+    return send_page('signup', 'signup.html')
 
-@app.route('/guide')
+@bp.route('/guide')
 def serve_guide():
     """Serve the guide page"""
-    return send_from_directory('../frontend/guide', 'guide.html')
+    return send_page('guide', 'guide.html')
 
-@app.route('/admin')
+@bp.route('/admin')
 def serve_admin():
     """Serve the admin page"""
-    return send_from_directory(STATIC_FOLDERS['admin'], 'admin.html')
+    return send_page('admin', 'admin.html')
 
-@app.route('/about')
+@bp.route('/about')
 def serve_about():
     """Serve the about page"""
-    return send_from_directory(STATIC_FOLDERS['about'], 'about.html')
+    return send_page('about', 'about.html')
 
-@app.route('/user_profile')
+@bp.route('/user_profile')
 def serve_user_profile():
     """Serve the user profile page"""
-    return send_from_directory('../frontend/user_profile', 'user.html')
+    return send_page('user_profile', 'user.html')
 
-@app.route('/leaderboard')
+@bp.route('/leaderboard')
 def serve_leaderboard():
     """Serve the leaderboard page"""
-    return send_from_directory('../frontend/leaderboard', 'leaderboard.html')
+    return send_page('leaderboard', 'leaderboard.html')
 
-@app.route('/assets/<path:filename>')
+@bp.route('/assets/<path:filename>')
 def serve_assets(filename):
     """Serve files from Assets directory"""
-    try:
-        return send_from_directory(STATIC_FOLDERS['assets'], filename)
-    except Exception as e:
-        print(f"Error serving asset {filename}: {str(e)}")
+    asset = get_static_manifest().lookup(f"assets/{filename}")
+    if asset is None:
         return f"Asset {filename} not found", 404
+    return send_static_asset(asset, f"assets/{filename}")
 
-@app.route('/<path:filename>')
+@bp.route('/<path:filename>')
 def serve_static(filename):
-    # Special handling for /home/home.css, /guide/guide.css, /about/about.css, /user_profile/user.css
-    if filename.startswith('home/'):
-        subfile = filename[len('home/'):]
-        folder = STATIC_FOLDERS['home']
-        if os.path.exists(os.path.join(folder, subfile)):
-            return send_from_directory(folder, subfile)
-    if filename.startswith('guide/'):
-        subfile = filename[len('guide/'):]
-        folder = STATIC_FOLDERS['guide']
-        if os.path.exists(os.path.join(folder, subfile)):
-            return send_from_directory(folder, subfile)
-    if filename.startswith('about/'):
-        subfile = filename[len('about/'):]
-        folder = STATIC_FOLDERS['about']
-        if os.path.exists(os.path.join(folder, subfile)):
-            return send_from_directory(folder, subfile)
-    if filename.startswith('user_profile/'):
-        subfile = filename[len('user_profile/'):]
-        folder = STATIC_FOLDERS['user_profile']
-        if os.path.exists(os.path.join(folder, subfile)):
-            return send_from_directory(folder, subfile)
-    if filename.startswith('leaderboard/'):
-        subfile = filename[len('leaderboard/'):]
-        folder = STATIC_FOLDERS['leaderboard']
-        if os.path.exists(os.path.join(folder, subfile)):
-            return send_from_directory(folder, subfile)
-    # Existing logic for login, signup, admin
-    current_page = request.path.split('/')[1] if '/' in request.path else ''
-    if current_page in ['login', 'signup', 'admin']:
-        folder = STATIC_FOLDERS[current_page]
-        if os.path.exists(os.path.join(folder, filename)):
-            return send_from_directory(folder, filename)
-    # Fallback: try all folders
-    for folder_name, folder_path in STATIC_FOLDERS.items():
-        if os.path.exists(os.path.join(folder_path, filename)):
-            return send_from_directory(folder_path, filename)
-    return f"File {filename} not found", 404
+    """Serve CSS/JS/images from the precomputed manifest (no filesystem access per request)"""
+    asset = get_static_manifest().lookup(filename)
+    if asset is None:
+        return f"File {filename} not found", 404
+    return send_static_asset(asset, filename)
 
 # ================================
 
-@app.route('/api/health')
+@bp.route('/api/health')
 def health_check():
     """Health check endpoint"""
     start_time = time.time()
@@ -544,12 +734,13 @@ def health_check():
         'status': 'healthy',
         'database': 'connected' if db_status else 'disconnected',
         'response_time': f'{response_time:.3f}s',
+        'startup_time': f"{current_app.config.get('STARTUP_TIME_MS', 0):.1f}ms",
         'timestamp': datetime.now().isoformat()
     })
 
 
 
-@app.route('/api/cache/clear', methods=['POST', 'GET'])
+@bp.route('/api/cache/clear', methods=['POST', 'GET'])
 def clear_cache_endpoint():
     """Clear all caches"""
     try:
@@ -575,7 +766,7 @@ def clear_cache_endpoint():
 
 
 
-@app.route('/api/challenges')
+@bp.route('/api/challenges')
 @cache_result(timeout=60)  # Cache for 1 minute
 def get_challenges():
     """Get all available challenges"""
@@ -593,7 +784,7 @@ def get_challenges():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/challenges/<language>/<difficulty>')
+@bp.route('/api/challenges/<language>/<difficulty>')
 @cache_result(timeout=60)  # Cache for 1 minute
 def get_challenges_by_lang_diff(language, difficulty):
     """Get challenges for specific language and difficulty"""
@@ -611,7 +802,7 @@ def get_challenges_by_lang_diff(language, difficulty):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/challenge/<language>/<difficulty>/first')
+@bp.route('/api/challenge/<language>/<difficulty>/first')
 @cache_result(timeout=60)  # Cache for 1 minute
 def get_first_challenge(language, difficulty):
     """Get the first available challenge for a language and difficulty"""
@@ -658,7 +849,7 @@ def get_first_challenge(language, difficulty):
         print(f"Error loading first challenge: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/challenge/<language>/<difficulty>/<int:challenge_id>')
+@bp.route('/api/challenge/<language>/<difficulty>/<int:challenge_id>')
 def get_challenge_details(language, difficulty, challenge_id):
     """Get details for a specific challenge"""
     try:
@@ -695,8 +886,9 @@ def get_challenge_details(language, difficulty, challenge_id):
 
 def get_cache_key(code, language, test_cases):
     """Generate a cache key for code execution"""
+    # Comment and layout edits keep the key (see code_fingerprint.py)
     test_cases_str = json.dumps(test_cases, sort_keys=True)
-    return f"{language}:{hashlib.md5((code + test_cases_str).encode()).hexdigest()}"
+    return f"{language}:{fingerprint(code, language)}:{hashlib.md5(test_cases_str.encode()).hexdigest()}"
 
 def get_cached_execution(code, language, test_cases):
     """Get cached execution result if available"""
@@ -704,8 +896,10 @@ def get_cached_execution(code, language, test_cases):
     if cache_key in _execution_cache:
         result, timestamp = _execution_cache[cache_key]
         if time.time() - timestamp < _execution_cache_timeout:
+            record_cache('execution', True)
             return result
         del _execution_cache[cache_key]
+    record_cache('execution', False)
     return None
 
 def set_cached_execution(code, language, test_cases, result):
@@ -724,9 +918,8 @@ def set_cached_execution(code, language, test_cases, result):
 
 def get_batch_cache_key(code, language, test_cases, func_name=None):
     """Generate a specialized cache key for batch execution"""
-    import hashlib
-    # Use function signature for better cache hits across similar code
-    code_hash = hashlib.md5(code.encode()).hexdigest()
+    # Comment and layout edits keep the key (see code_fingerprint.py)
+    code_hash = fingerprint(code, language)
     test_cases_str = json.dumps(test_cases, sort_keys=True)
     test_cases_hash = hashlib.md5(test_cases_str.encode()).hexdigest()
     return f"batch:{language}:{code_hash}:{test_cases_hash}"
@@ -738,14 +931,16 @@ def get_cached_batch_execution(code, language, test_cases, func_name=None):
         result, timestamp = _batch_cache[cache_key]
         if time.time() - timestamp < _batch_cache_timeout:
             print(f"✅ Cache hit for batch execution: {cache_key[:30]}...")
-            return result
+            record_cache('batch', True)
+            return copy.deepcopy(result)
         del _batch_cache[cache_key]
+    record_cache('batch', False)
     return None
 
 def set_cached_batch_execution(code, language, test_cases, result, func_name=None):
     """Cache batch execution result"""
     cache_key = get_batch_cache_key(code, language, test_cases, func_name)
-    _batch_cache[cache_key] = (result, time.time())
+    _batch_cache[cache_key] = (copy.deepcopy(result), time.time())
     
     print(f"💾 Cached batch execution: {cache_key[:30]}...")
     
@@ -759,10 +954,12 @@ def set_cached_batch_execution(code, language, test_cases, result, func_name=Non
         del _batch_cache[k]
 
 # ────────────── Input Conversion Helpers ──────────────
+@traced()
 def python_input_literal(val):
     # For Python, use ast.literal_eval for all inputs
     return f"ast.literal_eval({repr(val)})" if isinstance(val, str) else repr(val)
 
+@traced()
 def cpp_input_literal(val, param_count=1):
     import ast, re
 
@@ -824,6 +1021,7 @@ def cpp_input_literal(val, param_count=1):
     return str(val)
 
 
+@traced()
 def java_input_literal(val):
     import ast
     if isinstance(val, str) and val.strip().startswith('['):
@@ -839,13 +1037,52 @@ def java_input_literal(val):
             return f"new int[]{to_java(py_val)}"
     return str(val)
 
+@traced()
 def js_input_literal(val):
     # For JS, use JSON.parse for arrays/objects, as-is for numbers/strings
     if isinstance(val, str) and (val.strip().startswith('[') or val.strip().startswith('{')):
         return f"JSON.parse({json.dumps(val)})"
     return json.dumps(val)
 
-@app.route('/api/execute', methods=['POST'])
+def discover_driver_snippet(code, language):
+    """Driver call snippet for the function in code; SyntaxError/ValueError when none can be found"""
+    if language == 'python':
+        func_name, param_names = discover_python_signature(code)
+        return build_driver_snippet(func_name, param_names, language)
+    # Execution caches key code by its fingerprint, which ignores comments: a signature
+    # must not be found in a comment (see code_fingerprint.py)
+    code = code_without_comments(code, language)
+    if language == 'cpp':
+        return_type, func_name, param_names = discover_cpp_signature(code)
+        return build_driver_snippet(func_name, param_names, language, return_type)
+    if language == 'java':
+        func_name, param_names = discover_java_signature(code)
+        return build_driver_snippet(func_name, param_names, language)
+    if language == 'javascript':
+        func_name, param_names = discover_js_signature(code)
+        return build_driver_snippet(func_name, param_names, language)
+    raise ValueError(f'Unsupported language: {language}')
+
+def admission_controlled(f):
+    """
+    Refuse the request with 429 and Retry-After unless admission control lets it run now.
+    Only a logged-in user has a user bucket; anonymous calls are limited by client IP alone,
+    since a username in the body is whatever the client chose to send.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        user = current_user.username if current_user.is_authenticated else None
+        try:
+            with subsystems().admission.admit(request.endpoint, user=user, ip=request.remote_addr):
+                return f(*args, **kwargs)
+        except AdmissionRejected as e:
+            response = jsonify({'success': False, 'error': str(e), 'test_results': []})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+    return decorated_function
+
+@bp.route('/api/execute', methods=['POST'])
+@admission_controlled
 def execute_code():
     """Execute user code against visible test cases only"""
     try:
@@ -855,36 +1092,36 @@ def execute_code():
         test_cases = data.get('test_cases')
         challenge_id = data.get('challenge_id')
         difficulty = data.get('difficulty')
+        # Only literals validated when the challenge was added reach the driver; client ones are dropped
+        challenge = get_challenge_by_id(language, difficulty, challenge_id) if challenge_id and difficulty else None
+        trusted = collect_literals(challenge['test_cases'] + challenge['hidden_test_cases']) if challenge else None
+        test_cases = attach_literals(test_cases, trusted)
         # --- Signature discovery and driver generation ---
         try:
-            if language == 'python':
-                func_name, param_names = discover_python_signature(code)
-                input_literal = python_input_literal
-                driver_snippet = build_driver_snippet(func_name, param_names, language)
-            elif language == 'cpp':
-                return_type, func_name, param_names = discover_cpp_signature(code)
-                input_literal = cpp_input_literal
-                driver_snippet = build_driver_snippet(func_name, param_names, language, return_type)
-            elif language == 'java':
-                func_name, param_names = discover_java_signature(code)
-                input_literal = java_input_literal
-                driver_snippet = build_driver_snippet(func_name, param_names, language)
-            elif language == 'javascript':
-                func_name, param_names = discover_js_signature(code)
-                input_literal = js_input_literal
-                driver_snippet = build_driver_snippet(func_name, param_names, language)
-            else:
-                return jsonify({'success': False, 'error': f'Unsupported language: {language}'}), 400
+            driver_snippet = discover_driver_snippet(code, language)
+        except SyntaxError as e:
+            # Reported like a compile error, without a round trip to the executor
+            return jsonify({'success': False, 'error': format_syntax_error(e), 'test_results': []})
         except ValueError as e:
             return jsonify({'success': False, 'error': str(e)}), 400
         # Now call run_all_tests_in_batch with the generated driver code
-        result = run_all_tests_in_batch(code, language, driver_snippet, test_cases)
+        # (test cases echoed from the challenge payload carry its pre-rendered literals)
+        challenge_key = (language, difficulty, challenge_id) if challenge_id and difficulty else None
+        result = run_tests_with_verdicts(code, language, driver_snippet, test_cases, challenge_key, record=False)
+        # Remember the results so submitting the same code doesn't run these tests again
+        username = data.get('username')
+        if result.get('success') and username and challenge_id and difficulty:
+            owner = (username, language, difficulty, challenge_id)
+            result_ledger.record(owner, code, test_cases, result['test_results'])
+            if result['test_results'] and all(r.get('passed') for r in result['test_results']):
+                speculate_hidden_tests(owner, code, driver_snippet)
         return jsonify(result)
     except Exception as e:
         print(f"[DEBUG] Exception in /api/execute: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/validate', methods=['POST'])
+@bp.route('/api/validate', methods=['POST'])
+@admission_controlled
 def validate_submission():
     """Validate user submission against all test cases (visible and hidden)"""
     try:
@@ -894,51 +1131,49 @@ def validate_submission():
         test_cases = data.get('test_cases')
         challenge_id = data.get('challenge_id')
         difficulty = data.get('difficulty')
-        # --- Fetch hidden test cases if challenge_id/difficulty provided ---
+        username = data.get('username')
+        # --- Fetch visible and hidden test cases if challenge_id/difficulty provided ---
         all_test_cases = test_cases or []
-        use_cached_visible = data.get('use_cached_visible', False)
+        challenge = None
         
         if challenge_id and difficulty:
             challenge = get_challenge_by_id(language, difficulty, challenge_id)
             if challenge:
-                visible = challenge.get('test_cases', [])
-                hidden = challenge.get('hidden_test_cases', [])
-                
-                if use_cached_visible:
-                    # Use provided test cases (hidden only) and assume visible passed
-                    all_test_cases = test_cases or hidden
-                    print(f"Using cached visible results, only running {len(all_test_cases)} hidden tests")
-                else:
-                    # If no test_cases provided, use all from DB
-                    if not test_cases:
-                        all_test_cases = visible + hidden
-                    # If test_cases provided, append hidden
-                    else:
-                        all_test_cases = test_cases + hidden
+                # Always grade against the stored tests; use_cached_visible is no longer trusted,
+                # results the server itself recorded for this code are reused instead (see result_ledger.py)
+                all_test_cases = challenge.get('test_cases', []) + challenge.get('hidden_test_cases', [])
+        # Only literals validated when the challenge was added reach the driver
+        trusted = collect_literals(challenge['test_cases'] + challenge['hidden_test_cases']) if challenge else None
+        all_test_cases = attach_literals(all_test_cases, trusted)
         # --- Signature discovery and driver generation ---
         try:
-            if language == 'python':
-                func_name, param_names = discover_python_signature(code)
-                input_literal = python_input_literal
-                driver_snippet = build_driver_snippet(func_name, param_names, language)
-            elif language == 'cpp':
-                return_type, func_name, param_names = discover_cpp_signature(code)
-                input_literal = cpp_input_literal
-                driver_snippet = build_driver_snippet(func_name, param_names, language, return_type)
-            elif language == 'java':
-                func_name, param_names = discover_java_signature(code)
-                input_literal = java_input_literal
-                driver_snippet = build_driver_snippet(func_name, param_names, language)
-            elif language == 'javascript':
-                func_name, param_names = discover_js_signature(code)
-                input_literal = js_input_literal
-                driver_snippet = build_driver_snippet(func_name, param_names, language)
-            else:
-                return jsonify({'success': False, 'error': f'Unsupported language: {language}'}), 400
+            driver_snippet = discover_driver_snippet(code, language)
+        except SyntaxError as e:
+            return jsonify({'success': False, 'all_passed': False, 'test_results': [], 'error': format_syntax_error(e)})
         except ValueError as e:
             return jsonify({'success': False, 'error': str(e)}), 400
-        # Now call run_all_tests_in_batch with the generated driver code
-        result = run_all_tests_in_batch(code, language, driver_snippet, all_test_cases)
+        # Only run the tests this user's last run of the same code did not cover
+        owner = (username, language, difficulty, challenge_id) if username and challenge else None
+        if owner:
+            # A speculative run of the hidden tests may be under way; let it finish instead of repeating it
+            subsystems().speculator.settle((owner, code_hash(code, language)), SPECULATION_WAIT)
+        known = result_ledger.lookup(owner, code, all_test_cases) if owner else {}
+        pending = [tc for i, tc in enumerate(all_test_cases) if i not in known]
+        challenge_key = (language, difficulty, challenge_id) if challenge else None
+        if pending:
+            result = run_tests_with_verdicts(code, language, driver_snippet, pending, challenge_key)
+        else:
+            result = {'success': True, 'test_results': []}
+        if result.get('success'):
+            if owner:
+                result_ledger.record(owner, code, pending, result['test_results'])
+            fresh = iter(result['test_results'])
+            merged = [known[i] if i in known else next(fresh) for i in range(len(all_test_cases))]
+            for number, test_result in enumerate(merged, 1):
+                test_result['test_number'] = number
+            result['test_results'] = merged
+            if known:
+                print(f"Reused {len(known)} recorded results, ran {len(pending)} tests")
         
         # Patch: always return success, all_passed, test_results, error
         response = {
@@ -964,6 +1199,145 @@ def validate_submission():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def speculate_hidden_tests(owner, code, driver_snippet):
+    """Queue a background run of the challenge's hidden tests for this code; results go to the ledger"""
+    username, language, difficulty, challenge_id = owner
+
+    def run_hidden_tests():
+        challenge = get_challenge_by_id(language, difficulty, challenge_id)
+        if not challenge:
+            return
+        hidden = challenge.get('hidden_test_cases', [])
+        known = result_ledger.lookup(owner, code, hidden)
+        pending = [tc for i, tc in enumerate(hidden) if i not in known]
+        if pending:
+            result = run_tests_with_verdicts(code, language, driver_snippet, pending, (language, difficulty, challenge_id))
+            if result.get('success'):
+                result_ledger.record(owner, code, pending, result['test_results'])
+
+    subsystems().speculator.submit((owner, code_hash(code, language)), in_app_context(run_hidden_tests))
+
+def run_tests_with_verdicts(code, language, driver_snippet, test_cases, challenge_key, record=True):
+    """
+    run_all_tests_in_batch, except that when code is the challenge's buggy_code or
+    reference_solution the stored verdicts answer every test they cover, and the
+    tests run here are stored for next time. challenge_key is (language, difficulty, challenge_id).
+    record=False when the tests come from the client: stored verdicts are read, never written.
+    """
+    known = canonical_verdicts.lookup(challenge_key, code, test_cases) if challenge_key else None
+    if known is None:
+        return run_tests_coalesced(code, language, driver_snippet, test_cases)
+    if 'error' in known:
+        EXECUTIONS.inc(language=language, outcome='canonical_hit')
+        return {'success': False, 'error': known['error'], 'test_results': [], 'compile_error': True}
+    pending = [tc for i, tc in enumerate(test_cases) if i not in known]
+    if not pending:
+        EXECUTIONS.inc(language=language, outcome='canonical_hit')
+        result = {'success': True, 'test_results': []}
+    else:
+        result = run_tests_coalesced(code, language, driver_snippet, pending)
+    if result.get('compile_error') and record:
+        canonical_verdicts.record(challenge_key, code, pending, error=result['error'])
+    if not result.get('success'):
+        return result
+    if record:
+        canonical_verdicts.record(challenge_key, code, pending, result['test_results'])
+    fresh = iter(result['test_results'])
+    merged = [known[i] if i in known else next(fresh) for i in range(len(test_cases))]
+    for number, test_result in enumerate(merged, 1):
+        test_result['test_number'] = number
+    result['test_results'] = merged
+    return result
+
+def run_tests_coalesced(code, language, driver_snippet, test_cases):
+    """
+    run_all_tests_in_batch through the batch cache: a recent result for the same code
+    and tests is reused, and identical runs already in flight are waited for instead
+    of sent to the executor again. Results and compile errors are cached; executor
+    failures are not.
+    """
+    cached = get_cached_batch_execution(code, language, test_cases)
+    if cached is not None:
+        EXECUTIONS.inc(language=language, outcome='cache_hit')
+        return cached
+
+    def run():
+        # The run this one waited to start may have just finished and filled the cache
+        cached = get_cached_batch_execution(code, language, test_cases)
+        if cached is not None:
+            return cached
+        result = run_all_tests_in_batch(code, language, driver_snippet, test_cases)
+        if result.get('success') or result.get('compile_error'):
+            set_cached_batch_execution(code, language, test_cases, result)
+        return result
+
+    return batch_runs.do(get_batch_cache_key(code, language, test_cases), run)
+
+def precompute_canonical_verdicts(language, difficulty, challenge_id, reference_results=None):
+    """
+    Run a new challenge's buggy_code and reference_solution against all its tests in the background.
+    reference_results (visible then hidden tests, from the reference check) are stored instead of rerun.
+    """
+    def precompute():
+        challenge_key = (language, difficulty, challenge_id)
+        challenge = get_challenge_by_id(language, difficulty, challenge_id)
+        if not challenge:
+            return
+        tests = challenge.get('test_cases', []) + challenge.get('hidden_test_cases', [])
+        for field in CANONICAL_SOURCES:
+            code = challenge.get(field)
+            if field == 'reference_solution' and reference_results and len(reference_results) == len(tests):
+                canonical_verdicts.record(challenge_key, code, tests, reference_results)
+                continue
+            try:
+                driver_snippet = discover_driver_snippet(code, language)
+            except (SyntaxError, ValueError) as e:
+                print(f"⚠️ No canonical verdict for {field} of {challenge_key}: {e}")
+                continue
+            run_tests_with_verdicts(code, language, driver_snippet, tests, challenge_key)
+
+    threading.Thread(target=in_app_context(precompute), name='canonical-verdicts', daemon=True).start()
+
+def refresh_catalog_snapshot():
+    """Rebuild the catalog snapshot in the background after challenges were added; workers pick it up"""
+    path = snapshot_path()
+    if not path:
+        return
+
+    def rebuild():
+        try:
+            build_catalog_snapshot(path)
+        except Exception as e:
+            print(f"⚠️ Could not rebuild catalog snapshot {path}: {e}")
+
+    threading.Thread(target=rebuild, name='catalog-snapshot', daemon=True).start()
+
+def verify_reference_solution(data):
+    """
+    Run the reference solution of a challenge being added against all its tests
+    (see reference_check.py). Fills in expected outputs when autofill_expected is
+    set, stores per-test baselines in data['test_schema'] and returns
+    (reference results, number of expected outputs filled in).
+    Raises ReferenceCheckError or ReferenceRunError.
+    """
+    language = data['language']
+    reference = data['reference_solution']
+    try:
+        driver_snippet = discover_driver_snippet(reference, language)
+    except SyntaxError as e:
+        raise ReferenceCheckError(f"Reference solution does not compile:\n{format_syntax_error(e)}")
+    except ValueError as e:
+        raise ReferenceCheckError(f"Reference solution: {e}")
+    visible, hidden = data['test_cases'], data['hidden_test_cases']
+    tests = attach_literals(visible + hidden, data['test_schema']['literals'])
+    run_tests = in_app_context(lambda batch: run_all_tests_in_batch(reference, language, driver_snippet, batch))
+    results = run_reference(run_tests, tests)
+    labels = [f'test {i}' for i in range(1, len(visible) + 1)] + [f'hidden test {i}' for i in range(1, len(hidden) + 1)]
+    checked, filled = reconcile(visible + hidden, results, labels, autofill=bool(data.get('autofill_expected')))
+    data['test_cases'], data['hidden_test_cases'] = checked[:len(visible)], checked[len(visible):]
+    data['test_schema']['baseline_ms'] = baselines(checked, results, input_key)
+    return results, filled
+
 def check_code_compilation(user_code, language, driver_code, test_cases):
     """
     Check if code compiles and runs using the first test case only, without comparing output.
@@ -976,99 +1350,10 @@ def check_code_compilation(user_code, language, driver_code, test_cases):
             'error': 'No test cases available for compilation check.'
         }
     first_test_case = [test_cases[0]]
-    def java_input_literal(val):
-        if isinstance(val, str):
-            val = val.strip()
-            if val.startswith('[') and val.endswith(']'):
-                items = [x.strip() for x in val[1:-1].split(',') if x.strip()]
-                if all(i.replace('-', '').isdigit() for i in items):
-                    return f"new int[]{{{','.join(items)}}}"
-                try:
-                    [float(x) for x in items]
-                    return f"new double[]{{{','.join(items)}}}"
-                except Exception:
-                    pass
-                if all((i.startswith('"') and i.endswith('"')) or (i.startswith("'") and i.endswith("'")) for i in items):
-                    return f"new String[]{{{','.join(items)}}}"
-                return f"new int[]{{{','.join(items)}}}"
-            if (val.startswith('"') and val.endswith('"')) or (val.startswith("'") and val.endswith("'")):
-                return val
-            try:
-                int(val)
-                return val
-            except Exception:
-                pass
-            try:
-                float(val)
-                return val
-            except Exception:
-                pass
-            return f'"{val}"'
-        elif isinstance(val, (int, float)):
-            return str(val)
-        elif isinstance(val, list):
-            if all(isinstance(x, int) for x in val):
-                return f"new int[]{{{','.join(map(str, val))}}}"
-            elif all(isinstance(x, float) for x in val):
-                return f"new double[]{{{','.join(map(str, val))}}}"
-            elif all(isinstance(x, str) for x in val):
-                return f"new String[]{{{','.join(f'\"{x}\"' for x in val)}}}"
-            else:
-                return f"new Object[]{{{','.join(map(str, val))}}}"
-        else:
-            return str(val)
     # Use the same dynamic driver code generation as batch, but with only the first test case
-    if language == 'cpp':
-        driver_lines = ["int main() {"]
-        test_input = first_test_case[0].get('input')
-        # IMPORTANT: Always use cpp_input_literal to convert test_input for C++ driver code.
-        # Do NOT use the raw input string, as it will produce invalid C++ syntax.
-        param_count = driver_code.count('TEST_INPUT') if 'TEST_INPUT' in driver_code else 1
-        snippet = driver_code.replace('TEST_INPUT', cpp_input_literal(test_input, param_count))
-        driver_lines.append(f"    {snippet}")
-        driver_lines.append("    return 0;")
-        driver_lines.append("}")
-        generated_driver_code = '\n'.join(driver_lines)
-    elif language == 'python':
-        driver_lines = ["import ast", "if __name__ == '__main__':"]
-        test_input = first_test_case[0].get('input')
-        # If input is a string, use ast.literal_eval; otherwise, use as is
-        if isinstance(test_input, str):
-            snippet = driver_code.replace('TEST_INPUT', f"ast.literal_eval({repr(test_input)})")
-        else:
-            snippet = driver_code.replace('TEST_INPUT', repr(test_input))
-        driver_lines.append(f"    {snippet}")
-        generated_driver_code = '\n'.join(driver_lines)
-    elif language == 'java':
-        # Expect user_code to be only the method(s), no class, no closing brace
-        driver_lines = ["    public static void main(String[] args) {"]
-        for test_case in test_cases:
-            test_input = test_case.get('input')
-            java_input = java_input_literal(test_input)
-            snippet = driver_code.replace('TEST_INPUT', java_input)
-            driver_lines.append(f"        {snippet}")
-        driver_lines.append("    }")
-        generated_driver_code = '\n'.join(driver_lines)
-        # Always wrap user_code and main in Solution
-        full_code = (
-            f"{STANDARD_HEADERS['java']}\n"
-            f"public class Solution {{\n"
-            f"{user_code}\n"
-            f"{generated_driver_code}\n"
-            f"}}"
-        )
-    elif language == 'javascript':
-        driver_lines = []
-        for test_case in test_cases:
-            test_input = test_case.get('input')
-            # If input is a string, use JSON.parse; otherwise, use as is
-            if isinstance(test_input, str):
-                snippet = driver_code.replace('TEST_INPUT', f"JSON.parse({json.dumps(test_input)})")
-            else:
-                snippet = driver_code.replace('TEST_INPUT', json.dumps(test_input))
-            driver_lines.append(snippet)
-        generated_driver_code = '\n'.join(driver_lines)
-    else:
+    marker = new_frame_marker()
+    generated_driver_code = generate_batch_driver(language, driver_code, first_test_case, marker)
+    if generated_driver_code is None:
         return {
             'success': False,
             'compiles': False,
@@ -1083,6 +1368,13 @@ def check_code_compilation(user_code, language, driver_code, test_cases):
             'compiles': False,
             'error': f'Unsupported language: {language}'
         }
+    precheck_error = precheck(full_code, language)
+    if precheck_error:
+        return {
+            'success': True,
+            'compiles': False,
+            'error': precheck_error
+        }
     data = {
         'language': lang_config['lang'],
         'version': lang_config['version'],
@@ -1092,11 +1384,10 @@ def check_code_compilation(user_code, language, driver_code, test_cases):
         }]
     }
     try:
-        response = requests.post(
-            f"{PISTON_API}/execute",
-            json=data,
-            timeout=10
-        )
+        request_started = time.perf_counter()
+        with executor_request():
+            response = subsystems().executor.post('/execute', data, timeout=10)
+        EXECUTION_STAGE_DURATION.observe(time.perf_counter() - request_started, language=language, stage='compile_check')
         if response.status_code != 200:
             return {
                 'success': False,
@@ -1116,6 +1407,14 @@ def check_code_compilation(user_code, language, driver_code, test_cases):
                 'compiles': False,
                 'error': result['run']['stderr']
             }
+        # The harness catches exceptions per test, so runtime errors arrive in the frame
+        frame = parse_frames(result.get('run', {}).get('stdout', ''), marker).get(0)
+        if frame is not None and frame.get('status') != 'ok':
+            return {
+                'success': True,
+                'compiles': False,
+                'error': frame.get('error')
+            }
         # If we get here, it compiled and ran successfully
         return {
             'success': True,
@@ -1159,66 +1458,7 @@ def run_test_validation(user_code, language, challenge):
         'test_results': test_results
     }
 
-def compare_outputs_smart(actual, expected):
-    """Smart comparison that handles different data types properly"""
-    # Auto-fix stringified list like "[0,1]" into real list
-    if isinstance(expected, str) and expected.startswith('[') and expected.endswith(']'):
-        try:
-            expected = json.loads(expected)
-        except json.JSONDecodeError:
-            pass
-    # Handle None comparisons
-    if expected is None:
-        return actual is None
-    if actual is None:
-        return expected is None
-    
-    # Handle numeric comparisons (int, float)
-    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
-        return actual == expected
-    
-    # Handle string comparisons
-    if isinstance(expected, str) and isinstance(actual, str):
-        return actual.strip() == expected.strip()
-    
-    # Handle list/array comparisons
-    if isinstance(expected, list) and isinstance(actual, list):
-        return actual == expected
-    
-    # Handle mixed type comparisons (e.g., int vs string)
-    try:
-        # Try to convert both to the same type for comparison
-        if isinstance(expected, (int, float)):
-            # Expected is numeric, try to convert actual to numeric
-            if isinstance(actual, str):
-                # Handle special string cases first
-                if actual.lower().strip() in ['null', 'none']:
-                    return False  # None/null is not equal to a number
-                try:
-                    actual_num = float(actual) if '.' in actual else int(actual)
-                    return actual_num == expected
-                except ValueError:
-                    return False  # Can't convert, so not equal
-        elif isinstance(actual, (int, float)):
-            # Actual is numeric, try to convert expected to numeric
-            if isinstance(expected, str):
-                # Handle special string cases first
-                if expected.lower().strip() in ['null', 'none']:
-                    return False  # None/null is not equal to a number
-                try:
-                    expected_num = float(expected) if '.' in expected else int(expected)
-                    return actual == expected_num
-                except ValueError:
-                    return False  # Can't convert, so not equal
-    except Exception as e:
-        # If any comparison operation fails, log it and return False
-        print(f"Comparison error in compare_outputs_smart: {e}")
-        return False
-    
-    # Fallback to string comparison
-    return str(actual).strip() == str(expected).strip()
-
-@app.route('/api/user/<username>')
+@bp.route('/api/user/<username>')
 def get_user_info(username):
     """Get user information including XP and level"""
     try:
@@ -1245,8 +1485,8 @@ def get_user_info(username):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/user/<username>/profile')
-@cache_result(timeout=120)  # Cache for 2 minutes
+@bp.route('/api/user/<username>/profile')
+@cache_result(timeout=120, version=user_stats_cache.version)  # Cache for 2 minutes, or until XP or solves change
 def get_user_profile(username):
     """Get user profile information including solved problems"""
     try:
@@ -1274,8 +1514,7 @@ def get_user_profile(username):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/user/stats/<username>')
-@cache_result(timeout=300)  # Cache for 5 minutes
+@bp.route('/api/user/stats/<username>')
 def get_user_stats_endpoint(username):
     """Get user stats for XP display"""
     try:
@@ -1293,7 +1532,7 @@ def get_user_stats_endpoint(username):
         print(f"Error getting user stats: {e}")
         return jsonify({'success': False, 'error': 'Failed to get user stats'})
 
-@app.route('/api/challenge/complete', methods=['POST'])
+@bp.route('/api/challenge/complete', methods=['POST'])
 def mark_challenge_completed_api():
     """Mark a challenge as completed for a user"""
     try:
@@ -1328,8 +1567,7 @@ def mark_challenge_completed_api():
             # Update leaderboard entry for this user
             update_leaderboard_entry(username)
         
-        # Clear user cache to ensure fresh data
-        clear_user_cache(username)
+        # No cache clearing needed: the solve and the XP update bumped the user's stats version
         
         response_data = {'success': True, 'message': 'Challenge marked as completed'}
         
@@ -1346,7 +1584,7 @@ def mark_challenge_completed_api():
         print(f"Error marking challenge completed: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/leaderboard')
+@bp.route('/api/leaderboard')
 def get_leaderboard():
     """Get leaderboard data with optional filters and caching"""
     try:
@@ -1366,7 +1604,7 @@ def get_leaderboard():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/leaderboard/user/<username>')
+@bp.route('/api/leaderboard/user/<username>')
 def get_user_leaderboard_position(username):
     """Get user's current leaderboard position"""
     try:
@@ -1383,58 +1621,42 @@ def get_user_leaderboard_position(username):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@app.route('/api/challenges', methods=['POST'])
+@bp.route('/api/challenges', methods=['POST'])
 def add_challenge():
     """Add a new challenge"""
     try:
         data = request.get_json()
         print("[DEBUG] Received challenge data:", data)
-        # Validate required fields
-        # REMOVED 'driver_code' from required_fields
-        required_fields = ['language', 'difficulty', 'title', 'description', 'buggy_code', 'reference_solution', 'solution_explanation', 'hints', 'test_cases', 'hidden_test_cases']
-        missing_fields = [field for field in required_fields if field not in data or not data[field]]
-        if missing_fields:
-            print(f"[DEBUG] Missing fields: {missing_fields}")
-            return jsonify({
-                'success': False,
-                'error': f'Missing required fields: {", ".join(missing_fields)}'
-            }), 400
-        # Validate test cases
-        if not isinstance(data['test_cases'], list) or len(data['test_cases']) < 3:
-            print("[DEBUG] Not enough visible test cases")
-            return jsonify({
-                'success': False,
-                'error': 'At least 3 visible test cases are required'
-            }), 400
-        # Validate hidden test cases
-        if not isinstance(data['hidden_test_cases'], list) or len(data['hidden_test_cases']) != 2:
-            print("[DEBUG] Incorrect number of hidden test cases")
-            return jsonify({
-                'success': False,
-                'error': 'Exactly 2 hidden test cases are required'
-            }), 400
-        # Validate hints
-        if not isinstance(data['hints'], list) or len(data['hints']) != 3:
-            print("[DEBUG] Incorrect number of hints")
-            return jsonify({
-                'success': False,
-                'error': 'Exactly 3 hints are required'
-            }), 400
-        # Validate language
-        if data['language'] not in PISTON_LANGUAGES:
-            print(f"[DEBUG] Unsupported language: {data['language']}")
-            return jsonify({
-                'success': False,
-                'error': f'Unsupported language. Must be one of: {", ".join(PISTON_LANGUAGES.keys())}'
-            }), 400
-        # Validate difficulty
-        valid_difficulties = ['basic', 'intermediate', 'advanced']
-        if data['difficulty'].lower() not in valid_difficulties:
-            print(f"[DEBUG] Invalid difficulty: {data['difficulty']}")
+        # Same checks as a bulk import (see challenge_bulk.py); also builds the test schema
+        try:
+            data = validate_challenge(data)
+        except ChallengeValidationError as e:
+            print(f"[DEBUG] Invalid challenge: {e}")
             return jsonify({
                 'success': False,
-                'error': f'Invalid difficulty. Must be one of: {", ".join(valid_difficulties)}'
+                'error': str(e)
             }), 400
+        # Check every expected output against the reference solution before anything is stored
+        reference_results, filled = None, 0
+        if current_app.config['REFERENCE_CHECK']:
+            try:
+                reference_results, filled = verify_reference_solution(data)
+                REFERENCE_CHECKS.inc(language=data['language'], outcome='filled' if filled else 'ok')
+            except ReferenceCheckError as e:
+                print(f"[DEBUG] Reference check failed: {e}")
+                REFERENCE_CHECKS.inc(language=data['language'], outcome='mismatch' if e.mismatches else 'error')
+                return jsonify({
+                    'success': False,
+                    'error': str(e),
+                    'mismatches': e.mismatches
+                }), 400
+            except ReferenceRunError as e:
+                print(f"[DEBUG] Reference check could not run: {e}")
+                REFERENCE_CHECKS.inc(language=data['language'], outcome='unavailable')
+                return jsonify({
+                    'success': False,
+                    'error': f'Could not run the reference solution to verify the tests: {e}'
+                }), 503
         # Insert challenge into DB
         try:
             # REMOVED 'driver_code' from data passed to insert_challenge
@@ -1442,10 +1664,14 @@ def add_challenge():
             print("[DEBUG] Insert result:", result)
             if result and 'challenge_id' in result:
                 print(f"[DEBUG] Challenge added with ID: {result['challenge_id']}")
+                precompute_canonical_verdicts(data['language'], data['difficulty'].lower(), result['challenge_id'],
+                                              reference_results)
+                refresh_catalog_snapshot()
                 return jsonify({
                     'success': True,
                     'message': 'Challenge added successfully',
-                    'challenge_id': result['challenge_id']
+                    'challenge_id': result['challenge_id'],
+                    'filled_expected_outputs': filled
                 })
             else:
                 print("[DEBUG] Failed to insert challenge into database.")
@@ -1466,7 +1692,50 @@ def add_challenge():
             'error': str(e)
         }), 500
 
-@app.route('/api/login', methods=['POST'])
+@bp.route('/api/challenges/import', methods=['POST'])
+def import_challenges_endpoint():
+    """
+    Bulk-add challenges from a JSONL or CSV file (request body, or a multipart 'file'),
+    all or nothing. ?format=jsonl|csv, ?dry_run=1 to only validate,
+    ?verify_reference=1 to also run every reference solution (slow for large files).
+    """
+    upload = request.files.get('file')
+    if upload:
+        lines, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        lines, fmt = request.stream, detect_format(content_type=request.mimetype)
+    fmt = request.args.get('format', fmt)
+    if fmt not in CHALLENGE_FILE_FORMATS:
+        return jsonify({'success': False, 'error': f'Unsupported format. Must be one of: {", ".join(CHALLENGE_FILE_FORMATS)}'}), 400
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    verify = None
+    if request.args.get('verify_reference', '').lower() in ('1', 'true', 'yes'):
+        verify = verify_reference_solution
+    try:
+        result = import_challenges(lines, fmt, dry_run=dry_run, verify=verify)
+    except ReferenceRunError as e:
+        return jsonify({'success': False, 'error': f'Could not run the reference solutions to verify the tests: {e}'}), 503
+    except Exception as e:
+        print(f"[DEBUG] Bulk import failed: {e}")
+        return jsonify({'success': False, 'error': f'Database error: {str(e)}'}), 500
+    if result['success'] and result['imported']:
+        _cache.clear()  # cached challenge lists
+        refresh_catalog_snapshot()
+    return jsonify(result), 200 if result['success'] else 400
+
+@bp.route('/api/challenges/export')
+def export_challenges_endpoint():
+    """Stream stored challenges as JSONL or CSV (?format=, ?language=, ?difficulty=), re-importable as is"""
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in CHALLENGE_FILE_FORMATS:
+        return jsonify({'success': False, 'error': f'Unsupported format. Must be one of: {", ".join(CHALLENGE_FILE_FORMATS)}'}), 400
+    chunks = export_challenges(fmt, request.args.get('language'), request.args.get('difficulty'))
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=challenges.{fmt}'
+    return response
+
+@bp.route('/api/login', methods=['POST'])
 def api_login():
     data = request.get_json()
     username = data.get('username')
@@ -1474,15 +1743,16 @@ def api_login():
     if not username or not password:
         return jsonify({'success': False, 'error': 'Username and password required.'}), 400
     db = DatabaseManager()
-    query = "SELECT user_id, username, password FROM users WHERE username = %s"
+    query = "SELECT user_id, username, fullname, password FROM users WHERE username = %s"
     user = db.execute_query(query, (username,), fetch_one=True)
     if not user:
         return jsonify({'success': False, 'error': 'No account found with that username.'}), 404
-    if not bcrypt.check_password_hash(user['password'], password):
+    if not subsystems().password_hasher.check(user['password'], password):
         return jsonify({'success': False, 'error': 'Incorrect password.'}), 401
+    remember_user(user)
     return jsonify({'success': True, 'user': {'user_id': user['user_id'], 'username': user['username']}})
 
-@app.route('/api/signup', methods=['POST'])
+@bp.route('/api/signup', methods=['POST'])
 def api_signup():
     data = request.get_json()
     fullname = data.get('fullname')
@@ -1505,15 +1775,16 @@ def api_signup():
     if existing_email:
         return jsonify({'success': False, 'error': 'email_exists', 'message': 'Email address already registered. Please use a different email.'}), 409
     
+    hashed_pw = subsystems().password_hasher.hash(password)
     try:
-        hashed_pw = bcrypt.generate_password_hash(password).decode('utf-8')
         insert_query = """
             INSERT INTO users (username, password, emailaddress, fullname)
             VALUES (%s, %s, %s, %s)
-            RETURNING user_id, username
+            RETURNING user_id, username, fullname
         """
         result = db.execute_query(insert_query, (username, hashed_pw, email, fullname), fetch_one=True)
         if result:
+            remember_user(result)
             # Initialize leaderboard entry for new user
             from database_config import initialize_user_leaderboard
             initialize_user_leaderboard(username)
@@ -1524,13 +1795,17 @@ def api_signup():
     except Exception as e:
         return jsonify({'success': False, 'error': f'Error: {str(e)}'}), 500
 
-app.config['SECRET_KEY'] = 'thisisasecretkey'
-bcrypt = Bcrypt(app)
+# The login manager is bound to the app in create_app(); the DB pool itself opens on first query
 db = DatabaseManager()
 
+@bp.errorhandler(HashingBusy)
+def password_hashing_busy(e):
+    response = jsonify({'success': False, 'error': str(e)})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'bugyou.login'
 
 class User(UserMixin):
     def __init__(self, user_id, username):
@@ -1539,9 +1814,12 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    query = "SELECT user_id, username FROM users WHERE user_id = %s"
-    result = db.execute_query(query, (user_id,), fetch_one=True)
-    return User(result['user_id'], result['username']) if result else None
+    try:
+        user_id = int(user_id)  # the session stores it as text
+    except (TypeError, ValueError):
+        return None
+    profile = get_user_identity(user_id)
+    return User(profile['user_id'], profile['username']) if profile else None
 
 class RegisterForm(FlaskForm):
     email = StringField(validators=[InputRequired(), Email()], render_kw={"placeholder": "Email"})
@@ -1559,20 +1837,21 @@ class LoginForm(FlaskForm):
     password = PasswordField(validators=[InputRequired()], render_kw={"placeholder": "Password"})
     submit = SubmitField('Login')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
         if username and password:
-            query = "SELECT user_id, username, password FROM users WHERE username = %s"
+            query = "SELECT user_id, username, fullname, password FROM users WHERE username = %s"
             result = db.execute_query(query, (username,), fetch_one=True)
-            if result and bcrypt.check_password_hash(result['password'], password):
+            if result and subsystems().password_hasher.check(result['password'], password):
+                remember_user(result)
                 login_user(User(result['user_id'], result['username']))
                 return redirect('/')
-    return send_from_directory(STATIC_FOLDERS['login'], 'login.html')
+    return send_page('login', 'login.html')
 
-@app.route('/signup', methods=['GET', 'POST'])
+@bp.route('/signup', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -1583,19 +1862,20 @@ def register():
             check_query = "SELECT user_id FROM users WHERE username = %s"
             existing_user = db.execute_query(check_query, (username,), fetch_one=True)
             if not existing_user:
-                hashed_pw = bcrypt.generate_password_hash(password).decode('utf-8')
+                hashed_pw = subsystems().password_hasher.hash(password)
                 insert_query = """
                     INSERT INTO users (username, password, emailaddress, fullname)
                     VALUES (%s, %s, %s, %s)
-                    RETURNING user_id, username
+                    RETURNING user_id, username, fullname
                 """
                 result = db.execute_query(insert_query, (username, hashed_pw, email, fullname), fetch_one=True)
                 if result:
+                    remember_user(result)
                     login_user(User(result['user_id'], result['username']))
                     return redirect('/')
-    return send_from_directory(STATIC_FOLDERS['signup'], 'signup.html')
+    return send_page('signup', 'signup.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
@@ -1620,6 +1900,7 @@ def get_all_available_challenges():
 import ast
 import re
 
+@traced()
 def discover_python_signature(user_code: str):
     tree = ast.parse(user_code)
     for node in tree.body:
@@ -1634,6 +1915,7 @@ _cpp_signature_regex = re.compile(
     r'\(\s*([^)]*)\)',         # param list
     re.MULTILINE
 )
+@traced()
 def discover_cpp_signature(user_code: str):
     m = _cpp_signature_regex.search(user_code)
     if not m:
@@ -1642,24 +1924,10 @@ def discover_cpp_signature(user_code: str):
     param_names = [p.strip().split()[-1] for p in params.split(',') if p.strip()]
     return return_type.strip(), name, param_names
 
-def cpp_print_snippet(return_type, func_name):
-    rt = return_type.replace('std::', '').replace(' ', '')
-    if rt in ['int', 'double', 'long', 'float', 'char', 'string']:
-        return f"cout << {func_name}(TEST_INPUT) << endl;"
-    elif rt == 'bool':
-        return f"cout << ({func_name}(TEST_INPUT) ? \"true\" : \"false\") << endl;"
-    elif rt == 'vector<int>':
-        return f"auto r = {func_name}(TEST_INPUT); for(auto x : r) cout << x << ' '; cout << endl;"
-    elif rt == 'vector<string>':
-        return f"auto r = {func_name}(TEST_INPUT); for(auto& s : r) cout << s << ' '; cout << endl;"
-    elif rt == 'vector<vector<int>>':
-        return f"auto r = {func_name}(TEST_INPUT); for(auto& row : r){{ for(auto x : row) cout << x << ' '; cout << '|';}} cout << endl;"
-    else:
-        return f"cout << {func_name}(TEST_INPUT) << endl;"
-
 _java_signature_regex = re.compile(
     r'public\s+static\s+\w+\s+([A-Za-z_]\w*)\s*\(([^)]*)\)'
 )
+@traced()
 def discover_java_signature(user_code: str):
     m = _java_signature_regex.search(user_code)
     if not m:
@@ -1671,6 +1939,7 @@ def discover_java_signature(user_code: str):
 _js_signature_regex = re.compile(
     r'function\s+([A-Za-z_]\w*)\s*\(([^)]*)\)'
 )
+@traced()
 def discover_js_signature(user_code: str):
     m = _js_signature_regex.search(user_code)
     if not m:
@@ -1680,34 +1949,83 @@ def discover_js_signature(user_code: str):
     return name, param_names
 
 # ────────────── Driver Builder ──────────────
+@traced()
 def build_driver_snippet(func_name, param_names, language, return_type=None):
-    if language == 'cpp' and return_type is not None:
-        return cpp_print_snippet(return_type, func_name)
+    """
+    Call expression for one test. TEST_INPUT stands for the converted input
+    (JavaScript indexes the test's value as tc); the harness records the result.
+    """
     if language == 'javascript':
         if len(param_names) == 1:
-            return f"console.log({func_name}(tc));"
+            return f"{func_name}(tc)"
         else:
             args = ", ".join(f"tc[{i}]" for i in range(len(param_names)))
-            return f"console.log({func_name}({args}));"
-    elif language == 'java':
-        return f"System.out.println({func_name}(TEST_INPUT));"
-    elif language == 'python':
+            return f"{func_name}({args})"
+    elif language in ('java', 'python', 'cpp'):
         return f"{func_name}(TEST_INPUT)"
-    elif language == 'cpp':
-        return f"cout << {func_name}(TEST_INPUT) << endl;"
     else:
         args = ", ".join(f"tc[{i}]" for i in range(len(param_names)))
         return f"{func_name}({args})"
 
+# ────────────── App Factory ──────────────
+def warm_up():
+    """Build process-wide, fork-safe data up front (called in the master before forking)"""
+    get_static_manifest()
+    current_snapshot()  # map the catalog once; workers share the mapping
+
+def create_app(config=None):
+    """
+    Create the Flask app. Nothing here touches the network: the DB pool,
+    HTTP session and static manifest are all created on first use, so
+    workers start fast and never inherit connections across a fork.
+    """
+    started = time.perf_counter()
+    app = Flask(__name__, static_folder='../frontend/main_page')  # Primary static folder
+    app.config.update(DEFAULT_CONFIG)
+    if config:
+        app.config.update(config)
+    if app.config['TRUSTED_PROXIES'] > 0:
+        # remote_addr is then the client address the nearest trusted proxy saw
+        n = app.config['TRUSTED_PROXIES']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=n, x_proto=n, x_host=n)
+    CORS(app, resources={r"/api/*": {"origins": "*"}})  # Enable CORS for API endpoints
+    BugYouExtension(app)
+    login_manager.init_app(app)
+    app.register_blueprint(bp)
+    # Settings of modules shared by the whole process (trace export, local toolchains, the mapped catalog)
+    configure_tracing(
+        sample_rate=app.config['TRACE_SAMPLE_RATE'],
+        slow_ms=app.config['TRACE_SLOW_MS'],
+        file=app.config['TRACE_FILE'],
+        collector_url=app.config['TRACE_COLLECTOR_URL'],
+    )
+    configure_precheck(languages=app.config['PRECHECK_LANGUAGES'], timeout=app.config['PRECHECK_TIMEOUT'],
+                       executor_versions={lang: config['version'] for lang, config in PISTON_LANGUAGES.items()})
+    configure_reference_check(parallelism=app.config['REFERENCE_CHECK_PARALLELISM'],
+                              max_time_limit_ms=app.config['EXECUTION_TIME_LIMIT_MS'])
+    configure_catalog_snapshot(app.config['CATALOG_SNAPSHOT'])
+    if app.config['PRELOAD_STATIC']:
+        warm_up()
+    app.config['STARTUP_TIME_MS'] = (time.perf_counter() - _module_load_started) * 1000
+    print(f"⚡ BugYou app created in {(time.perf_counter() - started) * 1000:.1f}ms "
+          f"({app.config['STARTUP_TIME_MS']:.1f}ms since import, pid {os.getpid()})")
+    return app
+
 if __name__ == '__main__':
-    print("🔌 Testing database connection...")
-    if test_connection():
-        print("✅ Database connected successfully!")
-        
-        print("🚀 Starting BugYou Flask server...")
-        print("📍 Frontend: http://localhost:5000")
-        print("🔗 API Health: http://localhost:5000/api/health")
-        app.run(host='0.0.0.0', debug=True)
-    else:
-        print("❌ Failed to connect to database. Please check your configuration.")
-        exit(1)
\ No newline at end of file
+    app = create_app()
+
+    def _report_database():
+        print("🔌 Testing database connection...")
+        if test_connection():
+            print("✅ Database connected successfully!")
+        else:
+            print("❌ Failed to connect to database. Please check your configuration.")
+
+    # Check the database in the background instead of blocking startup on it
+    threading.Thread(target=_report_database, daemon=True).start()
+
+    print("🚀 Starting BugYou Flask server...")
+    port = int(os.environ.get('BUGYOU_PORT', 5000))
+    print(f"📍 Frontend: http://localhost:{port}")
+    print(f"🔗 API Health: http://localhost:{port}/api/health")
+    app.run(host=os.environ.get('BUGYOU_HOST', '0.0.0.0'), port=port, debug=True)
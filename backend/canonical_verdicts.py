@@ -0,0 +1,144 @@
+"""
+BugYou Canonical Verdicts
+Stored test results of each challenge's buggy_code and reference_solution
+
+Most first clicks run the untouched buggy_code, and many submissions are the
+reference solution. Their results are computed once, stored with the challenge
+(canonical_verdicts column) and served without calling the executor when a
+submission has the same fingerprint as one of them (code_fingerprint.py), so
+comment and layout edits still match. Verdicts are stored under a hash of the
+canonical source itself:
+
+    {"<source hash>": {"source": "buggy_code",
+                       "results": {"<test key>": {"passed": false, "actual": "3", ...}},
+                       "error": null, "error_tests": []}}
+
+Results are keyed per test like the result ledger (input, expected output,
+literal), so an edited test or source simply stops matching. A compile error is
+stored with the keys of the tests whose driver hit it, and only served for a
+run that includes all of them, since a bad test literal breaks the build just
+like bad code does. Only the challenge's own tests are ever recorded. New
+challenges get both verdicts precomputed when they are added; for older ones,
+every run of a canonical source against the stored tests fills in the ones it covered.
+"""
+
+import time
+import hashlib
+import threading
+
+from metrics import record_cache
+from result_ledger import test_key
+from code_fingerprint import fingerprint, normalize_source
+
+# How long a worker keeps a challenge's canonical sources and verdicts before reloading them
+VERDICT_CACHE_TTL = 300
+CANONICAL_SOURCES = ('buggy_code', 'reference_solution')
+
+
+def source_hash(code):
+    return hashlib.sha256(normalize_source(code).encode('utf-8')).hexdigest()
+
+
+class CanonicalVerdicts:
+    """
+    Per-process view of the stored verdicts. load(challenge_key) returns the challenge
+    (with test cases, sources and 'canonical_verdicts'); save(challenge_key, {hash: verdict})
+    merges verdicts into the stored ones.
+    """
+
+    def __init__(self, load, save, ttl=VERDICT_CACHE_TTL):
+        self._load = load
+        self._save = save
+        self.ttl = ttl
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def _record(self, challenge_key):
+        with self._lock:
+            cached = self._records.get(challenge_key)
+        if cached and time.time() - cached[1] < self.ttl:
+            return cached[0]
+        try:
+            challenge = self._load(challenge_key)
+        except Exception as e:
+            # No database (e.g. a worker serving from the catalog snapshot): run everything
+            print(f"⚠️ Could not load canonical verdicts for {challenge_key}: {e}")
+            challenge = None
+        record = None
+        if challenge:
+            language = challenge_key[0]
+            tests = challenge.get('test_cases', []) + challenge.get('hidden_test_cases', [])
+            fields = [field for field in CANONICAL_SOURCES if challenge.get(field)]
+            record = {
+                'sources': {fingerprint(challenge[field], language): field for field in fields},
+                'digests': {field: source_hash(challenge[field]) for field in fields},
+                'verdicts': challenge.get('canonical_verdicts') or {},
+                'test_keys': {test_key(tc, language) for tc in tests},
+            }
+        with self._lock:
+            self._records[challenge_key] = (record, time.time())
+        return record
+
+    def lookup(self, challenge_key, code, test_cases):
+        """
+        None when code is not a canonical source of the challenge; {'error': ...} when
+        it is known not to compile with these tests; otherwise {index in test_cases: stored result}.
+        """
+        record = self._record(challenge_key)
+        language = challenge_key[0]
+        field = record and record['sources'].get(fingerprint(code, language))
+        if not field:
+            return None
+        verdict = record['verdicts'].get(record['digests'][field]) or {}
+        # Errors stored without their tests (older records) are not trusted
+        error_tests = verdict.get('error_tests')
+        if verdict.get('error') and error_tests and set(error_tests) <= {test_key(tc, language) for tc in test_cases}:
+            record_cache('canonical_verdict', True)
+            return {'error': verdict['error']}
+        known = {}
+        for index, test_case in enumerate(test_cases):
+            result = verdict.get('results', {}).get(test_key(test_case, language))
+            if result is not None:
+                known[index] = dict(result)
+        record_cache('canonical_verdict', len(known) == len(test_cases))
+        return known
+
+    def record(self, challenge_key, code, test_cases, test_results=None, error=None):
+        """
+        Store results (or the compile error) of a canonical source for the challenge's own
+        tests. Results of other tests are dropped; an error is only stored when every test
+        in the run is one of the challenge's.
+        """
+        record = self._record(challenge_key)
+        language = challenge_key[0]
+        field = record and record['sources'].get(fingerprint(code, language))
+        if not field:
+            return False
+        keys = sorted({test_key(tc, language) for tc in test_cases})
+        if error is not None and (not keys or not set(keys) <= record['test_keys']):
+            return False
+        digest = record['digests'][field]
+        current = record['verdicts'].get(digest) or {}
+        verdict = {'source': field, 'results': dict(current.get('results') or {}), 'error': error,
+                   'error_tests': keys if error is not None else []}
+        if error is None:
+            for test_case, result in zip(test_cases, test_results or []):
+                key = test_key(test_case, language)
+                if key in record['test_keys']:
+                    verdict['results'][key] = {k: v for k, v in result.items() if k != 'test_number'}
+        if current and verdict['error'] == current.get('error') and verdict['results'] == current.get('results') \
+                and verdict['error_tests'] == (current.get('error_tests') or []):
+            return False
+        record['verdicts'][digest] = verdict
+        try:
+            self._save(challenge_key, {digest: verdict})
+        except Exception as e:
+            print(f"⚠️ Could not store canonical verdict for {challenge_key}: {e}")
+        return True
+
+    def invalidate(self, challenge_key=None):
+        with self._lock:
+            if challenge_key is None:
+                self._records.clear()
+            else:
+                self._records.pop(challenge_key, None)
@@ -0,0 +1,208 @@
+"""
+BugYou Catalog Snapshot
+Read-only, memory-mapped file of the whole challenge catalog, shared by every worker process
+
+    python backend/catalog_snapshot.py build catalog.snap      # reads every challenge table
+    BUGYOU_CATALOG_SNAPSHOT=catalog.snap python start_server.py
+
+With a snapshot configured, get_challenge_by_id and get_challenges_by_language_difficulty
+answer from the file and only fall back to Postgres for challenges it does not
+have (e.g. added after it was built), so workers serve challenges without a
+database connection. The file is mapped, not read: all workers share the page
+cache's single copy, and a lookup binary-searches the index and decodes just
+the one record it needs.
+
+Layout (little-endian):
+
+    header   HEADER: magic, format version, entry count, index offset, names offset / length
+    records  one zlib-compressed JSON document per entry
+    index    ENTRY per record: language code, difficulty code, challenge_id, offset, length;
+             sorted by (language code, difficulty code, challenge_id)
+    names    JSON {"languages": [...], "difficulties": [...], "created_at": ...} giving the codes
+
+challenge_id LIST_ID (0; SERIAL ids start at 1) holds the challenge list of a
+language / difficulty. Rebuilding replaces the file atomically; workers notice
+within SNAPSHOT_CHECK_INTERVAL seconds and map the new one.
+"""
+
+import os
+import sys
+import json
+import mmap
+import time
+import zlib
+import struct
+import threading
+from decimal import Decimal
+
+MAGIC = b'BUGYCAT1'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sHxxIQQI')
+ENTRY = struct.Struct('<BBxxIQI')
+LIST_ID = 0
+SNAPSHOT_CHECK_INTERVAL = 2.0
+
+
+class SnapshotError(ValueError):
+    """Not a catalog snapshot, or one written by an incompatible version"""
+
+
+def _json_default(value):
+    # NUMERIC columns come back as Decimal; keep the text jsonify() would have sent
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def write_snapshot(path, lists, challenges):
+    """
+    Write a snapshot of lists ({(language, difficulty): [summary rows]}) and challenges
+    (iterable of ((language, difficulty, challenge_id), challenge)) to path, atomically.
+    Returns the number of challenges written.
+    """
+    entries = [((language, difficulty, LIST_ID), rows) for (language, difficulty), rows in lists.items()]
+    entries += list(challenges)
+    languages = sorted({key[0] for key, _ in entries})
+    difficulties = sorted({key[1] for key, _ in entries})
+    codes = ({name: i for i, name in enumerate(languages)}, {name: i for i, name in enumerate(difficulties)})
+
+    partial = f"{path}.{os.getpid()}.tmp"
+    index = []
+    with open(partial, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        for (language, difficulty, challenge_id), document in entries:
+            record = zlib.compress(json.dumps(document, default=_json_default, separators=(',', ':')).encode('utf-8'))
+            index.append((codes[0][language], codes[1][difficulty], int(challenge_id), f.tell(), len(record)))
+            f.write(record)
+        index.sort()
+        index_offset = f.tell()
+        for entry in index:
+            f.write(ENTRY.pack(*entry))
+        names = json.dumps({'languages': languages, 'difficulties': difficulties,
+                            'created_at': time.time()}).encode('utf-8')
+        names_offset = f.tell()
+        f.write(names)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index), index_offset, names_offset, len(names)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+    return len(entries) - len(lists)
+
+
+class CatalogSnapshot:
+    """A mapped snapshot file; lookups decode one record and return a fresh copy"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.identity = _identity(os.fstat(f.fileno()))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f"{path} is not a catalog snapshot")
+        magic, version, self.count, self._index_offset, names_offset, names_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise SnapshotError(f"{path} is not a version {FORMAT_VERSION} catalog snapshot")
+        names = json.loads(self._map[names_offset:names_offset + names_length])
+        self.created_at = names.get('created_at')
+        self._languages = {name: i for i, name in enumerate(names['languages'])}
+        self._difficulties = {name: i for i, name in enumerate(names['difficulties'])}
+
+    def _find(self, language, difficulty, challenge_id):
+        """(offset, length) of a record, by binary search over the index"""
+        try:
+            key = (self._languages[language], self._difficulties[difficulty], int(challenge_id))
+        except (KeyError, TypeError, ValueError):
+            return None
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry = ENTRY.unpack_from(self._map, self._index_offset + middle * ENTRY.size)
+            if entry[:3] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            entry = ENTRY.unpack_from(self._map, self._index_offset + low * ENTRY.size)
+            if entry[:3] == key:
+                return entry[3], entry[4]
+        return None
+
+    def _decode(self, location):
+        offset, length = location
+        return json.loads(zlib.decompress(self._map[offset:offset + length]))
+
+    def challenge(self, language, difficulty, challenge_id):
+        """get_challenge_by_id() result, or None when the snapshot does not have it"""
+        if str(challenge_id) == str(LIST_ID):
+            return None
+        location = self._find(language, difficulty, challenge_id)
+        return self._decode(location) if location else None
+
+    def challenge_list(self, language, difficulty):
+        """get_challenges_by_language_difficulty() result, or None for a table not in the snapshot"""
+        location = self._find(language, difficulty, LIST_ID)
+        return self._decode(location) if location else None
+
+
+def _identity(stat):
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+# ────────────── Process-wide snapshot ──────────────
+_settings = {'path': None}
+_state = {'snapshot': None, 'checked_at': None}
+_lock = threading.Lock()
+
+
+def configure_catalog_snapshot(path=None):
+    """Serve challenges from the snapshot at path (None turns it off)"""
+    with _lock:
+        _settings['path'] = path or None
+        _state['snapshot'] = None
+        _state['checked_at'] = None
+
+
+def snapshot_path():
+    return _settings['path']
+
+
+def current_snapshot():
+    """The mapped snapshot, reopened when the file was replaced; None when unconfigured or unreadable"""
+    path = _settings['path']
+    if not path:
+        return None
+    now = time.monotonic()
+    checked_at = _state['checked_at']
+    if checked_at is not None and now - checked_at < SNAPSHOT_CHECK_INTERVAL:
+        return _state['snapshot']
+    with _lock:
+        checked_at = _state['checked_at']
+        if checked_at is not None and now - checked_at < SNAPSHOT_CHECK_INTERVAL:
+            return _state['snapshot']
+        snapshot = _state['snapshot']
+        try:
+            identity = _identity(os.stat(path))
+            if snapshot is None or snapshot.identity != identity:
+                # The old map stays valid for lookups in flight and is unmapped once unreferenced
+                snapshot = CatalogSnapshot(path)
+        except FileNotFoundError:
+            snapshot = None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring catalog snapshot {path}: {e}")
+            snapshot = None
+        _state['snapshot'] = snapshot
+        _state['checked_at'] = now
+        return snapshot
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3 or sys.argv[1] != 'build':
+        print("usage: python backend/catalog_snapshot.py build <path>")
+        sys.exit(2)
+    from database_config import build_catalog_snapshot
+    started = time.perf_counter()
+    written = build_catalog_snapshot(sys.argv[2])
+    print(f"✅ Wrote {written} challenges to {sys.argv[2]} "
+          f"({os.path.getsize(sys.argv[2]) / 1024:.0f} KiB, {time.perf_counter() - started:.1f}s)")
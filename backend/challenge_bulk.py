@@ -0,0 +1,301 @@
+"""
+BugYou Bulk Challenge Import / Export
+Load or dump whole courses of challenges as JSONL or CSV
+
+JSONL has one challenge per line in the POST /api/challenges shape:
+
+    {"language": "python", "difficulty": "basic", "title": "...", "description": "...",
+     "buggy_code": "...", "reference_solution": "...", "solution_explanation": "...",
+     "hints": ["...", "...", "..."], "test_cases": [{"input": "1, 2", "expected": "3"}, ...],
+     "hidden_test_cases": [...], "param_types": ["int", "int"]}
+
+CSV has one row per challenge with the columns of CSV_COLUMNS (hint_1..3,
+test_case_N_input / _expected, hidden_test_N_input / _expected, param_types as
+a JSON list). Every record is validated like a single POST, all errors are
+reported at once, and nothing is stored unless the whole file is valid; then
+all challenges go in with batched multi-row INSERTs in one transaction.
+
+    python backend/challenge_bulk.py import course.jsonl
+    python backend/challenge_bulk.py import course.csv --dry-run
+    python backend/challenge_bulk.py export --language python -o python.jsonl
+
+Over HTTP: POST /api/challenges/import (the file as the body) and
+GET /api/challenges/export, both taking format=jsonl|csv.
+"""
+
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+
+from database_config import CHALLENGE_TABLES, VISIBLE_TEST_SLOTS, HIDDEN_TEST_SLOTS, insert_challenges, iter_challenges
+from metrics import counter
+from test_schema import TestSchemaError, build_test_schema, input_key
+
+BULK_CHALLENGES = counter(
+    'bugyou_bulk_challenges_total',
+    'Challenges handled by bulk import / export (imported, rejected, exported)',
+    ('operation',)
+)
+
+FORMATS = ('jsonl', 'csv')
+REQUIRED_FIELDS = ['language', 'difficulty', 'title', 'description', 'buggy_code', 'reference_solution',
+                   'solution_explanation', 'hints', 'test_cases', 'hidden_test_cases']
+VALID_DIFFICULTIES = ['basic', 'intermediate', 'advanced']
+# Errors listed in a rejected import; the count covers all of them
+MAX_REPORTED_ERRORS = 50
+
+CSV_COLUMNS = (
+    ['language', 'difficulty', 'title', 'description', 'buggy_code', 'reference_solution',
+     'solution_explanation', 'hint_1', 'hint_2', 'hint_3', 'learning_objective']
+    + [f'test_case_{i}_{part}' for i in range(1, VISIBLE_TEST_SLOTS + 1) for part in ('input', 'expected')]
+    + [f'hidden_test_{i}_{part}' for i in range(1, HIDDEN_TEST_SLOTS + 1) for part in ('input', 'expected')]
+    + ['param_types']
+)
+
+
+class ChallengeValidationError(ValueError):
+    """A challenge that can't be stored as given"""
+
+
+# ────────────── Validation ──────────────
+def validate_challenge(data):
+    """
+    Check a challenge in the POST /api/challenges shape and return a copy ready
+    for insert_challenge (difficulty lower-cased, test_schema built).
+    """
+    if not isinstance(data, dict):
+        raise ChallengeValidationError('A challenge must be a JSON object')
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in data or not data[field]]
+    if missing_fields:
+        raise ChallengeValidationError(f'Missing required fields: {", ".join(missing_fields)}')
+    if not isinstance(data['test_cases'], list) or len(data['test_cases']) < 3:
+        raise ChallengeValidationError('At least 3 visible test cases are required')
+    if len(data['test_cases']) > VISIBLE_TEST_SLOTS:
+        raise ChallengeValidationError(f'At most {VISIBLE_TEST_SLOTS} visible test cases are supported')
+    if not isinstance(data['hidden_test_cases'], list) or len(data['hidden_test_cases']) != HIDDEN_TEST_SLOTS:
+        raise ChallengeValidationError('Exactly 2 hidden test cases are required')
+    if not all(isinstance(tc, dict) and 'input' in tc for tc in data['test_cases'] + data['hidden_test_cases']):
+        raise ChallengeValidationError('Every test case needs an input')
+    if not isinstance(data['hints'], list) or len(data['hints']) != 3:
+        raise ChallengeValidationError('Exactly 3 hints are required')
+    if data['language'] not in CHALLENGE_TABLES:
+        raise ChallengeValidationError(f'Unsupported language. Must be one of: {", ".join(CHALLENGE_TABLES)}')
+    if not isinstance(data['difficulty'], str) or data['difficulty'].lower() not in VALID_DIFFICULTIES:
+        raise ChallengeValidationError(f'Invalid difficulty. Must be one of: {", ".join(VALID_DIFFICULTIES)}')
+    data = dict(data, difficulty=data['difficulty'].lower())
+    data['test_cases'] = [dict(tc, expected=tc.get('expected', '')) for tc in data['test_cases']]
+    data['hidden_test_cases'] = [dict(tc, expected=tc.get('expected', '')) for tc in data['hidden_test_cases']]
+    # Validate every test input against the parameter types once, and pre-render its literals
+    tests = data['test_cases'] + data['hidden_test_cases']
+    try:
+        data['test_schema'] = build_test_schema([tc.get('input') for tc in tests], data.get('param_types'))
+    except TestSchemaError as e:
+        raise ChallengeValidationError(str(e)) from None
+    # Baselines travel with exported tests; a reference check replaces them
+    baselines = {input_key(tc['input']): tc['baseline_ms'] for tc in tests
+                 if isinstance(tc.get('baseline_ms'), (int, float)) and not isinstance(tc['baseline_ms'], bool)}
+    if baselines:
+        data['test_schema']['baseline_ms'] = baselines
+    return data
+
+
+# ────────────── Reading ──────────────
+def detect_format(name=None, content_type=None, default='jsonl'):
+    """'csv' or 'jsonl' from a file name or content type"""
+    if (name or '').lower().endswith('.csv') or 'csv' in (content_type or ''):
+        return 'csv'
+    if (name or '').lower().endswith(('.jsonl', '.ndjson', '.json')) or 'json' in (content_type or ''):
+        return 'jsonl'
+    return default
+
+
+def _text_lines(lines):
+    for line in lines:
+        yield line.decode('utf-8-sig') if isinstance(line, bytes) else line
+
+
+def read_jsonl(lines):
+    """(line number, record or ChallengeValidationError) per non-blank line"""
+    for number, line in enumerate(_text_lines(lines), 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ChallengeValidationError(f'Invalid JSON: {e}')
+
+
+def csv_record(row):
+    """One CSV row (dict of CSV_COLUMNS) in the POST /api/challenges shape"""
+    def cell(name):
+        value = row.get(name)
+        return value if value not in (None, '') else None
+
+    def tests(prefix, count):
+        return [{'input': cell(f'{prefix}_{i}_input'), 'expected': cell(f'{prefix}_{i}_expected') or ''}
+                for i in range(1, count + 1) if cell(f'{prefix}_{i}_input') is not None]
+
+    record = {name: cell(name) for name in CSV_COLUMNS[:11] if not name.startswith('hint_')}
+    record['hints'] = [cell(f'hint_{i}') for i in range(1, 4) if cell(f'hint_{i}')]
+    record['test_cases'] = tests('test_case', VISIBLE_TEST_SLOTS)
+    record['hidden_test_cases'] = tests('hidden_test', HIDDEN_TEST_SLOTS)
+    if cell('param_types'):
+        try:
+            record['param_types'] = json.loads(row['param_types'])
+        except ValueError:
+            raise ChallengeValidationError('param_types must be a JSON list, e.g. ["int[]", "int"]') from None
+    return record
+
+
+def read_csv(lines):
+    """(row number, record or ChallengeValidationError) per data row"""
+    reader = csv.DictReader(_text_lines(lines))
+    unknown = set(reader.fieldnames or []) - set(CSV_COLUMNS)
+    if unknown:
+        yield 1, ChallengeValidationError(f'Unknown CSV columns: {", ".join(sorted(unknown))}')
+        return
+    for row in reader:
+        try:
+            yield reader.line_num, csv_record(row)
+        except ChallengeValidationError as e:
+            yield reader.line_num, e
+
+
+def read_challenges(lines, fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format {fmt!r} (expected one of {", ".join(FORMATS)})')
+    return read_jsonl(lines) if fmt == 'jsonl' else read_csv(lines)
+
+
+# ────────────── Import ──────────────
+def import_challenges(lines, fmt='jsonl', dry_run=False, verify=None):
+    """
+    Validate every challenge in a JSONL/CSV stream and, if all are valid, store
+    them in one transaction. verify(challenge), when given, runs further checks
+    (e.g. the reference solution) and raises ValueError for a bad challenge.
+    Returns {'success', 'imported', 'challenge_ids' | 'errors', ...}.
+    """
+    started = time.perf_counter()
+    challenges, errors, error_count = [], [], 0
+    for number, record in read_challenges(lines, fmt):
+        try:
+            if isinstance(record, Exception):
+                raise record
+            challenge = validate_challenge(record)
+            if verify:
+                verify(challenge)
+            challenges.append(challenge)
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                title = record.get('title') if isinstance(record, dict) else None
+                errors.append({'line': number, 'title': title, 'error': str(e)})
+    if error_count:
+        BULK_CHALLENGES.inc(error_count, operation='rejected')
+        return {'success': False, 'imported': 0, 'valid': len(challenges), 'invalid': error_count,
+                'error': f'{error_count} invalid challenge(s); nothing was imported', 'errors': errors}
+    if not challenges:
+        return {'success': False, 'imported': 0, 'error': 'No challenges found in the file', 'errors': []}
+    if dry_run:
+        return {'success': True, 'imported': 0, 'valid': len(challenges), 'dry_run': True}
+    ids = insert_challenges(challenges)
+    BULK_CHALLENGES.inc(len(ids), operation='imported')
+    return {
+        'success': True,
+        'imported': len(ids),
+        'challenge_ids': [{'language': c['language'], 'difficulty': c['difficulty'], 'challenge_id': challenge_id}
+                          for c, challenge_id in zip(challenges, ids)],
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+# ────────────── Export ──────────────
+def csv_row(challenge):
+    row = {name: challenge.get(name) for name in CSV_COLUMNS[:11] if not name.startswith('hint_')}
+    for i, hint in enumerate(challenge.get('hints', [])[:3], 1):
+        row[f'hint_{i}'] = hint
+    for prefix, key in (('test_case', 'test_cases'), ('hidden_test', 'hidden_test_cases')):
+        for i, test in enumerate(challenge.get(key, []), 1):
+            row[f'{prefix}_{i}_input'] = test.get('input')
+            row[f'{prefix}_{i}_expected'] = test.get('expected')
+    if challenge.get('param_types'):
+        row['param_types'] = json.dumps(challenge['param_types'])
+    return row
+
+
+def export_challenges(fmt='jsonl', language=None, difficulty=None):
+    """Chunks of a JSONL/CSV export, produced while the rows stream from the database"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format {fmt!r} (expected one of {", ".join(FORMATS)})')
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    if fmt == 'csv':
+        writer.writeheader()
+        yield buffer.getvalue()
+    for challenge in iter_challenges(language, difficulty):
+        BULK_CHALLENGES.inc(operation='exported')
+        if fmt == 'jsonl':
+            challenge.pop('challenge_id', None)
+            yield json.dumps(challenge, ensure_ascii=False) + '\n'
+        else:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(csv_row(challenge))
+            yield buffer.getvalue()
+
+
+# ────────────── Command line ──────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk import / export BugYou challenges')
+    commands = parser.add_subparsers(dest='command', required=True)
+    importer = commands.add_parser('import', help='validate and load a JSONL or CSV file in one transaction')
+    importer.add_argument('file', help="challenge file, or - for stdin")
+    importer.add_argument('--format', choices=FORMATS, help='default: from the file extension, else jsonl')
+    importer.add_argument('--dry-run', action='store_true', help='validate only')
+    importer.add_argument('--verify-reference', action='store_true',
+                          help="run each reference solution against its tests on the executor (slow)")
+    exporter = commands.add_parser('export', help='write stored challenges as JSONL or CSV')
+    exporter.add_argument('--format', choices=FORMATS, help='default: from --output, else jsonl')
+    exporter.add_argument('--language', choices=list(CHALLENGE_TABLES))
+    exporter.add_argument('--difficulty', choices=VALID_DIFFICULTIES)
+    exporter.add_argument('-o', '--output', help='default: stdout')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        fmt = args.format or detect_format(args.file)
+        verify = None
+        if args.verify_reference:
+            from app import create_app, verify_reference_solution  # pulls in the whole web app
+            app = create_app()
+
+            def verify(data):
+                with app.app_context():  # the executor client lives on the app
+                    return verify_reference_solution(data)
+        source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8-sig', newline='')
+        with source:
+            result = import_challenges(source, fmt, dry_run=args.dry_run, verify=verify)
+        if result['success']:
+            done = f"{result['valid']} valid" if args.dry_run else f"Imported {result['imported']} challenges in {result['seconds']}s"
+            print(f"✅ {done}")
+            return 0
+        print(f"❌ {result['error']}")
+        for error in result['errors']:
+            print(f"  line {error['line']}: {error['error']}")
+        return 1
+
+    fmt = args.format or detect_format(args.output)
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        for chunk in export_challenges(fmt, args.language, args.difficulty):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,323 @@
+"""
+BugYou Code Fingerprint
+Canonical fingerprint of a program: what it does, not how it is laid out
+
+Students edit comments, re-indent and add blank lines between runs far more
+often than they change code. Every execution-level cache (single runs, batch
+runs and the in-flight runs they share, the result ledger, and matching against
+canonical verdicts) keys code by fingerprint(code, language), so those edits
+reuse the previous result instead of going to the executor again.
+
+The fingerprint hashes the program's tokens with comments and insignificant
+whitespace removed:
+
+- Python: the tokenize module's tokens, without comments and blank lines.
+  Indentation is kept as written (it is syntax), and so is a coding cookie.
+- C++, Java, JavaScript: a small lexer that keeps string, character, template
+  and regex literals verbatim, drops comments, and collapses each run of
+  whitespace to one space, or to one newline when it spans lines (preprocessor
+  directives and JavaScript's automatic semicolons depend on line breaks).
+  Whether two tokens were separated is kept, so `a - -b` and `a--b` differ.
+
+Code the lexer is not sure about (unterminated literals, C++ raw strings, a `/`
+after `}` in JavaScript, Unicode escapes in Java comments, ...) falls back to
+the source with only line endings and trailing whitespace normalized: such code
+is compared more strictly, not less.
+
+A cached result is only right for another program with the same fingerprint
+if everything else the run is built from depends on the same text. The driver
+does: C++, Java and JavaScript signatures are looked up in
+code_without_comments(code, language), the text the fingerprint hashes, and
+Python's in the AST, which has no comments either. Anything new that reads the
+source to build a run must do the same.
+
+Line numbers in a reused error message are those of the run that filled the cache.
+"""
+
+import io
+import re
+import hashlib
+import tokenize
+from functools import lru_cache
+
+FINGERPRINT_CACHE_SIZE = 512
+
+_WHITESPACE = {
+    'cpp': ' \t\v\f\r\n',
+    'java': ' \t\f\r\n',
+}
+_NEWLINES = {
+    'cpp': '\r\n',
+    'java': '\r\n',
+    'javascript': '\r\n\u2028\u2029',
+}
+_QUOTES = {
+    'cpp': '"\'',
+    'java': '"\'',
+    'javascript': '"\'`',
+}
+# After these words a `/` starts a regex literal rather than a division
+_REGEX_KEYWORDS = frozenset({
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+    'case', 'do', 'else', 'yield', 'await',
+})
+_WORD = re.compile(r'[\w$]+')
+_CPP_NUMBER = re.compile(r"\d(?:'?[\w.])*")  # digit separators: 1'000'000
+_CPP_RAW_PREFIX = re.compile(r'(?:u8|[uUL])?R$')
+_SPLICE = re.compile(r'\\[ \t]*(?:\r\n|\n|\r)')
+_CODING_COOKIE = re.compile(r'^[ \t\f]*#.*?coding[:=]')
+
+
+def normalize_source(code):
+    """Line endings, trailing whitespace and surrounding blank lines never change a result"""
+    lines = (code or '').replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+class _Unlexable(Exception):
+    """The lexer cannot be sure what this code means; fall back to the raw source"""
+
+
+@lru_cache(maxsize=FINGERPRINT_CACHE_SIZE)
+def fingerprint(code, language):
+    """Hex digest that is equal for two programs differing only in comments and layout"""
+    if language == 'python':
+        try:
+            canonical = 'tokens:' + _python_tokens(code or '')
+        except _Unlexable:
+            canonical = 'source:' + normalize_source(code)
+    else:
+        canonical = _c_canonical(code, language)
+    return hashlib.sha256(f'{language}\0{canonical}'.encode('utf-8')).hexdigest()
+
+
+def code_without_comments(code, language):
+    """
+    C++, Java or JavaScript source as the fingerprint sees it: comments removed and
+    whitespace collapsed (the same program). Other languages are returned unchanged.
+    """
+    if language not in _QUOTES:
+        return code
+    return _c_canonical(code, language).split(':', 1)[1]
+
+
+@lru_cache(maxsize=FINGERPRINT_CACHE_SIZE)
+def _c_canonical(code, language):
+    try:
+        if language not in _QUOTES:
+            raise _Unlexable(language)
+        return 'tokens:' + _CLexer(code or '', language).canonical()
+    except _Unlexable:
+        return 'source:' + normalize_source(code)
+
+
+# ────────────── Python ──────────────
+def _python_tokens(code):
+    fstring_start = getattr(tokenize, 'FSTRING_START', None)  # Python 3.12+
+    fstring_end = getattr(tokenize, 'FSTRING_END', None)
+    offsets = [0]
+    for line in io.StringIO(code).readlines():  # the lines tokenize numbers
+        offsets.append(offsets[-1] + len(line))
+    tokens = []
+    fstring_depth = 0
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type == tokenize.ERRORTOKEN:
+                raise _Unlexable('error token')
+            if fstring_depth or tok.type == fstring_start:
+                # f"{x = }" prints its own source text: keep whole f-strings verbatim
+                if tok.type == fstring_start:
+                    fstring_depth += 1
+                    if fstring_depth == 1:
+                        start = tok.start
+                elif tok.type == fstring_end:
+                    fstring_depth -= 1
+                    if not fstring_depth:
+                        text = code[offsets[start[0] - 1] + start[1]:offsets[tok.end[0] - 1] + tok.end[1]]
+                        tokens.append(f'{tokenize.STRING} {len(text)} {text}')
+                continue
+            if tok.type in (tokenize.NL, tokenize.ENCODING):
+                continue
+            if tok.type == tokenize.COMMENT and not (tok.start[0] <= 2 and _CODING_COOKIE.match(tok.line)):
+                continue
+            text = '' if tok.type == tokenize.NEWLINE else tok.string
+            tokens.append(f'{tok.type} {len(text)} {text}')
+    except (tokenize.TokenError, SyntaxError) as e:
+        raise _Unlexable(str(e))
+    return '\n'.join(tokens)
+
+
+# ────────────── C++, Java, JavaScript ──────────────
+class _CLexer:
+    def __init__(self, code, language):
+        self.code = code
+        self.language = language
+        self.whitespace = _WHITESPACE.get(language)
+        self.newlines = _NEWLINES[language]
+        self.quotes = _QUOTES[language]
+        self.out = []
+        self.separator = ''
+        self.last = None  # last token, to tell a JavaScript regex from a division
+
+    def _is_space(self, c):
+        return c.isspace() if self.whitespace is None else c in self.whitespace
+
+    def _emit(self, text, token=None):
+        if self.out and self.separator:
+            self.out.append(self.separator)
+        self.separator = ''
+        self.out.append(text)
+        self.last = token if token is not None else text
+
+    def _separate(self, newline):
+        if newline:
+            self.separator = '\n'
+        elif not self.separator:
+            self.separator = ' '
+
+    def canonical(self):
+        code, n, i = self.code, len(self.code), 0
+        while i < n:
+            c = code[i]
+            if self.language == 'cpp' and c == '\\':
+                splice = _SPLICE.match(code, i)
+                if splice:
+                    i = splice.end()  # the line continues; tokens on both sides may join
+                    continue
+            if self._is_space(c):
+                start = i
+                while i < n and self._is_space(code[i]):
+                    i += 1
+                self._separate(any(ch in self.newlines for ch in code[start:i]))
+            elif code.startswith('//', i):
+                i = self._line_comment(i)
+            elif code.startswith('/*', i):
+                end = code.find('*/', i + 2)
+                if end < 0:
+                    raise _Unlexable('unterminated comment')
+                self._check_comment(code[i:end])
+                # A comment is whitespace; in JavaScript one spanning lines also ends a statement
+                self._separate(self.language == 'javascript'
+                               and any(ch in self.newlines for ch in code[i:end]))
+                i = end + 2
+            elif c in self.quotes:
+                if self.language == 'cpp' and self.last and not self.separator and _CPP_RAW_PREFIX.search(self.last):
+                    raise _Unlexable('raw string literal')
+                end = self._literal(i)
+                self._emit(code[i:end], token='"')
+                i = end
+            elif c == '/' and self.language == 'javascript' and self._regex_allowed():
+                end = self._regex(i)
+                self._emit(code[i:end], token='"')
+                i = end
+            elif c.isalnum() or c in '_$':
+                number = _CPP_NUMBER.match(code, i) if self.language == 'cpp' and c.isdigit() else None
+                end = (number or _WORD.match(code, i)).end()
+                self._emit(code[i:end])
+                i = end
+            else:
+                self._emit(c)
+                i += 1
+        return ''.join(self.out)
+
+    def _line_comment(self, i):
+        """End of the // comment starting at i (its line break is left for the whitespace)"""
+        code, n = self.code, len(self.code)
+        line = end = i
+        while True:
+            while end < n and code[end] not in self.newlines:
+                end += 1
+            # In C++ a backslash at the end of a // comment continues it on the next line
+            splice = _SPLICE.search(code, line, min(n, end + 2)) if self.language == 'cpp' else None
+            if not splice:
+                break
+            line = end = splice.end()
+        self._check_comment(code[i:end])
+        self._separate(False)
+        return end
+
+    def _check_comment(self, text):
+        # Java turns \u000a into a line break before it looks for comments
+        if self.language == 'java' and '\\u' in text:
+            raise _Unlexable('unicode escape in comment')
+
+    def _literal(self, i):
+        """End of the string, character or template literal starting at i"""
+        code, n = self.code, len(self.code)
+        quote = code[i]
+        if self.language == 'java' and code.startswith('"""', i):
+            end = code.find('"""', i + 3)
+            while end >= 0 and _escaped(code, end):
+                end = code.find('"""', end + 1)
+            if end < 0:
+                raise _Unlexable('unterminated text block')
+            return end + 3
+        j = i + 1
+        while j < n:
+            c = code[j]
+            if c == '\\':
+                j += 2
+            elif c == quote:
+                return j + 1
+            elif quote == '`' and code.startswith('${', j):
+                j = self._template_expression(j + 2)
+            elif c in self.newlines and quote != '`':
+                break
+            else:
+                j += 1
+        raise _Unlexable('unterminated literal')
+
+    def _template_expression(self, j):
+        """End of a ${...} inside a template literal (only simple ones; others fall back)"""
+        code, n = self.code, len(self.code)
+        depth = 1
+        while j < n:
+            c = code[j]
+            if c in '`/':
+                raise _Unlexable('nested template or regex in template expression')
+            if c in '"\'':
+                j = self._literal(j)
+                continue
+            if c == '{':
+                depth += 1
+            elif c == '}':
+                depth -= 1
+                if not depth:
+                    return j + 1
+            j += 1
+        raise _Unlexable('unterminated template expression')
+
+    def _regex_allowed(self):
+        last = self.last
+        if last is None:
+            return True
+        if last == '}':
+            raise _Unlexable('regex or division after }')  # block end or object literal
+        if last in _REGEX_KEYWORDS:
+            return True
+        return not (last[-1].isalnum() or last[-1] in '_$)]"')
+
+    def _regex(self, i):
+        """End of the regex literal starting at i (flags are lexed as a word)"""
+        code, n = self.code, len(self.code)
+        j, in_class = i + 1, False
+        while j < n and code[j] not in self.newlines:
+            c = code[j]
+            if c == '\\':
+                j += 2
+                continue
+            if c == '[':
+                in_class = True
+            elif c == ']':
+                in_class = False
+            elif c == '/' and not in_class:
+                return j + 1
+            j += 1
+        raise _Unlexable('unterminated regex')
+
+
+def _escaped(code, index):
+    backslashes = 0
+    while index - backslashes - 1 >= 0 and code[index - backslashes - 1] == '\\':
+        backslashes += 1
+    return backslashes % 2 == 1
@@ -4,14 +4,36 @@ PostgreSQL connection settings for language-specific challenge tables using Neon
 """
 
 import os
+import re
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from contextlib import contextmanager
 import time
 import json
 from datetime import datetime, timedelta
 from functools import lru_cache
+from metrics import histogram, counter, record_cache
+from tracing import span, traced
+from test_schema import attach_literals, input_key as test_input_key
+from catalog_snapshot import current_snapshot, write_snapshot
+from identity_map import IdentityMap
+from user_stats_cache import UserStatsCache
+
+DB_QUERY_DURATION = histogram(
+    'bugyou_db_query_duration_seconds',
+    'Query latency by statement (verb + main table)',
+    ('statement',)
+)
+DB_POOL_WAIT = histogram(
+    'bugyou_db_pool_wait_seconds',
+    'Time spent getting a connection from the pool (includes opening new connections)'
+)
+DB_ERRORS = counter(
+    'bugyou_db_errors_total',
+    'Failed queries by statement',
+    ('statement',)
+)
 
 # Database connection settings for Neon DB
 DATABASE_CONFIG = {
@@ -22,20 +44,40 @@ DATABASE_CONFIG = {
     'sslmode': 'require'
 }
 
-# Connection pool for better performance
+# A libpq connection string (e.g. postgresql://postgres@localhost/bugyou) replaces the Neon settings
+if os.environ.get('BUGYOU_DATABASE_URL'):
+    DATABASE_CONFIG = {'dsn': os.environ['BUGYOU_DATABASE_URL']}
+
+# Connection pool for better performance (one per process, created on first query)
 _connection_pool = None
+_connection_pool_pid = None
+# Pools inherited through fork(); kept referenced so their sockets are never
+# closed (and the parent's sessions terminated) by the child's garbage collector
+_inherited_pools = []
 
 def get_connection_pool():
     """Get or create connection pool"""
-    global _connection_pool
+    global _connection_pool, _connection_pool_pid
+    if _connection_pool is not None and _connection_pool_pid != os.getpid():
+        _inherited_pools.append(_connection_pool)
+        _connection_pool = None
     if _connection_pool is None:
-        _connection_pool = SimpleConnectionPool(
+        # Thread-safe pool: production workers serve several requests concurrently
+        _connection_pool = ThreadedConnectionPool(
             minconn=1,
             maxconn=10,
             **DATABASE_CONFIG
         )
+        _connection_pool_pid = os.getpid()
     return _connection_pool
 
+def close_connection_pool():
+    """Close all pooled connections (called in the master process before forking workers)"""
+    global _connection_pool
+    if _connection_pool is not None and _connection_pool_pid == os.getpid():
+        _connection_pool.closeall()
+    _connection_pool = None
+
 # Supported language-difficulty combinations
 CHALLENGE_TABLES = {
     'python': {
@@ -65,14 +107,21 @@ class DatabaseManager:
     
     def __init__(self, config=None):
         self.config = config or DATABASE_CONFIG
-        self.pool = get_connection_pool()
+
+    @property
+    def pool(self):
+        # Resolved on every use so a pool closed/recreated around a fork is picked up
+        return get_connection_pool()
         
     @contextmanager
     def get_connection(self):
         """Get database connection from pool with automatic cleanup"""
         conn = None
+        pool = self.pool
         try:
-            conn = self.pool.getconn()
+            wait_start = time.perf_counter()
+            conn = pool.getconn()
+            DB_POOL_WAIT.observe(time.perf_counter() - wait_start)
             yield conn
         except psycopg2.Error as e:
             if conn:
@@ -80,7 +129,7 @@ class DatabaseManager:
             raise e
         finally:
             if conn:
-                self.pool.putconn(conn)
+                pool.putconn(conn)
     
     @contextmanager
     def get_cursor(self, dict_cursor=True):
@@ -96,8 +145,9 @@ class DatabaseManager:
     def execute_query(self, query, params=None, fetch_one=False, fetch_all=True):
         """Execute a query and return results with performance logging"""
         start_time = time.time()
+        statement = statement_label(query)
         try:
-            with self.get_cursor() as (cursor, conn):
+            with span('db.query', statement=statement), self.get_cursor() as (cursor, conn):
                 cursor.execute(query, params)
                 
                 # Always commit for INSERT, UPDATE, DELETE operations
@@ -114,14 +164,46 @@ class DatabaseManager:
                 
                 # Log slow queries
                 execution_time = time.time() - start_time
+                DB_QUERY_DURATION.observe(execution_time, statement=statement)
                 if execution_time > 0.5:  # Log queries taking more than 500ms
                     print(f"Slow query detected: {execution_time:.3f}s - {query[:100]}...")
                 
                 return result
         except Exception as e:
+            DB_ERRORS.inc(statement=statement)
             print(f"Database error: {e}")
             raise e
 
+_statement_table_regex = re.compile(r'\b(?:FROM|INTO|UPDATE|ON|TABLE)\s+([A-Za-z_]\w*)', re.IGNORECASE)
+
+@lru_cache(maxsize=512)
+def statement_label(query):
+    """Low-cardinality metric label for a query, e.g. 'select users' or 'insert python_basic'"""
+    words = query.split(None, 1)
+    verb = words[0].lower() if words else 'unknown'
+    match = _statement_table_regex.search(query)
+    return f"{verb} {match.group(1).lower()}" if match else verb
+
+# Columns added to the challenge tables after they were first created
+CHALLENGE_EXTRA_COLUMNS = {
+    'test_schema': 'JSONB',         # typed, pre-rendered test inputs (test_schema.py)
+    'canonical_verdicts': 'JSONB',  # stored results of buggy_code / reference_solution (canonical_verdicts.py)
+}
+
+def migrate_challenge_columns():
+    """
+    One-off schema step, run before deploying code that reads these columns:
+    python backend/database_config.py migrate. Adds CHALLENGE_EXTRA_COLUMNS to
+    every challenge table missing them; safe to run again.
+    """
+    db = DatabaseManager()
+    tables = [table for difficulties in CHALLENGE_TABLES.values() for table in difficulties.values()]
+    for table in tables:
+        for column, column_type in CHALLENGE_EXTRA_COLUMNS.items():
+            db.execute_query(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {column_type}", fetch_all=False)
+    print(f"✅ Challenge columns present on {len(tables)} tables")
+    return True
+
 def get_table_name(language, difficulty):
     """Get table name for language and difficulty"""
     if language in CHALLENGE_TABLES and difficulty in CHALLENGE_TABLES[language]:
@@ -129,9 +211,16 @@ def get_table_name(language, difficulty):
     else:
         raise ValueError(f"Unsupported combination: {language} - {difficulty}")
 
-def get_challenges_by_language_difficulty(language, difficulty):
+def get_challenges_by_language_difficulty(language, difficulty, use_snapshot=True):
     """Get all challenges for a specific language and difficulty with caching"""
     table_name = get_table_name(language, difficulty)
+    if use_snapshot:
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            challenges = snapshot.challenge_list(language, difficulty)
+            record_cache('catalog_snapshot', challenges is not None)
+            if challenges is not None:
+                return challenges
     db = DatabaseManager()
     query = f"""
         SELECT 
@@ -146,140 +235,207 @@ def get_challenges_by_language_difficulty(language, difficulty):
     """
     return db.execute_query(query)
 
-def get_challenge_by_id(language, difficulty, challenge_id):
-    """Get a specific challenge with all its details including test cases."""
+# Columns get_challenge_by_id() reads; shape_challenge() turns such a row into the API shape
+CHALLENGE_DETAIL_COLUMNS = """
+    challenge_id,
+    title,
+    problem_statement,
+    buggy_code,
+    reference_solution,
+    solution_explanation,
+    hint_1,
+    hint_2,
+    hint_3,
+    learning_objectives,
+    max_score,
+    test_case_1_input,
+    test_case_1_expected,
+    test_case_2_input,
+    test_case_2_expected,
+    test_case_3_input,
+    test_case_3_expected,
+    test_case_4_input,
+    test_case_4_expected,
+    test_case_5_input,
+    test_case_5_expected,
+    hidden_test_1_input,
+    hidden_test_1_expected,
+    hidden_test_2_input,
+    hidden_test_2_expected,
+    test_schema,
+    success_rate,
+    avg_attempts
+"""
+
+@traced()
+def get_challenge_by_id(language, difficulty, challenge_id, with_verdicts=False, use_snapshot=True):
+    """
+    Get a specific challenge with all its details including test cases.
+    with_verdicts adds the stored canonical_verdicts (server-side use only, they are large).
+    Served from the catalog snapshot when one is configured and has it (see catalog_snapshot.py).
+    """
     table_name = get_table_name(language, difficulty)
+    if use_snapshot and not with_verdicts:
+        snapshot = current_snapshot()
+        if snapshot is not None:
+            challenge = snapshot.challenge(language, difficulty, challenge_id)
+            record_cache('catalog_snapshot', challenge is not None)
+            if challenge is not None:
+                return challenge
     db = DatabaseManager()
     query = f"""
-        SELECT 
-            challenge_id,
-            title,
-            problem_statement,
-            buggy_code,
-            reference_solution,
-            solution_explanation,
-            hint_1,
-            hint_2,
-            hint_3,
-            learning_objectives,
-            max_score,
-            test_case_1_input,
-            test_case_1_expected,
-            test_case_2_input,
-            test_case_2_expected,
-            test_case_3_input,
-            test_case_3_expected,
-            test_case_4_input,
-            test_case_4_expected,
-            test_case_5_input,
-            test_case_5_expected,
-            hidden_test_1_input,
-            hidden_test_1_expected,
-            hidden_test_2_input,
-            hidden_test_2_expected,
-            success_rate,
-            avg_attempts
+        SELECT {CHALLENGE_DETAIL_COLUMNS}{', canonical_verdicts' if with_verdicts else ''}
         FROM {table_name}
         WHERE challenge_id = %s
     """
     challenge = db.execute_query(query, (challenge_id,), fetch_one=True)
-    
-    if challenge:
-        # Add difficulty information from the table context
-        challenge['difficulty'] = difficulty
-        challenge['language'] = language
-        
-        # Combine hints into an array
-        hints = []
-        for i in range(1, 4):  # hint_1 through hint_3
-            hint_key = f'hint_{i}'
-            if hint_key in challenge and challenge[hint_key]:
-                hints.append(challenge[hint_key])
-        challenge['hints'] = hints
-        
-        # Extract test cases from the challenge record
-        test_cases = []
-        for i in range(1, 6):  # Up to 5 test cases
-            input_key = f'test_case_{i}_input'
-            expected_key = f'test_case_{i}_expected'
-            
-            # Get values, handling None cases
-            test_input = challenge.get(input_key)
-            test_expected = challenge.get(expected_key)
-            
-            # If we have at least one test case field, create a test case with defaults
-            if test_input is not None or test_expected is not None:
-                # Provide defaults for C++ if data is missing
-                if language == 'cpp':
-                    if test_input is None or test_input == '':
-                        test_input = '[1, 2, 3]'  # Default vector input
-                    if test_expected is None or test_expected == '':
-                        test_expected = '3'  # Default expected output
-                    # Do NOT convert [1, 2, 3] to {1,2,3} here; store as-is for codegen to handle
-                else:
-                    # For other languages, use reasonable defaults
-                    if test_input is None or test_input == '':
-                        test_input = '[1, 2, 3]'
-                    if test_expected is None or test_expected == '':
-                        test_expected = '3'
-                
-                test_cases.append({
-                    'input': test_input,
-                    'expected_output': test_expected
-                })
-            
-            # Clean up the individual test case fields
-            if input_key in challenge:
-                del challenge[input_key]
-            if expected_key in challenge:
-                del challenge[expected_key]
-        
-        # Ensure we have at least one test case
-        if not test_cases:
-            # Create a default test case based on language
+    return shape_challenge(challenge, language, difficulty) if challenge else None
+
+def shape_challenge(challenge, language, difficulty):
+    """A CHALLENGE_DETAIL_COLUMNS row as get_challenge_by_id() returns it (hints and test case lists)"""
+    # Add difficulty information from the table context
+    challenge['difficulty'] = difficulty
+    challenge['language'] = language
+
+    # Combine hints into an array
+    hints = []
+    for i in range(1, 4):  # hint_1 through hint_3
+        hint_key = f'hint_{i}'
+        if hint_key in challenge and challenge[hint_key]:
+            hints.append(challenge[hint_key])
+    challenge['hints'] = hints
+
+    # Extract test cases from the challenge record
+    test_cases = []
+    for i in range(1, 6):  # Up to 5 test cases
+        input_key = f'test_case_{i}_input'
+        expected_key = f'test_case_{i}_expected'
+
+        # Get values, handling None cases
+        test_input = challenge.get(input_key)
+        test_expected = challenge.get(expected_key)
+
+        # If we have at least one test case field, create a test case with defaults
+        if test_input is not None or test_expected is not None:
+            # Provide defaults for C++ if data is missing
             if language == 'cpp':
-                test_cases.append({
-                    'input': '[1, 2, 3]',
-                    'expected_output': '3'
-                })
+                if test_input is None or test_input == '':
+                    test_input = '[1, 2, 3]'  # Default vector input
+                if test_expected is None or test_expected == '':
+                    test_expected = '3'  # Default expected output
+                # Do NOT convert [1, 2, 3] to {1,2,3} here; store as-is for codegen to handle
             else:
-                test_cases.append({
-                    'input': '[1, 2, 3]',
-                    'expected_output': '3'
-                })
-        
-        # Add test cases array to challenge
-        challenge['test_cases'] = test_cases
-
-        # Extract hidden test cases from the challenge record
-        hidden_test_cases = []
-        for i in range(1, 3):  # Up to 2 hidden test cases
-            input_key = f'hidden_test_{i}_input'
-            expected_key = f'hidden_test_{i}_expected'
-            test_input = challenge.get(input_key)
-            test_expected = challenge.get(expected_key)
-            if test_input is not None or test_expected is not None:
-                hidden_test_cases.append({
-                    'input': test_input,
-                    'expected_output': test_expected
-                })
-            # Clean up the individual hidden test case fields
-            if input_key in challenge:
-                del challenge[input_key]
-            if expected_key in challenge:
-                del challenge[expected_key]
-        challenge['hidden_test_cases'] = hidden_test_cases
-        
-        return challenge
-    return None
+                # For other languages, use reasonable defaults
+                if test_input is None or test_input == '':
+                    test_input = '[1, 2, 3]'
+                if test_expected is None or test_expected == '':
+                    test_expected = '3'
+
+            test_cases.append({
+                'input': test_input,
+                'expected_output': test_expected
+            })
+
+        # Clean up the individual test case fields
+        if input_key in challenge:
+            del challenge[input_key]
+        if expected_key in challenge:
+            del challenge[expected_key]
+
+    # Ensure we have at least one test case
+    if not test_cases:
+        # Create a default test case based on language
+        if language == 'cpp':
+            test_cases.append({
+                'input': '[1, 2, 3]',
+                'expected_output': '3'
+            })
+        else:
+            test_cases.append({
+                'input': '[1, 2, 3]',
+                'expected_output': '3'
+            })
+
+    # Add test cases array to challenge
+    challenge['test_cases'] = test_cases
+
+    # Extract hidden test cases from the challenge record
+    hidden_test_cases = []
+    for i in range(1, 3):  # Up to 2 hidden test cases
+        input_key = f'hidden_test_{i}_input'
+        expected_key = f'hidden_test_{i}_expected'
+        test_input = challenge.get(input_key)
+        test_expected = challenge.get(expected_key)
+        if test_input is not None or test_expected is not None:
+            hidden_test_cases.append({
+                'input': test_input,
+                'expected_output': test_expected
+            })
+        # Clean up the individual hidden test case fields
+        if input_key in challenge:
+            del challenge[input_key]
+        if expected_key in challenge:
+            del challenge[expected_key]
+    challenge['hidden_test_cases'] = hidden_test_cases
+
+    # Literals pre-rendered when the challenge was added (older challenges have none)
+    test_schema = challenge.pop('test_schema', None)
+    if isinstance(test_schema, str):
+        test_schema = json.loads(test_schema)
+    if test_schema:
+        challenge['param_types'] = test_schema.get('param_types')
+        challenge['test_cases'] = attach_literals(challenge['test_cases'], test_schema.get('literals'))
+        challenge['hidden_test_cases'] = attach_literals(challenge['hidden_test_cases'], test_schema.get('literals'))
+        # Reference solution call times measured when it was added (see reference_check.py)
+        baselines = test_schema.get('baseline_ms') or {}
+        for test_case in challenge['test_cases'] + challenge['hidden_test_cases']:
+            key = test_input_key(test_case.get('input'))
+            if key in baselines:
+                test_case['baseline_ms'] = baselines[key]
+
+    return challenge
+
+def build_catalog_snapshot(path):
+    """
+    Write every challenge table to a catalog snapshot file (see catalog_snapshot.py):
+    the lists and details the two get_challenges functions return, one query per table.
+    """
+    db = DatabaseManager()
+    lists, challenges = {}, []
+    for language, difficulties in CHALLENGE_TABLES.items():
+        for difficulty, table_name in difficulties.items():
+            rows = db.execute_query(f"SELECT {CHALLENGE_DETAIL_COLUMNS} FROM {table_name} ORDER BY challenge_id")
+            lists[(language, difficulty)] = [
+                {key: row[key] for key in ('challenge_id', 'title', 'problem_statement', 'max_score', 'success_rate', 'avg_attempts')}
+                for row in rows
+            ]
+            for row in rows:
+                challenges.append(((language, difficulty, row['challenge_id']), shape_challenge(dict(row), language, difficulty)))
+    return write_snapshot(path, lists, challenges)
+
+def save_canonical_verdicts(language, difficulty, challenge_id, verdicts):
+    """Merge {source hash: verdict} into a challenge's stored canonical verdicts"""
+    table_name = get_table_name(language, difficulty)
+    db = DatabaseManager()
+    query = f"""
+        UPDATE {table_name}
+        SET canonical_verdicts = COALESCE(canonical_verdicts, '{{}}'::jsonb) || %s::jsonb
+        WHERE challenge_id = %s
+    """
+    return db.execute_query(query, (json.dumps(verdicts), challenge_id), fetch_all=False)
 
 def get_all_available_challenges():
     """Get summary of all available challenges across all languages and difficulties"""
     db = DatabaseManager()
     all_challenges = []
+    snapshot = current_snapshot()
     
     for language, difficulties in CHALLENGE_TABLES.items():
         for difficulty, table_name in difficulties.items():
+            listed = snapshot.challenge_list(language, difficulty) if snapshot is not None else None
+            if listed is not None:
+                all_challenges.extend(dict(row, language=language, difficulty=difficulty) for row in listed)
+                continue
             try:
                 query = f"""
                     SELECT 
@@ -312,18 +468,53 @@ def test_connection():
         print(f"Database connection test failed: {e}")
         return False
 
+# username -> user_id and profile; filled at login / signup, see identity_map.py
+user_identities = IdentityMap()
+# XP and level per user, invalidated by award_xp_to_user; see user_stats_cache.py
+user_stats_cache = UserStatsCache()
+
 def get_user_by_username(username):
     """Get user by username"""
-    db = DatabaseManager()
-    query = "SELECT user_id, username FROM users WHERE username = %s"
-    return db.execute_query(query, (username,), fetch_one=True)
+    return resolve_user(username)
+
+def resolve_user(username):
+    """{'user_id', 'username', 'fullname'} of username from the identity map, else the database; None if unknown"""
+    profile = user_identities.get(username)
+    if profile is None:
+        db = DatabaseManager()
+        query = "SELECT user_id, username, fullname FROM users WHERE username = %s"
+        profile = user_identities.put(db.execute_query(query, (username,), fetch_one=True))
+    return profile
+
+def resolve_user_id(username):
+    """Primary key of username, or None if there is no such user"""
+    profile = resolve_user(username)
+    return profile['user_id'] if profile else None
 
+def get_user_identity(user_id):
+    """Profile of user_id (as resolve_user), or None"""
+    profile = user_identities.get_by_id(user_id)
+    if profile is None:
+        db = DatabaseManager()
+        query = "SELECT user_id, username, fullname FROM users WHERE user_id = %s"
+        profile = user_identities.put(db.execute_query(query, (user_id,), fetch_one=True))
+    return profile
+
+def remember_user(row):
+    """Put the users row of a user who just logged in or signed up into the identity map"""
+    return user_identities.put(row)
+
+def forget_user(username=None, user_id=None):
+    """Drop an account from the identity map after it changed (everyone when neither is given)"""
+    user_identities.invalidate(username, user_id)
 
 def create_user(username):
     """Create a new user"""
     db = DatabaseManager()
     query = "INSERT INTO users (username) VALUES (%s) RETURNING user_id, username"
-    return db.execute_query(query, (username,), fetch_one=True)
+    result = db.execute_query(query, (username,), fetch_one=True)
+    remember_user(result)
+    return result
 
 def get_leaderboard(limit=10):
     """Get top users for leaderboard"""
@@ -331,63 +522,159 @@ def get_leaderboard(limit=10):
     query = "SELECT * FROM leaderboard LIMIT %s"
     return db.execute_query(query, (limit,))
 
-def insert_challenge(language, difficulty, data):
-    """Insert a new challenge into the correct table based on language and difficulty."""
-    table_name = get_table_name(language, difficulty)
-    db = DatabaseManager()
-    # Map fields to columns
-    columns = [
-        'title',
-        'problem_statement',
-        'buggy_code',
-        'reference_solution',
-        'solution_explanation',
-        'hint_1', 'hint_2', 'hint_3',
-        'learning_objectives',
-        'test_case_1_input', 'test_case_1_expected',
-        'test_case_2_input', 'test_case_2_expected',
-        'test_case_3_input', 'test_case_3_expected',
-        'test_case_4_input', 'test_case_4_expected',
-        'test_case_5_input', 'test_case_5_expected',
-        'hidden_test_1_input', 'hidden_test_1_expected',
-        'hidden_test_2_input', 'hidden_test_2_expected'
-    ]
-    # Prepare values from data
-    values = [
+# Challenge table columns written when a challenge is added, in challenge_row() order
+CHALLENGE_COLUMNS = [
+    'title',
+    'problem_statement',
+    'buggy_code',
+    'reference_solution',
+    'solution_explanation',
+    'hint_1', 'hint_2', 'hint_3',
+    'learning_objectives',
+    'test_case_1_input', 'test_case_1_expected',
+    'test_case_2_input', 'test_case_2_expected',
+    'test_case_3_input', 'test_case_3_expected',
+    'test_case_4_input', 'test_case_4_expected',
+    'test_case_5_input', 'test_case_5_expected',
+    'hidden_test_1_input', 'hidden_test_1_expected',
+    'hidden_test_2_input', 'hidden_test_2_expected',
+    'test_schema'
+]
+VISIBLE_TEST_SLOTS = 5
+HIDDEN_TEST_SLOTS = 2
+
+def challenge_row(data):
+    """Column values (CHALLENGE_COLUMNS order) for a challenge in the POST /api/challenges shape"""
+    def test_fields(tests, count):
+        values = []
+        for i in range(count):
+            test = tests[i] if i < len(tests) else None
+            values += [test['input'], test['expected']] if test else [None, None]
+        return values
+
+    hints = data['hints']
+    return [
         data.get('title'),
         data.get('description'),
         data.get('buggy_code'),
         data.get('reference_solution'),
         data.get('solution_explanation'),
-        data['hints'][0] if len(data['hints']) > 0 else None,
-        data['hints'][1] if len(data['hints']) > 1 else None,
-        data['hints'][2] if len(data['hints']) > 2 else None,
+        *[hints[i] if len(hints) > i else None for i in range(3)],
         data.get('learning_objective'),
-        # Visible test cases (up to 5)
-        data['test_cases'][0]['input'] if len(data['test_cases']) > 0 else None,
-        data['test_cases'][0]['expected'] if len(data['test_cases']) > 0 else None,
-        data['test_cases'][1]['input'] if len(data['test_cases']) > 1 else None,
-        data['test_cases'][1]['expected'] if len(data['test_cases']) > 1 else None,
-        data['test_cases'][2]['input'] if len(data['test_cases']) > 2 else None,
-        data['test_cases'][2]['expected'] if len(data['test_cases']) > 2 else None,
-        data['test_cases'][3]['input'] if len(data['test_cases']) > 3 else None,
-        data['test_cases'][3]['expected'] if len(data['test_cases']) > 3 else None,
-        data['test_cases'][4]['input'] if len(data['test_cases']) > 4 else None,
-        data['test_cases'][4]['expected'] if len(data['test_cases']) > 4 else None,
-        # Hidden test cases (always 2)
-        data['hidden_test_cases'][0]['input'] if len(data['hidden_test_cases']) > 0 else None,
-        data['hidden_test_cases'][0]['expected'] if len(data['hidden_test_cases']) > 0 else None,
-        data['hidden_test_cases'][1]['input'] if len(data['hidden_test_cases']) > 1 else None,
-        data['hidden_test_cases'][1]['expected'] if len(data['hidden_test_cases']) > 1 else None
+        *test_fields(data['test_cases'], VISIBLE_TEST_SLOTS),
+        *test_fields(data['hidden_test_cases'], HIDDEN_TEST_SLOTS),
+        # Parameter types and per-language literals (see test_schema.py)
+        json.dumps(data['test_schema']) if data.get('test_schema') else None
     ]
-    placeholders = ', '.join(['%s'] * len(columns))
-    colnames = ', '.join(columns)
+
+def challenge_from_row(row, language, difficulty):
+    """Inverse of challenge_row(): a stored challenge in the POST /api/challenges shape"""
+    test_schema = row.get('test_schema')
+    if isinstance(test_schema, str):
+        test_schema = json.loads(test_schema)
+    test_schema = test_schema or {}
+    baselines = test_schema.get('baseline_ms') or {}
+
+    def tests(prefix, count):
+        found = []
+        for i in range(1, count + 1):
+            test_input, expected = row.get(f'{prefix}_{i}_input'), row.get(f'{prefix}_{i}_expected')
+            if test_input is None and expected is None:
+                continue
+            test = {'input': test_input, 'expected': expected}
+            if test_input_key(test_input) in baselines:
+                test['baseline_ms'] = baselines[test_input_key(test_input)]
+            found.append(test)
+        return found
+
+    challenge = {
+        'language': language,
+        'difficulty': difficulty,
+        'title': row.get('title'),
+        'description': row.get('problem_statement'),
+        'buggy_code': row.get('buggy_code'),
+        'reference_solution': row.get('reference_solution'),
+        'solution_explanation': row.get('solution_explanation'),
+        'hints': [row[f'hint_{i}'] for i in range(1, 4) if row.get(f'hint_{i}')],
+        'learning_objective': row.get('learning_objectives'),
+        'test_cases': tests('test_case', VISIBLE_TEST_SLOTS),
+        'hidden_test_cases': tests('hidden_test', HIDDEN_TEST_SLOTS),
+    }
+    if test_schema.get('param_types'):
+        challenge['param_types'] = test_schema['param_types']
+    return challenge
+
+def insert_challenge(language, difficulty, data):
+    """Insert a new challenge into the correct table based on language and difficulty."""
+    table_name = get_table_name(language, difficulty)
+    db = DatabaseManager()
+    placeholders = ', '.join(['%s'] * len(CHALLENGE_COLUMNS))
+    colnames = ', '.join(CHALLENGE_COLUMNS)
     query = f"""
         INSERT INTO {table_name} ({colnames})
         VALUES ({placeholders})
         RETURNING challenge_id
     """
-    return db.execute_query(query, values, fetch_one=True)
+    return db.execute_query(query, challenge_row(data), fetch_one=True)
+
+def insert_challenges(challenges, page_size=500):
+    """
+    Insert many validated challenges in one transaction, as multi-row INSERTs of
+    up to page_size rows per table. Returns their challenge_ids in input order;
+    nothing is stored if any row fails.
+    """
+    by_table = {}
+    for position, data in enumerate(challenges):
+        table_name = get_table_name(data['language'], data['difficulty'])
+        by_table.setdefault(table_name, []).append(position)
+    ids = [None] * len(challenges)
+    colnames = ', '.join(CHALLENGE_COLUMNS)
+    started = time.time()
+    with span('db.bulk_insert', rows=len(challenges)), DatabaseManager().get_cursor(dict_cursor=False) as (cursor, conn):
+        try:
+            for table_name, positions in by_table.items():
+                # RETURNING yields rows in VALUES order, one page at a time
+                returned = execute_values(
+                    cursor,
+                    f"INSERT INTO {table_name} ({colnames}) VALUES %s RETURNING challenge_id",
+                    [challenge_row(challenges[position]) for position in positions],
+                    page_size=page_size,
+                    fetch=True
+                )
+                for position, (challenge_id,) in zip(positions, returned):
+                    ids[position] = challenge_id
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            DB_ERRORS.inc(statement='insert challenges')
+            raise
+    DB_QUERY_DURATION.observe(time.time() - started, statement='insert challenges')
+    return ids
+
+def iter_challenges(language=None, difficulty=None, batch_size=500):
+    """
+    Stream stored challenges (optionally of one language / difficulty) in the
+    POST /api/challenges shape, through a server-side cursor per table.
+    """
+    db = DatabaseManager()
+    for table_language, difficulties in CHALLENGE_TABLES.items():
+        if language and table_language != language:
+            continue
+        for table_difficulty, table_name in difficulties.items():
+            if difficulty and table_difficulty != difficulty:
+                continue
+            with db.get_connection() as conn:
+                try:
+                    with conn.cursor(name=f'export_{table_name}', cursor_factory=RealDictCursor) as cursor:
+                        cursor.itersize = batch_size
+                        cursor.execute(f"SELECT challenge_id, {', '.join(CHALLENGE_COLUMNS)} FROM {table_name} ORDER BY challenge_id")
+                        for row in cursor:
+                            challenge = challenge_from_row(row, table_language, table_difficulty)
+                            challenge['challenge_id'] = row['challenge_id']
+                            yield challenge
+                finally:
+                    # Read-only; end the transaction the named cursor needed
+                    conn.rollback()
 
 def create_xp_trigger():
     """Create trigger for automatic XP and level management"""
@@ -453,16 +740,20 @@ def create_xp_trigger():
 
 
 
+@traced()
 def is_challenge_completed(username, language, difficulty, challenge_id):
     """Check if a user has already completed a specific challenge"""
     try:
+        user_id = resolve_user_id(username)
+        if user_id is None:
+            return False
         db = DatabaseManager()
         query = """
         SELECT id FROM user_completed_challenges 
-        WHERE user_id = (SELECT user_id FROM users WHERE username = %s)
+        WHERE user_id = %s
         AND language = %s AND difficulty = %s AND challenge_id = %s
         """
-        result = db.execute_query(query, (username, language, difficulty, challenge_id), fetch_one=True)
+        result = db.execute_query(query, (user_id, language, difficulty, challenge_id), fetch_one=True)
         
         is_completed = result is not None
         print(f"🔍 Checking if challenge is completed:")
@@ -478,14 +769,19 @@ def is_challenge_completed(username, language, difficulty, challenge_id):
 def mark_challenge_completed(username, language, difficulty, challenge_id):
     """Mark a challenge as completed for a user"""
     try:
+        user_id = resolve_user_id(username)
+        if user_id is None:
+            print(f"❌ User {username} not found")
+            return False
         db = DatabaseManager()
         query = """
         INSERT INTO user_completed_challenges (user_id, language, difficulty, challenge_id)
-        VALUES ((SELECT user_id FROM users WHERE username = %s), %s, %s, %s)
+        VALUES (%s, %s, %s, %s)
         ON CONFLICT (user_id, language, difficulty, challenge_id) DO NOTHING
         """
         # Don't fetch results for INSERT statements
-        db.execute_query(query, (username, language, difficulty, challenge_id), fetch_one=False, fetch_all=False)
+        db.execute_query(query, (user_id, language, difficulty, challenge_id), fetch_one=False, fetch_all=False)
+        user_stats_cache.invalidate(username)
         return True
     except Exception as e:
         print(f"❌ Error marking challenge completed: {e}")
@@ -494,6 +790,10 @@ def mark_challenge_completed(username, language, difficulty, challenge_id):
 def add_solved_problem_to_user(username, language, difficulty, challenge_id, challenge_title=None, time_taken=None):
     """Add a solved problem to user_completed_challenges table"""
     try:
+        user_id = resolve_user_id(username)
+        if user_id is None:
+            print(f"❌ User {username} not found")
+            return False
         db = DatabaseManager()
         
         # First check if the problem is already completed
@@ -506,7 +806,7 @@ def add_solved_problem_to_user(username, language, difficulty, challenge_id, cha
         # Add to user_completed_challenges table with time_taken
         query = """
         INSERT INTO user_completed_challenges (user_id, language, difficulty, challenge_id, completed_at, time_taken)
-        VALUES ((SELECT user_id FROM users WHERE username = %s), %s, %s, %s, NOW(), %s)
+        VALUES (%s, %s, %s, %s, NOW(), %s)
         """
         time_taken_value = time_taken if time_taken is not None else 0
         
@@ -514,10 +814,11 @@ def add_solved_problem_to_user(username, language, difficulty, challenge_id, cha
         print(f"   User: {username}")
         print(f"   Challenge: {language} {difficulty} #{challenge_id}")
         print(f"   Time taken: {time_taken_value}s")
-        print(f"   SQL Parameters: {[username, language, difficulty, challenge_id, time_taken_value]}")
+        print(f"   SQL Parameters: {[user_id, language, difficulty, challenge_id, time_taken_value]}")
         
         try:
-            result = db.execute_query(query, (username, language, difficulty, challenge_id, time_taken_value), fetch_all=False)
+            result = db.execute_query(query, (user_id, language, difficulty, challenge_id, time_taken_value), fetch_all=False)
+            user_stats_cache.invalidate(username)
             print(f"✅ Added solved problem to {username}: {language} {difficulty} challenge {challenge_id} (Time: {time_taken_value}s)")
             return True
         except Exception as insert_error:
@@ -531,16 +832,10 @@ def add_solved_problem_to_user(username, language, difficulty, challenge_id, cha
 def get_user_solved_problems(username, limit=50, offset=0):
     """Get all solved problems for a user from user_completed_challenges table - OPTIMIZED VERSION"""
     try:
-        db = DatabaseManager()
-        
-        # First, get the user_id efficiently
-        user_query = "SELECT user_id FROM users WHERE username = %s"
-        user_result = db.execute_query(user_query, (username,), fetch_one=True)
-        
-        if not user_result:
+        user_id = resolve_user_id(username)
+        if user_id is None:
             return []
-        
-        user_id = user_result['user_id']
+        db = DatabaseManager()
         
         # Optimized query without UNION ALL - get basic info first
         query = """
@@ -585,7 +880,9 @@ def get_challenge_title(language, difficulty, challenge_id):
         
         # Check if we have a simple cache (in-memory for now)
         if hasattr(get_challenge_title, 'cache') and cache_key in get_challenge_title.cache:
+            record_cache('challenge_title', True)
             return get_challenge_title.cache[cache_key]
+        record_cache('challenge_title', False)
         
         # Get title from specific table
         table_name = get_table_name(language, difficulty)
@@ -610,20 +907,19 @@ def get_challenge_title(language, difficulty, challenge_id):
 def get_user_solved_stats(username):
     """Get solved problems statistics for a user - OPTIMIZED VERSION"""
     try:
-        # Simple in-memory cache
+        # In-memory cache, valid while the user's stats version is unchanged (see user_stats_cache.py)
         if not hasattr(get_user_solved_stats, 'cache'):
             get_user_solved_stats.cache = {}
         
         cache_key = f"user_solved_stats_{username}"
+        version = user_stats_cache.version(username)
         
         # Check cache first
-        if cache_key in get_user_solved_stats.cache:
-            cached_data = get_user_solved_stats.cache[cache_key]
-            # Cache for 2 minutes (shorter than user stats since this changes more often)
-            if time.time() - cached_data['timestamp'] < 120:
-                return cached_data['data']
-            else:
-                del get_user_solved_stats.cache[cache_key]
+        cached_data = get_user_solved_stats.cache.get(cache_key)
+        if cached_data and cached_data['version'] == version:
+            record_cache('user_solved_stats', True)
+            return cached_data['data']
+        record_cache('user_solved_stats', False)
         
         # Get only recent problems for stats (last 100) - much faster
         solved_problems = get_user_solved_problems(username, limit=100, offset=0)
@@ -649,7 +945,7 @@ def get_user_solved_stats(username):
         # Cache the result
         get_user_solved_stats.cache[cache_key] = {
             'data': result,
-            'timestamp': time.time()
+            'version': version
         }
         
         return result
@@ -666,11 +962,8 @@ def clear_user_cache(username=None):
     """Clear cache for a specific user or all users"""
     try:
         if username:
-            # Clear specific user cache
-            if hasattr(get_user_stats, 'cache'):
-                cache_key = f"user_stats_{username}"
-                if cache_key in get_user_stats.cache:
-                    del get_user_stats.cache[cache_key]
+            # Clear specific user cache (in every worker: anything cached under the old version is stale)
+            user_stats_cache.invalidate(username)
             
             if hasattr(get_user_solved_stats, 'cache'):
                 cache_key = f"user_solved_stats_{username}"
@@ -680,12 +973,12 @@ def clear_user_cache(username=None):
             print(f"✅ Cleared cache for user: {username}")
         else:
             # Clear all caches
-            if hasattr(get_user_stats, 'cache'):
-                get_user_stats.cache.clear()
+            user_stats_cache.invalidate()
             if hasattr(get_user_solved_stats, 'cache'):
                 get_user_solved_stats.cache.clear()
             if hasattr(get_challenge_title, 'cache'):
                 get_challenge_title.cache.clear()
+            forget_user()
             
             print("✅ Cleared all user caches")
             
@@ -722,6 +1015,8 @@ def award_xp_to_user(username, xp_amount):
         result = db.execute_query(query, (xp_amount, username), fetch_one=True)
         
         if result:
+            # Committed: every worker reloads the row on its next read
+            user_stats_cache.invalidate(username)
             print(f"✅ Awarded {xp_amount} XP to {username}. New XP: {result['xp']}, Level: {result['level']}")
             return result
         else:
@@ -734,20 +1029,11 @@ def award_xp_to_user(username, xp_amount):
 def get_user_stats(username):
     """Get user's XP and level - OPTIMIZED CACHED VERSION"""
     try:
-        # Simple in-memory cache
-        if not hasattr(get_user_stats, 'cache'):
-            get_user_stats.cache = {}
-        
-        cache_key = f"user_stats_{username}"
-        
-        # Check cache first
-        if cache_key in get_user_stats.cache:
-            cached_data = get_user_stats.cache[cache_key]
-            # Cache for 5 minutes
-            if time.time() - cached_data['timestamp'] < 300:
-                return cached_data['data']
-            else:
-                del get_user_stats.cache[cache_key]
+        # Versioned cache, always current (see user_stats_cache.py)
+        cached = user_stats_cache.get(username)
+        if cached is not None:
+            return cached
+        version = user_stats_cache.version(username)
         
         # Optimized query with index hint
         query = """
@@ -759,11 +1045,7 @@ def get_user_stats(username):
         result = db.execute_query(query, (username,), fetch_one=True)
         
         # Cache the result
-        if result:
-            get_user_stats.cache[cache_key] = {
-                'data': result,
-                'timestamp': time.time()
-            }
+        user_stats_cache.put(username, result, version)
         
         return result
     except Exception as e:
@@ -816,33 +1098,15 @@ def update_user_score(username, score_to_add):
         return None
 
 def calculate_user_streak(username):
-    """Calculate user's current streak based on daily activity"""
+    """Consecutive days with a solve, ending today or yesterday (as on the leaderboard)"""
     try:
-        db = DatabaseManager()
-        query = """
-        SELECT DATE(last_activity) as activity_date
-        FROM leaderboard 
-        WHERE username = %s 
-        ORDER BY last_activity DESC
-        LIMIT 30
-        """
-        results = db.execute_query(query, (username,))
-        
-        if not results:
+        user_id = resolve_user_id(username)
+        if user_id is None:
             return 0
-            
-        # Calculate consecutive days
-        streak = 0
-        current_date = datetime.now().date()
-        
-        for result in results:
-            activity_date = result['activity_date']
-            if activity_date == current_date - timedelta(days=streak):
-                streak += 1
-            else:
-                break
-                
-        return streak
+        db = DatabaseManager()
+        query = LEADERBOARD_ENTRIES_CTES.format(**LEADERBOARD_ONE_USER) + "SELECT streak_days FROM entries"
+        result = db.execute_query(query, {'user_id': user_id}, fetch_one=True)
+        return result['streak_days'] if result else 0
     except Exception as e:
         print(f"Error calculating streak: {e}")
         return 0
@@ -857,12 +1121,15 @@ def get_user_best_performance(username):
             difficulty,
             COUNT(*) as solved_count,
             AVG(time_taken) as avg_time
-        FROM user_solved_problems 
-        WHERE username = %s 
+        FROM user_completed_challenges 
+        WHERE user_id = %s 
         GROUP BY language, difficulty
         ORDER BY solved_count DESC, avg_time ASC
         """
-        results = db.execute_query(query, (username,))
+        user_id = resolve_user_id(username)
+        if user_id is None:
+            return None, None
+        results = db.execute_query(query, (user_id,))
         
         if not results:
             return None, None
@@ -887,52 +1154,13 @@ def get_user_best_performance(username):
         return None, None
 
 def update_leaderboard_entry(username):
-    """Update or create leaderboard entry for a user with improved logic"""
+    """Update or create a user's leaderboard entry, computed the same way as the nightly rebuild"""
     try:
-        db = DatabaseManager()
-        
-        # Get user stats
-        user_stats = get_user_stats(username)
-        if not user_stats:
+        user_id = resolve_user_id(username)
+        if user_id is None:
             return False
-            
-        # Get solved problems stats
-        solved_stats = get_user_solved_stats(username)
-        
-        # Get best performance based on actual solved problems
-        best_language, best_difficulty = get_user_best_performance(username)
-        
-        # Calculate streak
-        streak_days = calculate_user_streak(username)
-        
-        # Insert or update leaderboard entry
-        query = """
-        INSERT INTO leaderboard (user_id, username, total_score, total_solved, total_xp, level, 
-                               best_language, best_difficulty, streak_days, last_activity)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-        ON CONFLICT (user_id) DO UPDATE SET
-            total_score = EXCLUDED.total_score,
-            total_solved = EXCLUDED.total_solved,
-            total_xp = EXCLUDED.total_xp,
-            level = EXCLUDED.level,
-            best_language = EXCLUDED.best_language,
-            best_difficulty = EXCLUDED.best_difficulty,
-            streak_days = EXCLUDED.streak_days,
-            last_activity = NOW(),
-            updated_at = NOW()
-        """
-        
-        db.execute_query(query, (
-            user_stats['user_id'],
-            username,
-            user_stats['xp'] or 0,
-            solved_stats['total_solved'],
-            user_stats['xp'] or 0,
-            user_stats['level'] or 1,
-            best_language,
-            best_difficulty,
-            streak_days
-        ), fetch_all=False)
+        db = DatabaseManager()
+        db.execute_query(UPDATE_LEADERBOARD_ENTRY_QUERY, {'user_id': user_id}, fetch_all=False)
         
         # Update rank positions efficiently
         batch_update_leaderboard_ranks()
@@ -976,13 +1204,19 @@ def update_leaderboard_ranks():
     batch_update_leaderboard_ranks()
 
 @lru_cache(maxsize=128)
+def _cached_leaderboard_data(limit=50, filter_type='overall', filter_value=None):
+    return get_leaderboard_data(limit, filter_type, filter_value)
+
 def get_cached_leaderboard_data(limit=50, filter_type='overall', filter_value=None):
     """Cached leaderboard data for better performance"""
-    return get_leaderboard_data(limit, filter_type, filter_value)
+    hits_before = _cached_leaderboard_data.cache_info().hits
+    result = _cached_leaderboard_data(limit, filter_type, filter_value)
+    record_cache('leaderboard', _cached_leaderboard_data.cache_info().hits > hits_before)
+    return result
 
 def clear_leaderboard_cache():
     """Clear leaderboard cache when data changes"""
-    get_cached_leaderboard_data.cache_clear()
+    _cached_leaderboard_data.cache_clear()
 
 def get_leaderboard_data(limit=50, filter_type='overall', filter_value=None):
     """Get leaderboard data with optimized query and caching"""
@@ -1110,26 +1344,145 @@ def initialize_user_leaderboard(username):
         print(f"❌ Error initializing leaderboard: {e}")
         return False
 
+# Leaderboard entries computed from users and user_completed_challenges: best_language is the
+# language of the user's most-solved language/difficulty (faster average time breaks ties),
+# best_difficulty the highest difficulty solved, streak_days the run of consecutive days with a
+# solve that ends today or yesterday (a streak lasts until a whole day passes without a solve),
+# last_activity the latest solve. Shared by the nightly rebuild (every user) and the per-solve
+# update (one user), so both give the same numbers.
+LEADERBOARD_ENTRIES_CTES = """
+WITH solved AS (
+    SELECT user_id,
+           COUNT(*) AS total_solved,
+           MAX(completed_at) AS last_solved,
+           (ARRAY['basic', 'intermediate', 'advanced'])[
+               MAX(CASE difficulty WHEN 'basic' THEN 1 WHEN 'intermediate' THEN 2 WHEN 'advanced' THEN 3 END)
+           ] AS best_difficulty
+    FROM {completed}
+    GROUP BY user_id
+),
+best AS (
+    SELECT DISTINCT ON (user_id) user_id, language AS best_language
+    FROM {completed}
+    GROUP BY user_id, language, difficulty
+    ORDER BY user_id, COUNT(*) DESC, AVG(time_taken) ASC
+),
+active_days AS (
+    SELECT DISTINCT user_id, completed_at::date AS day
+    FROM {completed}
+    WHERE completed_at::date <= CURRENT_DATE
+),
+streaks AS (
+    SELECT user_id, COUNT(*) AS streak_days
+    FROM (
+        SELECT user_id, day, day - (ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day))::int AS run
+        FROM active_days
+    ) runs
+    GROUP BY user_id, run
+    HAVING MAX(day) >= CURRENT_DATE - 1
+),
+entries AS (
+    SELECT u.user_id,
+           u.username,
+           COALESCE(u.xp, 0) AS total_score,
+           COALESCE(s.total_solved, 0) AS total_solved,
+           COALESCE(u.xp, 0) AS total_xp,
+           COALESCE(u.level, 1) AS level,
+           b.best_language,
+           s.best_difficulty,
+           COALESCE(st.streak_days, 0) AS streak_days,
+           COALESCE(s.last_solved, lb.last_activity, NOW()) AS last_activity
+    FROM users u
+    LEFT JOIN solved s ON s.user_id = u.user_id
+    LEFT JOIN best b ON b.user_id = u.user_id
+    LEFT JOIN streaks st ON st.user_id = u.user_id
+    LEFT JOIN leaderboard lb ON lb.user_id = u.user_id
+    {users_filter}
+)
+"""
+LEADERBOARD_ALL_USERS = {'completed': 'user_completed_challenges', 'users_filter': ''}
+LEADERBOARD_ONE_USER = {
+    'completed': '(SELECT * FROM user_completed_challenges WHERE user_id = %(user_id)s) completed',
+    'users_filter': 'WHERE u.user_id = %(user_id)s',
+}
+
+# Every user's entry upserted with their rank in one statement, so readers see either the old
+# leaderboard or the new one; unchanged rows are not rewritten.
+REBUILD_LEADERBOARD_QUERY = LEADERBOARD_ENTRIES_CTES.format(**LEADERBOARD_ALL_USERS) + """
+INSERT INTO leaderboard (user_id, username, total_score, total_solved, total_xp, level,
+                         best_language, best_difficulty, streak_days, rank_position, last_activity, updated_at)
+SELECT user_id, username, total_score, total_solved, total_xp, level,
+       best_language, best_difficulty, streak_days,
+       ROW_NUMBER() OVER (ORDER BY total_score DESC, total_solved DESC, level DESC, last_activity DESC),
+       last_activity, NOW()
+FROM entries
+ON CONFLICT (user_id) DO UPDATE SET
+    username = EXCLUDED.username,
+    total_score = EXCLUDED.total_score,
+    total_solved = EXCLUDED.total_solved,
+    total_xp = EXCLUDED.total_xp,
+    level = EXCLUDED.level,
+    best_language = EXCLUDED.best_language,
+    best_difficulty = EXCLUDED.best_difficulty,
+    streak_days = EXCLUDED.streak_days,
+    rank_position = EXCLUDED.rank_position,
+    last_activity = EXCLUDED.last_activity,
+    updated_at = NOW()
+WHERE (leaderboard.username, leaderboard.total_score, leaderboard.total_solved, leaderboard.total_xp,
+       leaderboard.level, leaderboard.best_language, leaderboard.best_difficulty, leaderboard.streak_days,
+       leaderboard.rank_position, leaderboard.last_activity)
+      IS DISTINCT FROM
+      (EXCLUDED.username, EXCLUDED.total_score, EXCLUDED.total_solved, EXCLUDED.total_xp,
+       EXCLUDED.level, EXCLUDED.best_language, EXCLUDED.best_difficulty, EXCLUDED.streak_days,
+       EXCLUDED.rank_position, EXCLUDED.last_activity)
+"""
+
+# One user's entry, after a solve; ranks are updated separately (batch_update_leaderboard_ranks)
+UPDATE_LEADERBOARD_ENTRY_QUERY = LEADERBOARD_ENTRIES_CTES.format(**LEADERBOARD_ONE_USER) + """
+INSERT INTO leaderboard (user_id, username, total_score, total_solved, total_xp, level,
+                         best_language, best_difficulty, streak_days, last_activity, updated_at)
+SELECT user_id, username, total_score, total_solved, total_xp, level,
+       best_language, best_difficulty, streak_days, last_activity, NOW()
+FROM entries
+ON CONFLICT (user_id) DO UPDATE SET
+    username = EXCLUDED.username,
+    total_score = EXCLUDED.total_score,
+    total_solved = EXCLUDED.total_solved,
+    total_xp = EXCLUDED.total_xp,
+    level = EXCLUDED.level,
+    best_language = EXCLUDED.best_language,
+    best_difficulty = EXCLUDED.best_difficulty,
+    streak_days = EXCLUDED.streak_days,
+    last_activity = EXCLUDED.last_activity,
+    updated_at = NOW()
+"""
+
+def rebuild_leaderboard():
+    """Recompute every user's leaderboard entry and rank set-based; returns the number of rows changed"""
+    db = DatabaseManager()
+    started = time.time()
+    changed = db.execute_query(REBUILD_LEADERBOARD_QUERY, fetch_all=False)
+    clear_leaderboard_cache()
+    print(f"✅ Rebuilt leaderboard: {changed} entries changed in {time.time() - started:.1f}s")
+    return changed
+
 def update_all_users_leaderboard():
     """Update leaderboard entries for ALL users"""
     try:
-        db = DatabaseManager()
-        
-        # Get all users
-        users_query = "SELECT user_id, username, xp, level FROM users"
-        users = db.execute_query(users_query)
-        
-        for user in users:
-            update_leaderboard_entry(user['username'])
-            
-        print(f"✅ Updated leaderboard for {len(users)} users")
-        
+        return rebuild_leaderboard()
     except Exception as e:
         print(f"❌ Error updating all users: {e}")
-
-
+        return None
 
 if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ['rebuild-leaderboard']:
+        # Nightly: python backend/database_config.py rebuild-leaderboard
+        sys.exit(0 if update_all_users_leaderboard() is not None else 1)
+    if sys.argv[1:] == ['migrate']:
+        # Once per schema change, before deploying: python backend/database_config.py migrate
+        sys.exit(0 if migrate_challenge_columns() else 1)
+
     # Test the database connection
     test_connection()
     
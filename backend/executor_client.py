@@ -0,0 +1,322 @@
+"""
+BugYou Executor Client
+Pooled keep-alive HTTP client for one or more code executors, with load- and health-aware routing
+
+Every call to Piston goes through one ExecutorClient per process:
+
+- Connections are pooled and kept alive (one requests.Session per process, so
+  sockets are never shared across a fork), so a run does not pay for a new TCP
+  and TLS handshake.
+- At most max_concurrency calls are in flight per process; the rest wait up to
+  queue_timeout seconds for a slot, then fail with ExecutorUnavailable.
+- With several backends (Piston-compatible executors), each call goes to the
+  healthy backend with the lowest expected wait: (calls in flight + 1) x its
+  recent latency (an exponentially weighted average of successful calls).
+- A call still unanswered after hedge_after seconds is also sent to the next
+  best backend; the first good answer wins and the slower one is discarded.
+- 429 and 5xx answers and failures to connect (nothing was sent) are retried
+  up to `retries` times, on another backend when there is one, after a
+  jittered exponential backoff (full jitter, honouring Retry-After), so a blip
+  is absorbed without all workers retrying in lockstep. A read timeout is not
+  retried: the executor already has the run and is probably still on it, and
+  sending it again would only pile more work onto a slow executor. It goes
+  straight to the caller.
+- Each backend has a circuit breaker: after failure_threshold calls in a row
+  fail (connection error, connect timeout or 5xx) it gets no calls for reset_timeout
+  seconds, then a single trial call whose success closes it again. When every
+  backend's circuit is open, calls fail at once with ExecutorUnavailable
+  instead of piling onto sick executors.
+"""
+
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import counter, gauge, histogram
+
+EXECUTOR_CALLS = counter(
+    'bugyou_executor_client_calls_total',
+    'Executor HTTP calls by backend and outcome (ok, http_error, failed)',
+    ('backend', 'outcome')
+)
+EXECUTOR_REJECTIONS = counter(
+    'bugyou_executor_client_rejections_total',
+    'Executor calls refused before reaching a backend, by reason (busy, circuit_open)',
+    ('reason',)
+)
+EXECUTOR_RETRIES = counter(
+    'bugyou_executor_client_retries_total',
+    'Executor HTTP calls retried, by reason (status code or error)',
+    ('reason',)
+)
+EXECUTOR_HEDGES = counter(
+    'bugyou_executor_client_hedges_total',
+    'Slow executor calls also sent to a second backend (sent), and how often that one answered first (won)',
+    ('outcome',)
+)
+EXECUTOR_BACKEND_LATENCY = histogram(
+    'bugyou_executor_backend_latency_seconds',
+    'Round trip of successful executor calls by backend',
+    ('backend',)
+)
+EXECUTOR_BACKEND_IN_FLIGHT = gauge(
+    'bugyou_executor_backend_in_flight',
+    'Calls currently waiting on each executor backend',
+    ('backend',)
+)
+EXECUTOR_CIRCUIT_OPEN = gauge(
+    'bugyou_executor_circuit_open',
+    'Whether this process has stopped calling a backend (1) after repeated failures',
+    ('backend',)
+)
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+CONNECT_TIMEOUT = 3.05
+BACKOFF_BASE = 0.25
+BACKOFF_CAP = 2.0
+LATENCY_WEIGHT = 0.3  # weight of the newest call in a backend's latency average
+
+
+class ExecutorUnavailable(RuntimeError):
+    """Every backend is failing (circuits open) or every call slot stayed busy"""
+
+
+class Backend:
+    """One executor base URL and what this process knows about its health"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.in_flight = 0
+        self.latency = None  # seconds, None until a call succeeded
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def __repr__(self):
+        return f"Backend({self.url!r})"
+
+
+class ExecutorClient:
+    def __init__(self, backends=(), max_concurrency=8, queue_timeout=10.0, retries=2,
+                 failure_threshold=5, reset_timeout=15.0, hedge_after=3.0):
+        self.backends = [Backend(url) for url in backends]
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.hedge_after = hedge_after
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._session = None
+        self._session_pid = None
+        self._hedge_pool = None
+        self._hedge_pool_pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, backends=None, max_concurrency=None, queue_timeout=None, retries=None,
+                  failure_threshold=None, reset_timeout=None, hedge_after=None):
+        if backends:
+            self.backends = [Backend(url) for url in backends]
+        if max_concurrency:
+            self.max_concurrency = max(1, int(max_concurrency))
+            self._slots = threading.BoundedSemaphore(self.max_concurrency)
+            self._session = None  # pool size follows the limit
+        if queue_timeout is not None:
+            self.queue_timeout = float(queue_timeout)
+        if retries is not None:
+            self.retries = max(0, int(retries))
+        if failure_threshold:
+            self.failure_threshold = int(failure_threshold)
+        if reset_timeout is not None:
+            self.reset_timeout = float(reset_timeout)
+        if hedge_after is not None:
+            self.hedge_after = float(hedge_after)
+
+    def session(self):
+        """This process's pooled session, created on first use after a fork"""
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=max(4, len(self.backends)),
+                                          pool_maxsize=self.max_concurrency, max_retries=0)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session, self._session_pid = session, os.getpid()
+        return self._session
+
+    def post(self, path, payload, timeout=20, headers=None):
+        """
+        POST payload as JSON to path (e.g. '/execute') on the best backend and return the
+        requests.Response (any status that is not retried, or the last retried one).
+        Raises ExecutorUnavailable when every circuit is open or no call slot frees up,
+        requests.ReadTimeout at once when a backend took the call but did not answer in
+        time, and other requests exceptions when every attempt failed.
+        """
+        slots = self._slots
+        if not slots.acquire(timeout=self.queue_timeout):
+            EXECUTOR_REJECTIONS.inc(reason='busy')
+            raise ExecutorUnavailable('The code executor is busy, please try again shortly')
+        try:
+            tried = []
+            attempt = 0
+            while True:
+                response, error = self._hedged_send(path, payload, timeout, headers, tried, slots)
+                if error is not None:
+                    if not _nothing_sent(error) or attempt >= self.retries:
+                        raise error
+                    EXECUTOR_RETRIES.inc(reason=type(error).__name__)
+                    delay = None
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                        return response
+                    EXECUTOR_RETRIES.inc(reason=str(response.status_code))
+                    delay = _retry_after(response)
+                attempt += 1
+                backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                time.sleep(min(BACKOFF_CAP, max(backoff, delay or 0)))
+        finally:
+            slots.release()
+
+    def _hedged_send(self, path, payload, timeout, headers, tried, slots):
+        """(response, None) or (None, exception) of one attempt, hedged on a second backend when slow"""
+        primary = self._choose(tried)
+        tried.append(primary)
+        if not self.hedge_after or len(self.backends) < 2:
+            return self._send(primary, path, payload, timeout, headers)
+        pool = self._pool()
+        futures = {pool.submit(self._send, primary, path, payload, timeout, headers): primary}
+        done, _ = wait(futures, timeout=self.hedge_after)
+        if not done and slots.acquire(blocking=False):
+            try:
+                secondary = self._choose(tried)
+            except ExecutorUnavailable:
+                slots.release()
+            else:
+                tried.append(secondary)
+                EXECUTOR_HEDGES.inc(outcome='sent')
+
+                def send_hedge():
+                    try:
+                        return self._send(secondary, path, payload, timeout, headers)
+                    finally:
+                        slots.release()
+                futures[pool.submit(send_hedge)] = secondary
+        outcome = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                outcome = future.result()
+                response, error = outcome
+                if error is None and response.status_code not in RETRY_STATUSES:
+                    if futures[future] is not primary:
+                        EXECUTOR_HEDGES.inc(outcome='won')
+                    return outcome
+        return outcome
+
+    def _pool(self):
+        if self._hedge_pool is None or self._hedge_pool_pid != os.getpid():
+            with self._lock:
+                if self._hedge_pool is None or self._hedge_pool_pid != os.getpid():
+                    self._hedge_pool = ThreadPoolExecutor(max_workers=self.max_concurrency * 2,
+                                                          thread_name_prefix='executor-call')
+                    self._hedge_pool_pid = os.getpid()
+        return self._hedge_pool
+
+    def _send(self, backend, path, payload, timeout, headers):
+        """One HTTP call to backend, recording its load, latency and health"""
+        with self._lock:
+            backend.in_flight += 1
+        EXECUTOR_BACKEND_IN_FLIGHT.inc(backend=backend.url)
+        started = time.perf_counter()
+        try:
+            response = self.session().post(f"{backend.url}{path}", json=payload,
+                                           timeout=(CONNECT_TIMEOUT, timeout), headers=headers)
+        except requests.RequestException as e:
+            # A run that outlasted the timeout says nothing about the backend's health
+            self._settle(backend, None, healthy=None if isinstance(e, requests.ReadTimeout) else False)
+            EXECUTOR_CALLS.inc(backend=backend.url, outcome='failed')
+            return None, e
+        finally:
+            with self._lock:
+                backend.in_flight -= 1
+            EXECUTOR_BACKEND_IN_FLIGHT.dec(backend=backend.url)
+        elapsed = time.perf_counter() - started
+        healthy = response.status_code < 500
+        self._settle(backend, elapsed if response.status_code == 200 else None, healthy)
+        EXECUTOR_CALLS.inc(backend=backend.url, outcome='ok' if response.status_code == 200 else 'http_error')
+        if response.status_code == 200:
+            EXECUTOR_BACKEND_LATENCY.observe(elapsed, backend=backend.url)
+        return response, None
+
+    # ────────────── Routing and circuit breakers ──────────────
+    def _choose(self, tried=()):
+        """The backend with the lowest expected wait, preferring ones not tried yet for this call"""
+        now = time.monotonic()
+        with self._lock:
+            available = []
+            for backend in self.backends:
+                if backend.opened_at is None:
+                    available.append(backend)
+                elif now - backend.opened_at >= self.reset_timeout and not backend.probing:
+                    available.append(backend)  # half-open: one trial call
+            if not available:
+                EXECUTOR_REJECTIONS.inc(reason='circuit_open')
+                remaining = min((self.reset_timeout - (now - b.opened_at) for b in self.backends
+                                 if b.opened_at is not None), default=self.reset_timeout)
+                raise ExecutorUnavailable(
+                    f'The code executor is unavailable after repeated failures; '
+                    f'retrying in {max(1, round(remaining))}s')
+            fresh = [backend for backend in available if backend not in tried]
+            known = [b.latency for b in self.backends if b.latency is not None]
+            # Backends without a measured latency look as fast as the fastest, so they get tried
+            default = min(known) if known else 1.0
+            backend = min(fresh or available,
+                          key=lambda b: (b.in_flight + 1) * (b.latency if b.latency is not None else default))
+            if backend.opened_at is not None:
+                backend.probing = True
+            return backend
+
+    def _settle(self, backend, latency, healthy):
+        """Record a call's outcome on its backend (healthy=None: neither a success nor a failure)"""
+        with self._lock:
+            probe, backend.probing = backend.probing, False
+            if healthy is None:
+                return
+            if latency is not None:
+                backend.latency = latency if backend.latency is None else (
+                    LATENCY_WEIGHT * latency + (1 - LATENCY_WEIGHT) * backend.latency)
+            if healthy:
+                backend.failures = 0
+                if backend.opened_at is not None:
+                    print(f"✅ Code executor {backend.url} recovered; circuit closed")
+                backend.opened_at = None
+                EXECUTOR_CIRCUIT_OPEN.set(0, backend=backend.url)
+                return
+            backend.failures += 1
+            if probe or backend.failures >= self.failure_threshold:
+                if backend.opened_at is None or probe:
+                    print(f"⚠️ Code executor {backend.url} failing ({backend.failures} calls in a row); "
+                          f"circuit open for {self.reset_timeout:.0f}s")
+                backend.opened_at = time.monotonic()
+                EXECUTOR_CIRCUIT_OPEN.set(1, backend=backend.url)
+
+
+def _nothing_sent(error):
+    """Whether the request never reached the backend, so sending it again cannot run it twice"""
+    # ConnectTimeout is a ConnectionError; ReadTimeout (the request was sent) is not
+    return isinstance(error, requests.ConnectionError) and not isinstance(error, requests.ReadTimeout)
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After')
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
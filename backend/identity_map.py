@@ -0,0 +1,94 @@
+"""
+BugYou Identity Map
+Per-process map of username -> user_id and basic profile, so per-user queries skip the users lookup
+
+Almost every per-user query needs the user's primary key, and load_user needs
+the username for a session's user_id on every authenticated request. Both come
+from here: entries are put in when a user logs in or signs up (and on the first
+database lookup otherwise), and dropped when the account changes.
+
+A user_id never changes for a username, so entries stay valid until an account
+is changed or removed; max_age bounds how long another worker process can keep
+serving an identity it was not told about. Unknown usernames are not cached, so
+a user created elsewhere is found on the next lookup.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+from metrics import record_cache
+
+IDENTITY_MAX_AGE = 30 * 60
+IDENTITY_MAX_ENTRIES = 50_000
+PROFILE_FIELDS = ('user_id', 'username', 'fullname')
+
+
+class IdentityMap:
+    """LRU of profiles ({'user_id', 'username', 'fullname'}) by username, with a user_id index"""
+
+    def __init__(self, max_age=IDENTITY_MAX_AGE, max_entries=IDENTITY_MAX_ENTRIES):
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self._profiles = OrderedDict()  # username -> (profile, stored_at)
+        self._usernames = {}  # user_id -> username
+        self._lock = threading.Lock()
+
+    def put(self, row):
+        """Remember the identity in a users row (extra columns such as password are ignored)"""
+        if not row or row.get('user_id') is None or not row.get('username'):
+            return None
+        profile = {field: row.get(field) for field in PROFILE_FIELDS}
+        with self._lock:
+            previous = self._profiles.pop(profile['username'], None)
+            if previous and previous[0]['user_id'] != profile['user_id']:
+                self._usernames.pop(previous[0]['user_id'], None)
+            if previous and profile['fullname'] is None:
+                profile['fullname'] = previous[0]['fullname']
+            self._profiles[profile['username']] = (profile, time.monotonic())
+            self._usernames[profile['user_id']] = profile['username']
+            while len(self._profiles) > self.max_entries:
+                _, (evicted, _) = self._profiles.popitem(last=False)
+                self._usernames.pop(evicted['user_id'], None)
+        return dict(profile)
+
+    def _fresh(self, username):
+        entry = self._profiles.get(username)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.max_age:
+            del self._profiles[username]
+            self._usernames.pop(entry[0]['user_id'], None)
+            return None
+        self._profiles.move_to_end(username)
+        return dict(entry[0])
+
+    def get(self, username):
+        """Cached profile of username, or None"""
+        with self._lock:
+            profile = self._fresh(username)
+        record_cache('user_identity', profile is not None)
+        return profile
+
+    def get_by_id(self, user_id):
+        """Cached profile of user_id, or None"""
+        with self._lock:
+            username = self._usernames.get(user_id)
+            profile = self._fresh(username) if username is not None else None
+        record_cache('user_identity', profile is not None)
+        return profile
+
+    def invalidate(self, username=None, user_id=None):
+        """Forget one account (by username and/or user_id), or every account when neither is given"""
+        with self._lock:
+            if username is None and user_id is None:
+                self._profiles.clear()
+                self._usernames.clear()
+                return
+            if username is None:
+                username = self._usernames.get(user_id)
+            entry = self._profiles.pop(username, None) if username is not None else None
+            if entry:
+                self._usernames.pop(entry[0]['user_id'], None)
+            if user_id is not None:
+                self._usernames.pop(user_id, None)
@@ -0,0 +1,301 @@
+"""
+BugYou Metrics Registry
+Minimal Prometheus-compatible counters, gauges and histograms with a text exposition renderer
+
+Each process keeps its own registry. When BUGYOU_METRICS_DIR is set (the
+production launcher sets it), every worker periodically writes a snapshot of
+its registry to that directory and /metrics merges all of them, so a scrape
+sees the whole server no matter which worker answers it.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Latency buckets in seconds: sub-millisecond static hits up to 20s executor timeouts
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+METRICS_DIR = os.environ.get('BUGYOU_METRICS_DIR')
+SNAPSHOT_INTERVAL = 5  # seconds between background snapshot writes
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'type': self.type_name,
+                'documentation': self.documentation,
+                'labelnames': list(self.labelnames),
+                'samples': [[list(key), list(value) if isinstance(value, list) else value]
+                            for key, value in self._values.items()],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    """Monotonically increasing value"""
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        _ensure_snapshot_thread()
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (in-flight requests, pool sizes)"""
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        _ensure_snapshot_thread()
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        _ensure_snapshot_thread()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in cumulative buckets (for p50/p95/p99 via histogram_quantile)"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [per-bucket counts..., +Inf count] followed by sum
+                entry = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+                    break
+            else:
+                entry[len(self.buckets)] += 1
+            entry[-1] += value
+        _ensure_snapshot_thread()
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """Holds every metric of this process and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self.metrics:
+                return self.metrics[metric.name]
+            self.metrics[metric.name] = metric
+            return metric
+
+    def snapshot(self):
+        return {name: metric.snapshot() for name, metric in self.metrics.items()}
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge(name, documentation, labelnames))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ────────────── Shared metrics ──────────────
+CACHE_REQUESTS = counter(
+    'bugyou_cache_requests_total',
+    'Cache lookups by cache name and result (hit/miss)',
+    ('cache', 'result')
+)
+
+
+def record_cache(cache_name, hit):
+    """Count one lookup against a named cache"""
+    CACHE_REQUESTS.inc(cache=cache_name, result='hit' if hit else 'miss')
+
+
+# ────────────── Multi-process snapshots ──────────────
+_snapshot_thread_pid = None
+
+
+def _snapshot_path(pid):
+    return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+
+def write_snapshot():
+    """Atomically write this process's registry to the shared metrics directory"""
+    if not METRICS_DIR:
+        return
+    pid = os.getpid()
+    tmp_path = _snapshot_path(pid) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'pid': pid, 'metrics': REGISTRY.snapshot()}, f)
+    os.replace(tmp_path, _snapshot_path(pid))
+
+
+def _snapshot_loop():
+    while True:
+        time.sleep(SNAPSHOT_INTERVAL)
+        try:
+            write_snapshot()
+        except OSError as e:
+            print(f"⚠️ Could not write metrics snapshot: {e}")
+
+
+_snapshot_thread_lock = threading.Lock()
+
+
+def _ensure_snapshot_thread():
+    """Start the snapshot writer once per process (threads do not survive fork)"""
+    global _snapshot_thread_pid
+    if not METRICS_DIR or _snapshot_thread_pid == os.getpid():
+        return
+    with _snapshot_thread_lock:
+        if _snapshot_thread_pid != os.getpid():
+            _snapshot_thread_pid = os.getpid()
+            threading.Thread(target=_snapshot_loop, name='metrics-snapshot', daemon=True).start()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def _load_snapshots():
+    """Snapshots of every worker, this process's one always fresh"""
+    if not METRICS_DIR:
+        return [REGISTRY.snapshot()]
+    write_snapshot()
+    snapshots = []
+    for filename in os.listdir(METRICS_DIR):
+        if not (filename.startswith('metrics-') and filename.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        metrics = data['metrics']
+        if data['pid'] != os.getpid() and not _pid_alive(data['pid']):
+            # Counters/histograms of exited workers still count; their gauges do not
+            metrics = {name: m for name, m in metrics.items() if m['type'] != 'gauge'}
+        snapshots.append(metrics)
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    """Sum samples with identical labels across processes"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {**metric, 'samples': {}})
+            for key, value in metric['samples']:
+                key = tuple(key)
+                if key not in target['samples']:
+                    target['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    target['samples'][key] = [a + b for a, b in zip(target['samples'][key], value)]
+                else:
+                    target['samples'][key] += value
+    return merged
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus():
+    """Prometheus text exposition (version 0.0.4) of all processes' metrics"""
+    merged = merge_snapshots(_load_snapshots())
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        labelnames = metric['labelnames']
+        lines.append(f"# HELP {name} {metric['documentation']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key in sorted(metric['samples']):
+            value = metric['samples'][key]
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            bounds = list(metric['buckets']) + [float('inf')]
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                le = _format_value(bound) if bound == float('inf') else repr(float(bound))
+                lines.append(f"{name}_bucket{_format_labels(labelnames, key, ('le', le))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,139 @@
+"""
+BugYou Password Hashing
+Bounded worker pool for bcrypt, so a burst of logins cannot take over the web workers
+
+Hashing or checking a password costs 2^BCRYPT_LOG_ROUNDS rounds of bcrypt,
+tens to hundreds of milliseconds of CPU. Login and signup hand that work to a
+few dedicated threads per process (bcrypt releases the GIL while it hashes) and
+wait for the result, so at most `workers` hashes run at once and request
+threads serving challenges and submissions keep their share of the CPU.
+
+A request thread waits while its job runs, so the pool also bounds how many
+request threads a burst can hold: at most `workers` running plus max_queue
+queued jobs, and never more than request_threads - 1 (the process's request
+threads, less one that is always left for other traffic). A login beyond that,
+or one whose job does not start within max_wait seconds, is refused at once
+with HashingBusy (the endpoints answer 503 with Retry-After) instead of piling
+up behind the burst.
+"""
+
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+from metrics import counter, gauge, histogram
+
+PASSWORD_HASH_JOBS = counter(
+    'bugyou_password_hash_jobs_total',
+    'Password hash and check jobs by operation (hash, check) and outcome (ok, rejected, expired, failed)',
+    ('operation', 'outcome')
+)
+PASSWORD_HASH_QUEUE = gauge(
+    'bugyou_password_hash_queue_depth',
+    'Password hash and check jobs waiting for a hashing worker'
+)
+PASSWORD_HASH_WAIT = histogram(
+    'bugyou_password_hash_wait_seconds',
+    'Time password jobs waited in the queue before a hashing worker picked them up',
+    ('operation',)
+)
+PASSWORD_HASH_DURATION = histogram(
+    'bugyou_password_hash_duration_seconds',
+    'CPU-bound time of one bcrypt hash or check',
+    ('operation',)
+)
+
+
+class HashingBusy(RuntimeError):
+    """Too many logins are waiting for a hashing worker, or the job waited longer than max_wait to start"""
+
+    retry_after = 1
+
+
+class PasswordHasher:
+    def __init__(self, bcrypt, workers=2, max_queue=1, max_wait=1.0, request_threads=None):
+        # bcrypt: the app's flask_bcrypt.Bcrypt, which holds the configured log rounds
+        self.bcrypt = bcrypt
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.request_threads = request_threads
+        self._queue = queue.Queue()
+        self._pending = 0  # jobs queued or running, i.e. request threads waiting on the pool
+        self._lock = threading.Lock()
+        self._threads_pid = None
+
+    def configure(self, workers=None, max_queue=None, max_wait=None, request_threads=None):
+        if workers:
+            self.workers = max(1, int(workers))
+        if max_queue is not None:
+            self.max_queue = max(0, int(max_queue))
+        if max_wait is not None:
+            self.max_wait = float(max_wait)
+        if request_threads:
+            self.request_threads = int(request_threads)
+
+    @property
+    def max_pending(self):
+        """How many request threads may wait on the pool at once"""
+        limit = self.workers + self.max_queue
+        if self.request_threads:
+            limit = min(limit, self.request_threads - 1)
+        return max(1, limit)
+
+    def hash(self, password):
+        """bcrypt hash of password as text, computed on a hashing worker"""
+        return self._run('hash', lambda: self.bcrypt.generate_password_hash(password).decode('utf-8'))
+
+    def check(self, pw_hash, password):
+        """True if password matches pw_hash, checked on a hashing worker"""
+        return self._run('check', lambda: self.bcrypt.check_password_hash(pw_hash, password))
+
+    def _run(self, operation, job):
+        self._ensure_threads()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                PASSWORD_HASH_JOBS.inc(operation=operation, outcome='rejected')
+                raise HashingBusy('Too many logins at once, please try again')
+            self._pending += 1
+        try:
+            future = Future()
+            self._queue.put((operation, job, future, time.monotonic()))
+            PASSWORD_HASH_QUEUE.inc()
+            # No timeout here: the worker fails jobs that waited past max_wait instead of running them
+            return future.result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _ensure_threads(self):
+        # Threads started before fork() do not exist in the child
+        if self._threads_pid != os.getpid():
+            with self._lock:
+                if self._threads_pid != os.getpid():
+                    self._threads_pid = os.getpid()
+                    for number in range(self.workers):
+                        threading.Thread(target=self._work_loop, name=f'password-hash-{number}', daemon=True).start()
+
+    def _work_loop(self):
+        while True:
+            operation, job, future, queued_at = self._queue.get()
+            PASSWORD_HASH_QUEUE.dec()
+            waited = time.monotonic() - queued_at
+            PASSWORD_HASH_WAIT.observe(waited, operation=operation)
+            if waited > self.max_wait:
+                PASSWORD_HASH_JOBS.inc(operation=operation, outcome='expired')
+                future.set_exception(HashingBusy('Too many logins at once, please try again'))
+                continue
+            started = time.perf_counter()
+            try:
+                result = job()
+            except Exception as e:
+                PASSWORD_HASH_JOBS.inc(operation=operation, outcome='failed')
+                future.set_exception(e)
+                continue
+            PASSWORD_HASH_DURATION.observe(time.perf_counter() - started, operation=operation)
+            PASSWORD_HASH_JOBS.inc(operation=operation, outcome='ok')
+            future.set_result(result)
@@ -0,0 +1,233 @@
+"""
+BugYou Syntax Pre-check
+Local fast-fail syntax/compile check of a generated program before it is sent to Piston
+
+    python      compile()                       in process, ~1ms
+    javascript  node --check                    ~40ms
+
+A program that fails here never uses an executor slot; its errors come back in
+the same shape as Piston's compile errors. The check only ever says "broken":
+when a tool is missing, times out, all check slots are busy or the result
+can't be trusted, the program goes to Piston as before.
+
+A language is only checked when the local toolchain is the executor's version
+(configure_precheck(executor_versions=...)): the same major version for node,
+the same major.minor for Python, whose grammar changes between minor releases.
+Any other toolchain could reject code the executor accepts.
+
+Nothing is executed, and neither check reads anything but the program: node
+only parses it, in a throwaway directory with a minimal environment, a
+timeout and a bounded number of concurrent checks. C++ and Java are not
+checked here. Their compilers read arbitrary files (#include, imports) and
+can be kept busy by the code itself (template and constexpr bombs), which
+belongs in the executor's sandbox, not on the web host.
+"""
+
+import os
+import re
+import sys
+import shutil
+import signal
+import tempfile
+import threading
+import traceback
+import subprocess
+import time
+
+from metrics import counter, histogram
+from tracing import span
+
+PRECHECK_RESULTS = counter(
+    'bugyou_precheck_total',
+    'Local syntax pre-checks by outcome (error = rejected before dispatch, skipped = sent to Piston unchecked, '
+    'mismatch = local toolchain is not the executor\'s version)',
+    ('language', 'outcome')
+)
+PRECHECK_DURATION = histogram(
+    'bugyou_precheck_duration_seconds',
+    'Time spent in the local syntax pre-check',
+    ('language',)
+)
+
+# File names the programs are checked under
+SOURCE_NAMES = {
+    'python': 'main.py',
+    'javascript': 'main.js',
+}
+
+# Commands printing each local toolchain's version
+VERSION_COMMANDS = {
+    'javascript': ['node', '--version'],
+}
+
+_settings = {
+    'languages': frozenset(SOURCE_NAMES),
+    'timeout': 5.0,
+    'slot_wait': 0.2,
+    'executor_versions': {},
+}
+_slots = threading.BoundedSemaphore(os.cpu_count() or 2)
+_toolchains = {}  # language -> whether the local toolchain matches the executor's
+_toolchains_lock = threading.Lock()
+
+
+def configure_precheck(languages=None, timeout=None, slots=None, executor_versions=None):
+    """
+    Languages to pre-check (iterable or comma separated), per-check timeout in seconds,
+    concurrent checks, and {language: version} of the executor's toolchains; languages
+    without a known executor version are never checked locally.
+    """
+    global _slots
+    if languages is not None:
+        if isinstance(languages, str):
+            languages = [lang.strip() for lang in languages.split(',') if lang.strip()]
+        _settings['languages'] = frozenset(lang for lang in languages if lang in SOURCE_NAMES)
+    if timeout is not None:
+        _settings['timeout'] = float(timeout)
+    if slots:
+        _slots = threading.BoundedSemaphore(int(slots))
+    if executor_versions is not None:
+        _settings['executor_versions'] = dict(executor_versions)
+        with _toolchains_lock:
+            _toolchains.clear()
+
+
+def precheck(code, language):
+    """
+    Syntax/compile errors of a complete program as Piston-style stderr text,
+    or None when it looks fine or could not be checked locally.
+    """
+    if language not in _settings['languages']:
+        return None
+    started = time.perf_counter()
+    with span('precheck', language=language):
+        if not toolchain_matches(language):
+            error, outcome = None, 'mismatch'
+        elif language == 'python':
+            # In process and cheap, so no slot needed
+            error, outcome = _check_python(code)
+        elif not _slots.acquire(timeout=_settings['slot_wait']):
+            error, outcome = None, 'skipped'
+        else:
+            try:
+                error, outcome = CHECKERS[language](code)
+            finally:
+                _slots.release()
+    PRECHECK_DURATION.observe(time.perf_counter() - started, language=language)
+    PRECHECK_RESULTS.inc(language=language, outcome=outcome)
+    return error
+
+
+def toolchain_matches(language):
+    """Whether the local compiler or interpreter for language is the executor's version (checked once)"""
+    matches = _toolchains.get(language)
+    if matches is None:
+        with _toolchains_lock:
+            matches = _toolchains.get(language)
+            if matches is None:
+                expected = _settings['executor_versions'].get(language)
+                local = _local_version(language)
+                matches = _toolchains[language] = bool(expected and local) and _same_release(language, local, expected)
+                if not matches:
+                    print(f"⚠️ Syntax pre-check for {language} off: local toolchain {local or 'not found'}, "
+                          f"executor runs {expected or 'an unknown version'}")
+    return matches
+
+
+def _local_version(language):
+    if language == 'python':
+        return '.'.join(map(str, sys.version_info[:3]))
+    argv = VERSION_COMMANDS[language]
+    if shutil.which(argv[0]) is None:
+        return None
+    try:
+        result = subprocess.run(argv, stdin=subprocess.DEVNULL, capture_output=True, timeout=_settings['timeout'] * 2)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    match = re.search(r'\d+(?:\.\d+)*', (result.stdout + result.stderr).decode('utf-8', 'replace'))
+    return match.group(0) if match else None
+
+
+def _same_release(language, local, expected):
+    # Python's grammar changes in minor releases; node keeps what it accepts within a major
+    parts = 2 if language == 'python' else 1
+    return local.split('.')[:parts] == expected.split('.')[:parts]
+
+
+# ────────────── Python ──────────────
+def format_syntax_error(error, filename=SOURCE_NAMES['python']):
+    """SyntaxError rendered like the interpreter prints it"""
+    error.filename = filename
+    return ''.join(traceback.format_exception_only(type(error), error))
+
+
+def _check_python(code):
+    try:
+        compile(code, SOURCE_NAMES['python'], 'exec', dont_inherit=True)
+    except SyntaxError as e:  # includes IndentationError / TabError
+        return format_syntax_error(e), 'error'
+    except (ValueError, MemoryError, RecursionError):
+        return None, 'skipped'  # e.g. null bytes or absurd nesting; let the executor report it
+    return None, 'ok'
+
+
+# ────────────── External tools ──────────────
+# Address-space cap for checker processes
+MEMORY_LIMIT_KB = 1024 * 1024
+
+
+def _run_tool(argv, workdir, memory_limit_kb=None):
+    """(returncode, output) of a checker process, or None on timeout / failure to start"""
+    if memory_limit_kb:
+        # ulimit through sh rather than preexec_fn, which is unsafe in threaded workers
+        argv = ['/bin/sh', '-c', f'ulimit -v {int(memory_limit_kb)} 2>/dev/null; exec "$@"', 'sh'] + argv
+    try:
+        proc = subprocess.Popen(
+            argv, cwd=workdir, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            env={'PATH': os.environ.get('PATH', '/usr/bin:/bin'), 'LANG': 'C.UTF-8', 'HOME': workdir},
+            start_new_session=True,
+        )
+    except OSError:
+        return None
+    try:
+        output, _ = proc.communicate(timeout=_settings['timeout'])
+    except subprocess.TimeoutExpired:
+        # Kill the whole group, in case the tool started children
+        os.killpg(proc.pid, signal.SIGKILL)
+        proc.communicate()
+        return None
+    return proc.returncode, output.decode('utf-8', 'replace')
+
+
+def _check_with_tool(code, language, build_argv, clean_output, memory_limit_kb=MEMORY_LIMIT_KB):
+    """Write the program into a throwaway directory and run build_argv(workdir) + [source file] there"""
+    with tempfile.TemporaryDirectory(prefix='bugyou-precheck-') as workdir:
+        argv = build_argv(workdir)
+        if shutil.which(argv[0]) is None:
+            return None, 'skipped'
+        with open(os.path.join(workdir, SOURCE_NAMES[language]), 'w', encoding='utf-8') as f:
+            f.write(code)
+        result = _run_tool(argv + [SOURCE_NAMES[language]], workdir, memory_limit_kb)
+        if result is None:
+            return None, 'skipped'
+        returncode, output = result
+        if returncode == 0:
+            return None, 'ok'
+        error = clean_output(output, workdir)
+        return (error, 'error') if error else (None, 'skipped')
+
+
+def _check_javascript(code):
+    return _check_with_tool(code, 'javascript', lambda workdir: ['node', '--check'], _clean_node_output)
+
+
+def _clean_node_output(output, workdir):
+    lines = [line.replace(workdir + os.sep, '') for line in output.splitlines()]
+    # Drop node's internal stack frames and version banner
+    lines = [line for line in lines if not line.startswith('    at ') and not line.startswith('Node.js v')]
+    return '\n'.join(lines).strip() + '\n'
+
+
+CHECKERS = {
+    'javascript': _check_javascript,
+}
@@ -0,0 +1,129 @@
+"""
+BugYou Reference Check
+Run a new challenge's reference solution against its tests before it is stored
+
+When a challenge is added, the reference solution is run against every visible
+and hidden test, one executor job per test and several jobs at a time. Each
+test's expected output must match what the reference returns; with
+autofill_expected, missing or mismatched expected outputs are filled in from the
+reference instead. A reference that fails to compile or raises on a test is
+always rejected.
+
+The time each test's call took on the executor is kept as its baseline
+(baseline_ms in the challenge's test schema). Programs for tests that all have
+a baseline get a run time limit derived from it instead of the executor's
+default, so an endless loop gives its slot back in about a second:
+
+    limit = startup allowance of the language + TIME_LIMIT_FACTOR * sum(baselines)
+
+clamped to [TIME_LIMIT_FLOOR_MS, the configured maximum].
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import counter
+
+REFERENCE_CHECKS = counter(
+    'bugyou_reference_checks_total',
+    'Reference solution checks of added challenges by outcome (ok, filled, mismatch, error, unavailable)',
+    ('language', 'outcome')
+)
+
+# Process start-up, imports and JIT warm-up that are not part of any test's call time
+STARTUP_ALLOWANCE_MS = {
+    'python': 500,
+    'javascript': 500,
+    'cpp': 500,
+    'java': 1500,
+}
+TIME_LIMIT_FACTOR = 10
+TIME_LIMIT_FLOOR_MS = 1000
+
+_settings = {
+    'parallelism': 4,
+    # Piston's default run_timeout, and the most it accepts unless configured otherwise
+    'max_time_limit_ms': 3000,
+}
+
+
+class ReferenceCheckError(ValueError):
+    """The reference solution does not compile, crashes, or disagrees with the expected outputs"""
+
+    def __init__(self, message, mismatches=None):
+        super().__init__(message)
+        self.mismatches = mismatches or []
+
+
+class ReferenceRunError(RuntimeError):
+    """The executor could not run the reference solution (unavailable, API error)"""
+
+
+def configure_reference_check(parallelism=None, max_time_limit_ms=None):
+    if parallelism:
+        _settings['parallelism'] = max(1, int(parallelism))
+    if max_time_limit_ms:
+        _settings['max_time_limit_ms'] = int(max_time_limit_ms)
+
+
+def run_reference(run_tests, test_cases):
+    """
+    Results of the reference for every test (same order), each test its own job.
+    run_tests(test_cases) returns what run_all_tests_in_batch does for those tests.
+    """
+    def run_one(test_case):
+        return run_tests([test_case])
+
+    workers = max(1, min(_settings['parallelism'], len(test_cases)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reference-check') as pool:
+        batches = list(pool.map(run_one, test_cases))
+    results = []
+    for batch in batches:
+        if batch.get('compile_error'):
+            raise ReferenceCheckError(f"Reference solution does not compile:\n{batch.get('error')}")
+        if not batch.get('success') or len(batch.get('test_results', [])) != 1:
+            raise ReferenceRunError(batch.get('error') or 'no result from the executor')
+        results.append(batch['test_results'][0])
+    return results
+
+
+def reconcile(test_cases, results, labels, autofill=False):
+    """
+    (copies of test_cases whose expected outputs agree with the reference results,
+    number filled in); raises ReferenceCheckError listing every test that does not
+    (labels name them). Filled-in results are marked passed.
+    """
+    checked, mismatches, filled = [], [], 0
+    for test_case, result, label in zip(test_cases, results, labels):
+        test_case = dict(test_case)
+        expected = test_case.get('expected')
+        if result.get('error'):
+            mismatches.append({'test': label, 'input': test_case.get('input'), 'expected': expected,
+                               'error': result['error']})
+        elif not result.get('passed') or expected in (None, ''):
+            if autofill:
+                test_case['expected'] = result.get('actual')
+                result.update(passed=True, expected=result.get('actual'))
+                filled += 1
+            else:
+                mismatches.append({'test': label, 'input': test_case.get('input'), 'expected': expected,
+                                   'actual': result.get('actual')})
+        checked.append(test_case)
+    if mismatches:
+        names = ', '.join(m['test'] for m in mismatches)
+        raise ReferenceCheckError(f"Reference solution does not produce the expected output for: {names}", mismatches)
+    return checked, filled
+
+
+def baselines(test_cases, results, key):
+    """{key(test input): call time in ms} for the tests whose time was reported"""
+    return {key(tc.get('input')): r['duration_ms'] for tc, r in zip(test_cases, results)
+            if isinstance(r.get('duration_ms'), (int, float))}
+
+
+def program_time_limit_ms(test_cases, language):
+    """Run time limit for a program running these tests, or None unless every test has a baseline"""
+    times = [tc.get('baseline_ms') for tc in test_cases]
+    if not times or not all(isinstance(t, (int, float)) and t >= 0 for t in times):
+        return None
+    limit = STARTUP_ALLOWANCE_MS.get(language, 1000) + TIME_LIMIT_FACTOR * sum(times)
+    return int(min(max(limit, TIME_LIMIT_FLOOR_MS), _settings['max_time_limit_ms']))
@@ -0,0 +1,373 @@
+"""
+BugYou Result Frames
+Per-test framed results emitted by the generated harness, and type-aware grading of them
+
+The harness calls the user's function once per test, captures whatever the
+function prints, and writes one frame line per test:
+
+    <marker>{"i": 0, "status": "ok", "value": [1, 2], "stdout": "debug\\n", "ms": 0.012}
+    <marker>{"i": 1, "status": "error", "error": "ZeroDivisionError: division by zero", "stdout": "", "ms": 0.003}
+
+The marker contains a random nonce per run, so nothing the user prints can be
+mistaken for a result, and results are matched to tests by index rather than
+by line position. "ms" is the time the call itself took, without process
+start-up or compilation.
+"""
+
+import ast
+import json
+import math
+import uuid
+
+MARKER_PREFIX = '@@BUGYOU:'
+
+# Float tolerance used when comparing returned numbers with expected ones
+REL_TOL = 1e-6
+ABS_TOL = 1e-9
+
+
+def new_frame_marker():
+    return f"{MARKER_PREFIX}{uuid.uuid4().hex[:16]}@@"
+
+
+# ────────────── Harness templates ──────────────
+# __MARKER__ is replaced by the marker as a string literal (json.dumps output is valid in all four languages)
+
+PYTHON_HARNESS = '''import io as __bugyou_io
+import sys as __bugyou_sys
+import json as __bugyou_json
+import contextlib as __bugyou_contextlib
+import time as __bugyou_time
+def __bugyou_run(index, call):
+    captured = __bugyou_io.StringIO()
+    started = __bugyou_time.perf_counter()
+    try:
+        with __bugyou_contextlib.redirect_stdout(captured):
+            frame = {'i': index, 'status': 'ok', 'value': call()}
+    except BaseException as e:
+        frame = {'i': index, 'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+    frame['ms'] = (__bugyou_time.perf_counter() - started) * 1000
+    frame['stdout'] = captured.getvalue()
+    try:
+        line = __bugyou_json.dumps(frame)
+    except (TypeError, ValueError):
+        frame['value'] = repr(frame.get('value'))
+        line = __bugyou_json.dumps(frame)
+    __bugyou_sys.__stdout__.write(__MARKER__ + line + '\\n')
+    __bugyou_sys.__stdout__.flush()'''
+
+JAVASCRIPT_HARNESS = '''const __bugyouUtil = require('util');
+function __bugyouRun(index, call) {
+  const captured = [];
+  const originalLog = console.log;
+  console.log = (...args) => { captured.push(__bugyouUtil.format(...args) + '\\n'); };
+  const frame = { i: index, status: 'ok', value: null };
+  const started = process.hrtime.bigint();
+  try {
+    const value = call();
+    frame.value = value === undefined ? null : value;
+  } catch (e) {
+    frame.status = 'error';
+    frame.error = String(e);
+  } finally {
+    console.log = originalLog;
+  }
+  frame.ms = Number(process.hrtime.bigint() - started) / 1e6;
+  frame.stdout = captured.join('');
+  let line;
+  try {
+    line = JSON.stringify(frame);
+  } catch (e) {
+    frame.value = String(frame.value);
+    line = JSON.stringify(frame);
+  }
+  process.stdout.write(__MARKER__ + line + '\\n');
+}'''
+
+JAVA_HARNESS = '''    private static final java.io.PrintStream __bugyouOut = System.out;
+    private static String __bugyouString(String s) {
+        StringBuilder out = new StringBuilder("\\"");
+        for (char c : s.toCharArray()) {
+            if (c == '"' || c == '\\\\') out.append('\\\\').append(c);
+            else if (c == '\\n') out.append("\\\\n");
+            else if (c < 0x20) out.append(String.format("\\\\u%04x", (int) c));
+            else out.append(c);
+        }
+        return out.append('"').toString();
+    }
+    private static String __bugyouJson(Object o) {
+        if (o == null) return "null";
+        if (o instanceof String || o instanceof Character) return __bugyouString(o.toString());
+        if (o instanceof Double || o instanceof Float) {
+            double d = ((Number) o).doubleValue();
+            return Double.isNaN(d) || Double.isInfinite(d) ? "null" : o.toString();
+        }
+        if (o instanceof Number || o instanceof Boolean) return o.toString();
+        StringBuilder out = new StringBuilder();
+        if (o.getClass().isArray()) {
+            out.append('[');
+            for (int i = 0; i < java.lang.reflect.Array.getLength(o); i++) {
+                if (i > 0) out.append(',');
+                out.append(__bugyouJson(java.lang.reflect.Array.get(o, i)));
+            }
+            return out.append(']').toString();
+        }
+        if (o instanceof java.util.Map) {
+            out.append('{');
+            for (Object entry : ((java.util.Map<?, ?>) o).entrySet()) {
+                java.util.Map.Entry<?, ?> e = (java.util.Map.Entry<?, ?>) entry;
+                if (out.length() > 1) out.append(',');
+                out.append(__bugyouString(String.valueOf(e.getKey()))).append(':').append(__bugyouJson(e.getValue()));
+            }
+            return out.append('}').toString();
+        }
+        if (o instanceof Iterable) {
+            out.append('[');
+            for (Object item : (Iterable<?>) o) {
+                if (out.length() > 1) out.append(',');
+                out.append(__bugyouJson(item));
+            }
+            return out.append(']').toString();
+        }
+        return __bugyouString(o.toString());
+    }
+    private static void __bugyouRun(int index, java.util.concurrent.Callable<Object> call) {
+        java.io.ByteArrayOutputStream captured = new java.io.ByteArrayOutputStream();
+        System.setOut(new java.io.PrintStream(captured, true));
+        String status = "ok", value = "null", error = null;
+        long started = System.nanoTime();
+        try {
+            value = __bugyouJson(call.call());
+        } catch (Throwable e) {
+            status = "error";
+            error = e.toString();
+        } finally {
+            System.setOut(__bugyouOut);
+        }
+        double ms = (System.nanoTime() - started) / 1e6;
+        StringBuilder frame = new StringBuilder("{\\"i\\":").append(index)
+            .append(",\\"status\\":\\"").append(status).append("\\",\\"value\\":").append(value)
+            .append(",\\"ms\\":").append(ms)
+            .append(",\\"stdout\\":").append(__bugyouString(captured.toString()));
+        if (error != null) frame.append(",\\"error\\":").append(__bugyouString(error));
+        __bugyouOut.println(__MARKER__ + frame.append('}'));
+        __bugyouOut.flush();
+    }'''
+
+CPP_HARNESS = '''static std::string __bugyou_string(const std::string& s) {
+    std::string out = "\\"";
+    for (char c : s) {
+        if (c == '"' || c == '\\\\') { out += '\\\\'; out += c; }
+        else if (c == '\\n') out += "\\\\n";
+        else if (static_cast<unsigned char>(c) < 0x20) { char buf[8]; snprintf(buf, sizeof buf, "\\\\u%04x", c); out += buf; }
+        else out += c;
+    }
+    return out + "\\"";
+}
+static std::string __bugyou_json(const std::string& s) { return __bugyou_string(s); }
+static std::string __bugyou_json(const char* s) { return __bugyou_string(s); }
+static std::string __bugyou_json(char c) { return __bugyou_string(std::string(1, c)); }
+static std::string __bugyou_json(bool b) { return b ? "true" : "false"; }
+template <class T>
+typename std::enable_if<std::is_arithmetic<T>::value, std::string>::type __bugyou_json(T v) {
+    if (std::is_floating_point<T>::value && !std::isfinite(static_cast<double>(v))) return "null";
+    std::ostringstream out;
+    out << std::setprecision(std::numeric_limits<T>::max_digits10) << v;
+    return out.str();
+}
+template <class T>
+std::string __bugyou_json(const std::vector<T>& v) {
+    std::string out = "[";
+    for (size_t i = 0; i < v.size(); ++i) {
+        const T& item = v[i];
+        if (i) out += ",";
+        out += __bugyou_json(item);
+    }
+    return out + "]";
+}
+template <class F>
+void __bugyou_run(int index, F call) {
+    std::ostringstream captured;
+    std::streambuf* original = std::cout.rdbuf(captured.rdbuf());
+    std::string status = "ok", value = "null", error;
+    auto started = std::chrono::steady_clock::now();
+    try {
+        value = call();
+    } catch (const std::exception& e) {
+        status = "error";
+        error = e.what();
+    } catch (...) {
+        status = "error";
+        error = "unknown exception";
+    }
+    std::cout.rdbuf(original);
+    double ms = std::chrono::duration<double, std::milli>(std::chrono::steady_clock::now() - started).count();
+    std::cout << __MARKER__ << "{\\"i\\":" << index << ",\\"status\\":\\"" << status << "\\",\\"value\\":" << value
+              << ",\\"ms\\":" << __bugyou_json(ms)
+              << ",\\"stdout\\":" << __bugyou_string(captured.str());
+    if (status != "ok") std::cout << ",\\"error\\":" << __bugyou_string(error);
+    std::cout << "}" << std::endl;
+}'''
+
+
+def harness_prelude(language, marker):
+    """Helper definitions the generated driver calls for every test"""
+    template = {
+        'python': PYTHON_HARNESS,
+        'javascript': JAVASCRIPT_HARNESS,
+        'java': JAVA_HARNESS,
+        'cpp': CPP_HARNESS,
+    }[language]
+    return template.replace('__MARKER__', json.dumps(marker))
+
+
+# ────────────── Parsing ──────────────
+def parse_frames(stdout, marker):
+    """{test index: frame} from the program's stdout; lines without the marker are ignored"""
+    frames = {}
+    for line in stdout.splitlines():
+        position = line.find(marker)
+        if position == -1:
+            continue
+        try:
+            frame = json.loads(line[position + len(marker):])
+        except ValueError:
+            continue
+        if isinstance(frame, dict) and isinstance(frame.get('i'), int):
+            frames.setdefault(frame['i'], frame)
+    return frames
+
+
+def grade_frames(frames, test_cases, language, missing_error=None):
+    """Per-test results in the shape the frontend expects, plus captured stdout, errors and call time (duration_ms)"""
+    results = []
+    for i, test_case in enumerate(test_cases):
+        expected = test_case.get('expected_output') or test_case.get('expected', '')
+        frame = frames.get(i)
+        if frame is None:
+            results.append({'test_number': i+1, 'passed': False, 'actual': None, 'expected': expected,
+                            'error': missing_error or 'No result: the program stopped before this test',
+                            'stdout': ''})
+        elif frame.get('status') != 'ok':
+            results.append({'test_number': i+1, 'passed': False, 'actual': None, 'expected': expected,
+                            'error': frame.get('error') or 'Error', 'stdout': frame.get('stdout', '')})
+        else:
+            value = frame.get('value')
+            results.append({'test_number': i+1, 'passed': compare_outputs_smart(value, expected, language),
+                            'actual': display_value(value, language), 'expected': expected,
+                            'stdout': frame.get('stdout', '')})
+        if frame is not None and isinstance(frame.get('ms'), (int, float)):
+            results[-1]['duration_ms'] = round(frame['ms'], 3)
+    return results
+
+
+# ────────────── Comparison ──────────────
+def parse_expected(expected):
+    """Stored expected outputs are strings; read them as JSON or a Python literal when they are one"""
+    text = expected.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return text
+
+
+def values_equal(actual, expected):
+    """Structural equality with float tolerance; bools only equal bools"""
+    if isinstance(actual, bool) or isinstance(expected, bool):
+        return isinstance(actual, bool) and isinstance(expected, bool) and actual == expected
+    if isinstance(actual, (int, float)) and isinstance(expected, (int, float)):
+        return math.isclose(actual, expected, rel_tol=REL_TOL, abs_tol=ABS_TOL)
+    if actual is None or expected is None:
+        return actual is None and expected is None
+    if isinstance(actual, str) and isinstance(expected, str):
+        return actual.strip() == expected.strip()
+    if isinstance(actual, (list, tuple)) and isinstance(expected, (list, tuple)):
+        return len(actual) == len(expected) and all(values_equal(a, e) for a, e in zip(actual, expected))
+    if isinstance(actual, dict) and isinstance(expected, dict):
+        actual = {str(k): v for k, v in actual.items()}
+        expected = {str(k): v for k, v in expected.items()}
+        return actual.keys() == expected.keys() and all(values_equal(actual[k], expected[k]) for k in actual)
+    return False
+
+
+def compare_outputs_smart(actual, expected, language=None):
+    """
+    Compare a returned value with a stored expected output. Passes when the value
+    prints exactly like the expected text (how challenges were graded before) or
+    when both are structurally equal, numbers within float tolerance.
+    """
+    if isinstance(expected, str):
+        if display_value(actual, language).strip() == expected.strip():
+            return True
+        expected = parse_expected(expected)
+    return values_equal(actual, expected)
+
+
+# ────────────── Display ──────────────
+def display_value(value, language=None):
+    """Render a returned value the way the language's old print-based harness showed it"""
+    if language == 'python':
+        return _python_str(value, top=True)
+    if language == 'cpp':
+        return _cpp_str(value)
+    if language == 'java':
+        return _java_str(value)
+    if language == 'javascript':
+        return _js_str(value, top=True)
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _python_str(value, top=False):
+    if isinstance(value, str):
+        return value if top else repr(value)
+    if isinstance(value, list):
+        return '[' + ', '.join(_python_str(v) for v in value) + ']'
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{_python_str(k)}: {_python_str(v)}" for k, v in value.items()) + '}'
+    return repr(value)
+
+
+def _cpp_str(value):
+    # cout of the old print snippets: "1 2 3" for vectors, "1 2 |3 4 |" for 2D vectors
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float):
+        return format(value, '.6g')
+    if isinstance(value, list):
+        if value and all(isinstance(row, list) for row in value):
+            return ''.join(''.join(f"{_cpp_str(x)} " for x in row) + '|' for row in value)
+        return ' '.join(_cpp_str(v) for v in value)
+    return '' if value is None else str(value)
+
+
+def _java_str(value):
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return 'null'
+    if isinstance(value, list):
+        return '[' + ', '.join(_java_str(v) for v in value) + ']'
+    if isinstance(value, dict):
+        return '{' + ', '.join(f"{k}={_java_str(v)}" for k, v in value.items()) + '}'
+    return str(value)
+
+
+def _js_str(value, top=False):
+    # console.log / util.inspect formatting
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return 'null'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, str):
+        return value if top else repr(value)
+    if isinstance(value, list):
+        return '[ ' + ', '.join(_js_str(v) for v in value) + ' ]' if value else '[]'
+    if isinstance(value, dict):
+        return '{ ' + ', '.join(f"{k}: {_js_str(v)}" for k, v in value.items()) + ' }' if value else '{}'
+    return str(value)
@@ -0,0 +1,83 @@
+"""
+BugYou Result Ledger
+Server-side record of test results per (user, challenge, code), so a submit only runs what a run did not
+
+/api/execute records the result of every test it ran for a user's code;
+/api/validate looks each of the challenge's tests up for the same user,
+challenge and code fingerprint (code_fingerprint.py, so comment and layout
+edits still match) and only sends the missing ones to the executor. A
+test is identified by its input, expected output and the literal the driver
+passed to the function, so a result recorded for a client-supplied test can
+only ever be reused for exactly the same test.
+
+In memory per worker process: a submit that lands on another worker simply
+runs the tests again.
+"""
+
+import json
+import time
+import threading
+from collections import OrderedDict
+
+from metrics import record_cache
+from code_fingerprint import fingerprint
+
+# A submit usually follows its run within minutes
+LEDGER_TTL = 30 * 60
+LEDGER_MAX_ENTRIES = 10_000
+
+
+def code_hash(code, language):
+    return fingerprint(code or '', language)
+
+
+def test_key(test_case, language):
+    """What makes two tests the same: input, expected output and the literal the driver used"""
+    literal = (test_case.get('literals') or {}).get(language)
+    return json.dumps([test_case.get('input'), test_case.get('expected_output'), literal], sort_keys=True)
+
+
+class ResultLedger:
+    """LRU of {test key: result} per (owner, code fingerprint); owner is (username, language, difficulty, challenge_id)"""
+
+    def __init__(self, ttl=LEDGER_TTL, max_entries=LEDGER_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, owner, code, test_cases, test_results):
+        """Remember the results of test_cases (same order) for this owner and code"""
+        language = owner[1]
+        key = (owner, code_hash(code, language))
+        with self._lock:
+            results, _ = self._entries.pop(key, ({}, None))
+            for test_case, result in zip(test_cases, test_results):
+                results[test_key(test_case, language)] = {k: v for k, v in result.items() if k != 'test_number'}
+            self._entries[key] = (results, time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def lookup(self, owner, code, test_cases):
+        """{index in test_cases: recorded result} for the tests this code already ran"""
+        language = owner[1]
+        key = (owner, code_hash(code, language))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry:
+                self._entries.move_to_end(key)
+            results = entry[0] if entry else {}
+            known = {}
+            for index, test_case in enumerate(test_cases):
+                result = results.get(test_key(test_case, language))
+                record_cache('result_ledger', result is not None)
+                if result is not None:
+                    known[index] = dict(result)
+            return known
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
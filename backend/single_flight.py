@@ -0,0 +1,64 @@
+"""
+BugYou Single Flight
+Coalesce identical calls that are in flight at the same time into one
+
+When a whole class runs the same untouched buggy_code at once, every request
+would send the same program with the same tests to the executor. With
+SingleFlight.do(key, fn), the first caller for a key (the leader) runs fn; callers
+arriving with the same key while it runs wait for it and get a copy of its
+result (or its exception) instead of running fn themselves. Once the leader is
+done the key is released, so later callers are served by whatever cache the
+leader filled, or run again.
+
+Per process: identical calls that land on different workers each run once.
+"""
+
+import copy
+import threading
+
+from metrics import counter
+
+SINGLE_FLIGHT_CALLS = counter(
+    'bugyou_single_flight_calls_total',
+    'Coalesced calls by name and role (leader: ran the call, follower: shared a running one)',
+    ('name', 'role')
+)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """fn()'s result, shared with every caller that asks for key while it runs"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        SINGLE_FLIGHT_CALLS.inc(name=self.name, role='leader' if leader else 'follower')
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Callers number and merge test results in place; each gets its own copy
+            return copy.deepcopy(call.result)
+        try:
+            call.result = fn()
+            return copy.deepcopy(call.result)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -0,0 +1,123 @@
+"""
+BugYou Speculative Execution
+Low-priority background jobs that precompute work a user is about to ask for
+
+After a Run passes every visible test, the user almost always submits next.
+With speculation on, /api/execute queues the challenge's hidden tests for that
+code here; the results land in the result ledger (see result_ledger.py), so the
+Submit that follows finds every test already graded and returns at once.
+
+Jobs run one at a time on a single background thread per process, and only
+while fewer than busy_threshold executor requests are in flight, so they use
+idle executor capacity and never compete with interactive requests. A job that
+can't start within max_delay seconds is dropped. When the Submit arrives first,
+a queued job is cancelled and the Submit runs the tests itself; a job already
+running is waited for instead of running the same tests twice.
+"""
+
+import os
+import time
+import queue
+import threading
+
+from metrics import counter
+
+SPECULATIVE_JOBS = counter(
+    'bugyou_speculative_jobs_total',
+    'Speculative background jobs by outcome (queued, dropped, expired, cancelled, completed, failed, waited)',
+    ('outcome',)
+)
+
+
+class SpeculativeRunner:
+    def __init__(self, load=lambda: 0, busy_threshold=4, max_queue=64, max_delay=30.0, enabled=False):
+        # load() -> current number of foreground executor requests
+        self.load = load
+        self.busy_threshold = busy_threshold
+        self.max_delay = max_delay
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._jobs = {}  # key -> {'state': 'queued' | 'running', 'done': Event}
+        self._lock = threading.Lock()
+        self._thread_pid = None
+
+    def configure(self, enabled=None, busy_threshold=None, max_delay=None):
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        if busy_threshold is not None:
+            self.busy_threshold = int(busy_threshold)
+        if max_delay is not None:
+            self.max_delay = float(max_delay)
+
+    def submit(self, key, job):
+        """Queue job() under key unless speculation is off, the key is already queued or the queue is full"""
+        if not self.enabled:
+            return False
+        self._ensure_thread()
+        with self._lock:
+            if key in self._jobs:
+                return False
+            entry = {'state': 'queued', 'done': threading.Event(), 'queued_at': time.monotonic()}
+            try:
+                self._queue.put_nowait((key, job))
+            except queue.Full:
+                SPECULATIVE_JOBS.inc(outcome='dropped')
+                return False
+            self._jobs[key] = entry
+        SPECULATIVE_JOBS.inc(outcome='queued')
+        return True
+
+    def settle(self, key, timeout):
+        """
+        Before doing the work itself, a request calls this: a queued job for key is
+        cancelled, a running one is waited for (up to timeout). True if a job finished.
+        """
+        with self._lock:
+            entry = self._jobs.get(key)
+            if entry is None:
+                return False
+            if entry['state'] == 'queued':
+                del self._jobs[key]
+                entry['done'].set()
+                SPECULATIVE_JOBS.inc(outcome='cancelled')
+                return False
+        SPECULATIVE_JOBS.inc(outcome='waited')
+        return entry['done'].wait(timeout)
+
+    def _ensure_thread(self):
+        # One worker per process; a thread started before fork() does not exist in the child
+        if self._thread_pid != os.getpid():
+            with self._lock:
+                if self._thread_pid != os.getpid():
+                    self._thread_pid = os.getpid()
+                    threading.Thread(target=self._work_loop, name='speculative-jobs', daemon=True).start()
+
+    def _work_loop(self):
+        while True:
+            key, job = self._queue.get()
+            with self._lock:
+                entry = self._jobs.get(key)
+            if entry is None:
+                continue  # cancelled while queued
+            # Low priority: wait for the executor to be idle enough, give up past the deadline
+            while self.load() >= self.busy_threshold and time.monotonic() - entry['queued_at'] < self.max_delay:
+                time.sleep(0.05)
+            with self._lock:
+                if self._jobs.get(key) is not entry:
+                    continue
+                if time.monotonic() - entry['queued_at'] >= self.max_delay:
+                    del self._jobs[key]
+                    entry['done'].set()
+                    SPECULATIVE_JOBS.inc(outcome='expired')
+                    continue
+                entry['state'] = 'running'
+            try:
+                job()
+                SPECULATIVE_JOBS.inc(outcome='completed')
+            except Exception as e:
+                SPECULATIVE_JOBS.inc(outcome='failed')
+                print(f"⚠️ Speculative job failed: {e}")
+            finally:
+                with self._lock:
+                    self._jobs.pop(key, None)
+                entry['done'].set()
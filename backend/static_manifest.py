@@ -0,0 +1,181 @@
+"""
+BugYou Static Asset Manifest
+Precomputed, in-memory index of every frontend/asset file with fingerprints and compressed variants
+"""
+
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import time
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Cache policies
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Only text-like assets are worth compressing; images are already compressed
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+)
+MIN_COMPRESS_SIZE = 256
+
+# Local href/src references inside HTML pages (rewritten to fingerprinted URLs)
+_html_ref_regex = re.compile(r'(\b(?:href|src)=")([^"#:]+?)(\?[^"]*)?(")')
+
+
+class StaticAsset:
+    """A single file held in memory with its fingerprint and precompressed variants"""
+
+    __slots__ = ('key', 'path', 'mimetype', 'digest', 'etag', 'variants', 'fingerprinted_key')
+
+    def __init__(self, key, path, body):
+        self.key = key
+        self.path = path
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.digest = hashlib.sha256(body).hexdigest()
+        self.etag = self.digest[:20]
+        self.variants = {'identity': body}
+        self.fingerprinted_key = fingerprint_key(key, self.digest)
+        if self.mimetype.startswith(COMPRESSIBLE_TYPES) and len(body) >= MIN_COMPRESS_SIZE:
+            gz = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(gz) < len(body):
+                self.variants['gzip'] = gz
+            if brotli is not None:
+                br = brotli.compress(body, quality=11)
+                if len(br) < len(body):
+                    self.variants['br'] = br
+
+    def alias(self, key):
+        """Same file reachable under another URL; shares body and compressed variants"""
+        other = object.__new__(StaticAsset)
+        for slot in StaticAsset.__slots__:
+            setattr(other, slot, getattr(self, slot))
+        other.key = key
+        other.fingerprinted_key = fingerprint_key(key, self.digest)
+        return other
+
+    @property
+    def is_html(self):
+        return self.mimetype == 'text/html'
+
+
+def fingerprint_key(key, digest):
+    """home/home.css -> home/home.<hash>.css"""
+    base, ext = os.path.splitext(key)
+    return f"{base}.{digest[:10]}{ext}"
+
+
+class StaticManifest:
+    """
+    Maps request paths to in-memory assets.
+    Lookup order mirrors the old serve_static chain: folder-prefixed paths
+    (home/, guide/, ...) first, then the first folder in STATIC_FOLDERS order
+    that contains the file.
+    """
+
+    def __init__(self, root_path, folders, prefixed_folders):
+        self.root_path = root_path
+        self.folders = folders
+        self.prefixed_folders = prefixed_folders
+        self.assets = {}
+        self.pages = {}
+        self.build_time = 0.0
+
+    def build(self):
+        """Read every file once and index it under all the URLs it is reachable by"""
+        start_time = time.time()
+        assets = {}
+        files = []
+        for folder_name, folder_path in self.folders.items():
+            folder = os.path.normpath(os.path.join(self.root_path, folder_path))
+            for dirpath, _, filenames in os.walk(folder):
+                for filename in sorted(filenames):
+                    full_path = os.path.join(dirpath, filename)
+                    rel = os.path.relpath(full_path, folder).replace(os.sep, '/')
+                    files.append((folder_name, rel, full_path))
+
+        # Prefixed lookups (home/home.css, assets/logo.png) win over the fallback search
+        for folder_name, rel, full_path in files:
+            if folder_name in self.prefixed_folders:
+                assets.setdefault(f"{folder_name}/{rel}", full_path)
+        for folder_name, rel, full_path in files:
+            assets.setdefault(rel, full_path)
+
+        # Non-HTML files first so pages can be rewritten to point at fingerprinted URLs
+        self.assets = {}
+        built = {}
+        ordered = sorted(assets.items(), key=lambda item: item[1].endswith('.html'))
+        for key, full_path in ordered:
+            if full_path in built:
+                self._add(built[full_path].alias(key))
+                continue
+            with open(full_path, 'rb') as f:
+                body = f.read()
+            if full_path.endswith('.html'):
+                try:
+                    body = self._rewrite_html(body.decode('utf-8')).encode('utf-8')
+                except UnicodeDecodeError:
+                    pass  # e.g. admin.html is UTF-16; serve it untouched
+            built[full_path] = StaticAsset(key, full_path, body)
+            self._add(built[full_path])
+
+        self.pages = {}
+        for folder_name, folder_path in self.folders.items():
+            folder = os.path.normpath(os.path.join(self.root_path, folder_path))
+            for asset in built.values():
+                if asset.is_html and os.path.dirname(asset.path) == folder:
+                    self.pages[(folder_name, os.path.basename(asset.path))] = asset
+
+        self.build_time = time.time() - start_time
+        total = sum(len(a.variants['identity']) for a in built.values())
+        print(f"📦 Static manifest built: {len(built)} files, {total // 1024} KiB in {self.build_time * 1000:.1f}ms")
+        return self
+
+    def _add(self, asset):
+        self.assets[asset.key] = asset
+        self.assets[asset.fingerprinted_key] = asset
+
+    def _rewrite_html(self, html):
+        """Point local CSS/JS/image references at their fingerprinted, immutable URLs"""
+        def replace(match):
+            prefix, ref, _query, suffix = match.groups()
+            # Every page is served from a top-level route, so relative refs resolve against '/'
+            key = ref[2:] if ref.startswith('./') else ref.lstrip('/')
+            asset = self.assets.get(key)
+            if asset is None or asset.is_html:
+                return match.group(0)
+            return f"{prefix}/{asset.fingerprinted_key}{suffix}"
+        return _html_ref_regex.sub(replace, html)
+
+    def lookup(self, key):
+        """Return the asset served at a request path (without leading slash) or None"""
+        return self.assets.get(key)
+
+    def page(self, folder_name, filename):
+        """Return an HTML page by its STATIC_FOLDERS name"""
+        return self.pages.get((folder_name, filename))
+
+    def asset_url(self, key):
+        """Fingerprinted URL for a logical asset path (falls back to the plain path)"""
+        asset = self.assets.get(key)
+        return f"/{asset.fingerprinted_key}" if asset else f"/{key}"
+
+    def is_fingerprinted(self, key, asset):
+        return key == asset.fingerprinted_key and key != asset.key
+
+
+def choose_encoding(asset, accept_encodings):
+    """Pick the best precompressed variant the client accepts"""
+    for encoding in ('br', 'gzip'):
+        if encoding in asset.variants and accept_encodings[encoding]:
+            return encoding
+    return 'identity'
@@ -0,0 +1,309 @@
+"""
+BugYou Test Schema
+Typed parameters for challenge test inputs, validated once and pre-rendered per language
+
+A challenge declares the types of its function's parameters:
+
+    "param_types": ["int[]", "int"]
+
+Types are int, long, double, bool and string, with any number of [] suffixes
+for (nested) arrays. When a challenge is added, every test input is parsed
+against those types and rendered as a ready-to-paste argument list for each
+language, so driver generation is a lookup instead of a guess:
+
+    "[2, 7, 11], 9"  ->  python  [2, 7, 11], 9
+                         cpp     {2,7,11}, 9
+                         java    new int[]{2,7,11}, 9
+                         javascript  [[2,7,11],9]   (indexed as tc[0], tc[1])
+
+Challenges added without param_types get them inferred from their inputs.
+"""
+
+import ast
+import json
+import math
+
+BASE_TYPES = ('int', 'long', 'double', 'bool', 'string')
+TYPE_ALIASES = {
+    'integer': 'int',
+    'float': 'double',
+    'boolean': 'bool',
+    'str': 'string',
+    'String': 'string',
+}
+
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+LONG_MIN, LONG_MAX = -2 ** 63, 2 ** 63 - 1
+
+JAVA_TYPE_NAMES = {'int': 'int', 'long': 'long', 'double': 'double', 'bool': 'boolean', 'string': 'String'}
+
+
+class TestSchemaError(ValueError):
+    """A parameter type or test input that does not fit the schema"""
+
+
+# ────────────── Types ──────────────
+def parse_type(spec):
+    """'int[][]' -> ('int', 2)"""
+    if not isinstance(spec, str):
+        raise TestSchemaError(f"Parameter type must be a string, got {spec!r}")
+    text = spec.replace(' ', '')
+    depth = 0
+    while text.endswith('[]'):
+        text = text[:-2]
+        depth += 1
+    base = TYPE_ALIASES.get(text, text)
+    if base not in BASE_TYPES:
+        raise TestSchemaError(f"Unknown parameter type {spec!r} (expected one of {', '.join(BASE_TYPES)}, optionally with [])")
+    return base, depth
+
+
+def format_type(base, depth):
+    return (base or 'any') + '[]' * depth
+
+
+def normalize_param_types(specs):
+    """Canonical spelling of a param_types list, e.g. ['float[]'] -> ['double[]']"""
+    if not isinstance(specs, list) or not specs:
+        raise TestSchemaError('param_types must be a non-empty list of type names')
+    return [format_type(*parse_type(spec)) for spec in specs]
+
+
+# ────────────── Inputs ──────────────
+def parse_raw_input(raw):
+    """Stored inputs are strings like '[1, 2], 3'; read them as JSON or a Python literal"""
+    if not isinstance(raw, str):
+        return raw
+    text = raw.strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return raw
+
+
+def split_params(value, count):
+    """One parsed input -> a list with one value per parameter"""
+    if count == 1:
+        return [value]
+    if isinstance(value, (tuple, list)) and len(value) == count:
+        return list(value)
+    raise TestSchemaError(f"expected {count} comma separated arguments, got {value!r}")
+
+
+def coerce_value(value, base, depth):
+    """Check value against a type and return it in canonical form (tuples -> lists, ints -> floats for double)"""
+    if depth:
+        if not isinstance(value, (list, tuple)):
+            raise TestSchemaError(f"expected {format_type(base, depth)}, got {value!r}")
+        return [coerce_value(item, base, depth - 1) for item in value]
+    if base == 'bool':
+        if isinstance(value, bool):
+            return value
+    elif base == 'string':
+        if isinstance(value, str):
+            return value
+    elif isinstance(value, bool):
+        pass  # True is an int in Python, but not a number here
+    elif base in ('int', 'long'):
+        low, high = (INT_MIN, INT_MAX) if base == 'int' else (LONG_MIN, LONG_MAX)
+        if isinstance(value, int) and low <= value <= high:
+            return value
+        if isinstance(value, int):
+            raise TestSchemaError(f"{value} is out of range for {base}")
+    elif base == 'double':
+        if isinstance(value, (int, float)) and math.isfinite(value):
+            return float(value)
+    raise TestSchemaError(f"expected {base}, got {value!r}")
+
+
+def coerce_input(raw, param_types):
+    """Parse one raw test input into a list of canonical argument values"""
+    types = [parse_type(spec) for spec in param_types]
+    value = parse_raw_input(raw)
+    if isinstance(value, str) and value is raw and types != [('string', 0)]:
+        raise TestSchemaError(f"could not parse input {raw!r}")
+    args = split_params(value, len(types))
+    return [coerce_value(arg, base, depth) for arg, (base, depth) in zip(args, types)]
+
+
+def input_key(raw):
+    """Lookup key for a raw input, as stored and as echoed back by the frontend"""
+    return raw.strip() if isinstance(raw, str) else json.dumps(raw, sort_keys=True)
+
+
+# ────────────── Inference ──────────────
+def infer_type(value):
+    """(base, depth) of a parsed value; base is None for an empty array"""
+    if isinstance(value, bool):
+        return 'bool', 0
+    if isinstance(value, int):
+        return ('int' if INT_MIN <= value <= INT_MAX else 'long'), 0
+    if isinstance(value, float):
+        return 'double', 0
+    if isinstance(value, str):
+        return 'string', 0
+    if isinstance(value, (list, tuple)):
+        base, depth = None, None
+        for item in value:
+            base, depth = unify_types((base, depth), infer_type(item))
+        return base, (depth or 0) + 1
+    raise TestSchemaError(f"cannot infer a parameter type for {value!r}")
+
+
+def unify_types(a, b):
+    """Common type of two inferred types: int widens to long and double; empty arrays take any element type"""
+    if a == (None, None):
+        return b
+    if b == (None, None):
+        return a
+    (base_a, depth_a), (base_b, depth_b) = a, b
+    if base_a is None and depth_a <= depth_b:
+        return b
+    if base_b is None and depth_b <= depth_a:
+        return a
+    if depth_a != depth_b:
+        raise TestSchemaError(f"inputs mix {format_type(base_a, depth_a)} and {format_type(base_b, depth_b)}")
+    if base_a == base_b:
+        return a
+    numeric = ('int', 'long', 'double')
+    if base_a in numeric and base_b in numeric:
+        return max(base_a, base_b, key=numeric.index), depth_a
+    raise TestSchemaError(f"inputs mix {format_type(base_a, depth_a)} and {format_type(base_b, depth_b)}")
+
+
+def infer_param_types(raw_inputs):
+    """
+    Parameter types that fit every input. A tuple input ('[1, 2], 3') means
+    several parameters; other inputs of that challenge may then spell the same
+    arguments as a JSON array ('[[1, 2], 3]').
+    """
+    values = [parse_raw_input(raw) for raw in raw_inputs]
+    if not values:
+        raise TestSchemaError('no inputs to infer parameter types from')
+    count = max((len(value) for value in values if isinstance(value, tuple)), default=1)
+    params = [(None, None)] * count
+    for value in values:
+        args = split_params(value, count)
+        params = [unify_types(p, infer_type(arg)) for p, arg in zip(params, args)]
+    return [format_type(base or 'int', depth or 0) for base, depth in params]
+
+
+# ────────────── Rendering ──────────────
+def c_string(text):
+    """Double-quoted literal valid in both C++ and Java source"""
+    out = ['"']
+    for ch in text:
+        if ch in '"\\':
+            out.append('\\' + ch)
+        elif ch == '\n':
+            out.append('\\n')
+        elif ch == '\t':
+            out.append('\\t')
+        elif ch == '\r':
+            out.append('\\r')
+        elif ord(ch) < 0x20 or ord(ch) == 0x7f:
+            out.append(f'\\{ord(ch):03o}')
+        else:
+            out.append(ch)
+    out.append('"')
+    return ''.join(out)
+
+
+def _scalar(value, base, language):
+    if base == 'bool':
+        if language == 'python':
+            return 'True' if value else 'False'
+        return 'true' if value else 'false'
+    if base == 'string':
+        return repr(value) if language == 'python' else c_string(value)
+    if base == 'double':
+        return repr(value)
+    if base == 'long' and language == 'java':
+        return f'{value}L'
+    if base == 'long' and language == 'cpp':
+        return f'{value}LL'
+    return str(value)
+
+
+def _braced(value, base, depth, language):
+    if not depth:
+        return _scalar(value, base, language)
+    return '{' + ','.join(_braced(item, base, depth - 1, language) for item in value) + '}'
+
+
+def render_value(value, base, depth, language):
+    """Literal for one canonical argument value"""
+    if language == 'cpp':
+        return _braced(value, base, depth, language)
+    if language == 'java':
+        if not depth:
+            return _scalar(value, base, language)
+        return f"new {JAVA_TYPE_NAMES[base]}{'[]' * depth}{_braced(value, base, depth, language)}"
+    if language == 'python':
+        if not depth:
+            return _scalar(value, base, language)
+        return '[' + ', '.join(render_value(item, base, depth - 1, language) for item in value) + ']'
+    raise TestSchemaError(f"no literal rendering for {language}")
+
+
+def render_literals(args, param_types):
+    """
+    Argument list for one test in every language. JavaScript gets the value
+    (or the array of values for several parameters) that the driver indexes as tc.
+    """
+    types = [parse_type(spec) for spec in param_types]
+    literals = {
+        language: ', '.join(render_value(arg, base, depth, language) for arg, (base, depth) in zip(args, types))
+        for language in ('python', 'cpp', 'java')
+    }
+    literals['javascript'] = json.dumps(args[0] if len(args) == 1 else args, separators=(',', ':'))
+    return literals
+
+
+# ────────────── Challenge schema ──────────────
+def build_test_schema(raw_inputs, param_types=None):
+    """
+    Validate every input of a challenge and pre-render its literals. Returns the
+    document stored with the challenge: {'param_types': [...], 'literals': {input_key: {language: literal}}}.
+    Raises TestSchemaError naming the first input that does not fit.
+    """
+    if param_types:
+        param_types = normalize_param_types(param_types)
+    else:
+        try:
+            param_types = infer_param_types(raw_inputs)
+        except TestSchemaError as e:
+            raise TestSchemaError(f"Could not infer param_types from the test inputs ({e}); please provide them") from None
+    literals = {}
+    for number, raw in enumerate(raw_inputs, 1):
+        try:
+            args = coerce_input(raw, param_types)
+        except TestSchemaError as e:
+            raise TestSchemaError(f"Test input {number} ({raw!r}) does not match ({', '.join(param_types)}): {e}") from None
+        literals[input_key(raw)] = render_literals(args, param_types)
+    return {'param_types': param_types, 'literals': literals}
+
+
+def attach_literals(test_cases, literals):
+    """
+    Copies of test_cases carrying pre-rendered literals ({input_key: {language: literal}}).
+    Literals a client sent along are dropped, so only ones validated at creation reach the driver.
+    """
+    literals = literals or {}
+    attached = []
+    for test_case in test_cases or []:
+        test_case = {k: v for k, v in test_case.items() if k != 'literals'}
+        rendered = literals.get(input_key(test_case.get('input')))
+        if rendered:
+            test_case['literals'] = rendered
+        attached.append(test_case)
+    return attached
+
+
+def collect_literals(test_cases):
+    """{input_key: literals} of test cases that carry them (e.g. a challenge loaded from the database)"""
+    return {input_key(tc.get('input')): tc['literals'] for tc in test_cases or [] if tc.get('literals')}
@@ -0,0 +1,212 @@
+"""
+BugYou Request Tracing
+Lightweight per-request spans (Zipkin v2 JSON) with sampling and file/collector export
+
+Usage:
+    set_request_id(incoming_id)                               # once per request
+    trace = start_trace('POST /api/validate')
+    with span('discover_signature', language=language):      # anywhere below it
+        ...
+    finish_trace(trace, status=200)
+
+When a request is not being traced, span() and @traced cost one context
+variable lookup. Finished traces are handed to a background thread that
+appends them to TRACE_FILE and/or POSTs them to a Zipkin-compatible
+collector, so exporting never adds latency to the request itself.
+"""
+
+import os
+import json
+import uuid
+import time
+import queue
+import random
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+import requests
+
+SERVICE_NAME = 'bugyou'
+
+# Tracing settings (configure_tracing() / create_app() override the environment)
+_settings = {
+    'sample_rate': float(os.environ.get('BUGYOU_TRACE_SAMPLE_RATE', 0)),
+    # Requests slower than this are exported even when not sampled (0 = off)
+    'slow_ms': float(os.environ.get('BUGYOU_TRACE_SLOW_MS', 0)),
+    'file': os.environ.get('BUGYOU_TRACE_FILE'),
+    'collector_url': os.environ.get('BUGYOU_TRACE_COLLECTOR_URL'),
+}
+
+_current_trace = contextvars.ContextVar('bugyou_trace', default=None)
+_current_span = contextvars.ContextVar('bugyou_span', default=None)
+_current_request_id = contextvars.ContextVar('bugyou_request_id', default=None)
+
+
+def configure_tracing(sample_rate=None, slow_ms=None, file=None, collector_url=None):
+    """Change tracing settings; None leaves a setting untouched"""
+    for key, value in (('sample_rate', sample_rate), ('slow_ms', slow_ms),
+                       ('file', file), ('collector_url', collector_url)):
+        if value is not None:
+            _settings[key] = value
+
+
+def tracing_enabled():
+    return bool(_settings['file'] or _settings['collector_url']) and \
+        (_settings['sample_rate'] > 0 or _settings['slow_ms'] > 0)
+
+
+class Trace:
+    """All spans recorded for one request"""
+
+    def __init__(self, name, request_id, sampled):
+        self.trace_id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.sampled = sampled
+        self.name = name
+        self.root_id = uuid.uuid4().hex[:16]
+        self.start_us = int(time.time() * 1_000_000)
+        self.start_perf = time.perf_counter()
+        self.spans = []
+        self.tokens = None
+
+    def _timestamp_us(self, perf):
+        return self.start_us + int((perf - self.start_perf) * 1_000_000)
+
+    def add_span(self, name, start_perf, end_perf, parent_id, tags, span_id=None):
+        self.spans.append({
+            'traceId': self.trace_id,
+            'id': span_id or uuid.uuid4().hex[:16],
+            'parentId': parent_id,
+            'name': name,
+            'timestamp': self._timestamp_us(start_perf),
+            'duration': max(int((end_perf - start_perf) * 1_000_000), 1),
+            'localEndpoint': {'serviceName': SERVICE_NAME},
+            'tags': {'request_id': self.request_id, **{k: str(v) for k, v in tags.items()}},
+        })
+
+
+def set_request_id(request_id=None):
+    """Bind a request ID (incoming X-Request-ID or a new one) to the current context"""
+    request_id = request_id or uuid.uuid4().hex
+    _current_request_id.set(request_id)
+    return request_id
+
+
+def current_request_id():
+    return _current_request_id.get()
+
+
+def start_trace(name):
+    """Begin tracing the current request if it is sampled (or slow-trace capture is on)"""
+    if not tracing_enabled():
+        return None
+    sampled = random.random() < _settings['sample_rate']
+    if not sampled and not _settings['slow_ms']:
+        return None
+    trace = Trace(name, current_request_id(), sampled)
+    trace.tokens = (_current_trace.set(trace), _current_span.set(trace.root_id))
+    return trace
+
+
+def finish_trace(trace, **tags):
+    """Close the root span and queue the trace for export if it qualifies"""
+    if trace is None:
+        return
+    end_perf = time.perf_counter()
+    _current_trace.reset(trace.tokens[0])
+    _current_span.reset(trace.tokens[1])
+    duration_ms = (end_perf - trace.start_perf) * 1000
+    slow = _settings['slow_ms'] and duration_ms >= _settings['slow_ms']
+    if not (trace.sampled or slow):
+        return
+    trace.add_span(trace.name, trace.start_perf, end_perf, None, tags, span_id=trace.root_id)
+    _export(trace.spans)
+
+
+@contextmanager
+def span(name, **tags):
+    """Time a block as a child of the current span"""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    start_perf = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        tags['error'] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.add_span(name, start_perf, time.perf_counter(), parent_id, tags, span_id=span_id)
+
+
+def record_span(name, start_perf, end_perf=None, **tags):
+    """Record an already-measured interval (perf_counter values) under the current span"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, start_perf, end_perf or time.perf_counter(), _current_span.get(), tags)
+
+
+def traced(name=None):
+    """Decorator: run the function inside a span named after it"""
+    def decorator(f):
+        span_name = name or f.__name__
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return f(*args, **kwargs)
+            with span(span_name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ────────────── Export ──────────────
+_export_queue = queue.Queue(maxsize=1000)
+_export_thread_pid = None
+_export_lock = threading.Lock()
+
+
+def _export(spans):
+    global _export_thread_pid
+    if _export_thread_pid != os.getpid():
+        with _export_lock:
+            if _export_thread_pid != os.getpid():
+                _export_thread_pid = os.getpid()
+                threading.Thread(target=_export_loop, name='trace-export', daemon=True).start()
+    try:
+        _export_queue.put_nowait(spans)
+    except queue.Full:
+        pass  # never block a request on tracing
+
+
+def _export_loop():
+    while True:
+        batch = [_export_queue.get()]
+        while len(batch) < 100:
+            try:
+                batch.append(_export_queue.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            write_traces(batch)
+        except Exception as e:
+            print(f"⚠️ Trace export failed: {e}")
+
+
+def write_traces(traces):
+    """Append traces to the trace file (one JSON array of spans per line) and/or POST to the collector"""
+    if _settings['file']:
+        with open(_settings['file'], 'a') as f:
+            for spans in traces:
+                f.write(json.dumps(spans) + '\n')
+    if _settings['collector_url']:
+        spans = [s for trace_spans in traces for s in trace_spans]
+        requests.post(_settings['collector_url'], json=spans, timeout=5)
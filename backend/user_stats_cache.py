@@ -0,0 +1,97 @@
+"""
+BugYou User Stats Cache
+Cache of each user's XP and level, validated by a version stamp shared by all workers
+
+Every write to a user's stats (the XP update when a challenge is completed, or
+an explicit clear) stamps the user with a new version, after it committed, in
+a small table of version slots that all worker processes share. A read returns
+the cached row only while its version is still the user's current one, so
+after any worker changes a user's XP every worker's copy (and anything cached
+under the version, see version()) stops matching at once instead of at the end
+of a TTL. Reads are a dict lookup plus one 8-byte read.
+
+Writers only invalidate; the next read loads the row. Storing the row a writer
+just wrote would race: two workers awarding XP at once can stamp their versions
+in the other order than their UPDATEs committed, and the later stamp would then
+vouch for the older row. A row read from the database is cached under the
+version seen before the read, so it can only ever be stale under a stale version.
+
+The version table is an anonymous shared mapping created at import, so worker
+processes forked from the preloading master share it. Users are spread over
+VERSION_SLOTS slots by a hash of the username; users sharing a slot only cause
+each other extra misses. Slot 0 is an epoch that invalidates everyone.
+
+The cached rows themselves are per process, at most max_entries of them, least
+recently used first out.
+"""
+
+import os
+import mmap
+import zlib
+import struct
+import itertools
+import threading
+from collections import OrderedDict
+
+from metrics import record_cache
+
+VERSION_SLOTS = 65536
+STATS_MAX_ENTRIES = 50_000
+_SLOT = struct.Struct('<Q')
+
+
+class UserStatsCache:
+    def __init__(self, slots=VERSION_SLOTS, max_entries=STATS_MAX_ENTRIES):
+        self.slots = slots
+        self.max_entries = max_entries
+        self._versions = mmap.mmap(-1, slots * _SLOT.size)  # MAP_SHARED: survives fork() shared
+        self._entries = OrderedDict()  # username -> (stats, version), least recently used first
+        self._lock = threading.Lock()
+        self._stamps = itertools.count(1)
+
+    def _slot(self, username):
+        return 1 + zlib.crc32(str(username).encode('utf-8')) % (self.slots - 1)
+
+    def _stamp(self):
+        # Unique across workers, so two processes writing at once never hand out the same version
+        return (os.getpid() << 40) | next(self._stamps)
+
+    def version(self, username):
+        """Current version of username's stats; anything cached under an older one is stale"""
+        return (_SLOT.unpack_from(self._versions, 0)[0],
+                _SLOT.unpack_from(self._versions, self._slot(username) * _SLOT.size)[0])
+
+    def get(self, username):
+        """Cached stats of username if still current, else None"""
+        with self._lock:
+            entry = self._entries.get(username)
+            hit = entry is not None and entry[1] == self.version(username)
+            if hit:
+                self._entries.move_to_end(username)
+        record_cache('user_stats', hit)
+        return dict(entry[0]) if hit else None
+
+    def put(self, username, stats, version):
+        """
+        Cache stats read from the database; version is what version() returned before
+        the read, so a row read while another worker was writing is never served
+        """
+        if stats:
+            with self._lock:
+                self._store(username, stats, version)
+
+    def _store(self, username, stats, version):
+        self._entries.pop(username, None)
+        self._entries[username] = (dict(stats), version)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, username=None):
+        """Make username's cached stats stale in every worker (everyone's when username is None)"""
+        with self._lock:
+            offset = 0 if username is None else self._slot(username) * _SLOT.size
+            _SLOT.pack_into(self._versions, offset, self._stamp())
+            if username is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(username, None)
@@ -0,0 +1,12 @@
+"""
+BugYou WSGI entry point
+The one module-level app, for WSGI servers: gunicorn wsgi:app (from backend/)
+
+Importing app.py only defines the blueprint and create_app(); the app and its
+subsystems (executor client, password hasher, admission control, ...) are
+built here, once, when the server loads this module.
+"""
+
+from app import create_app
+
+app = create_app()
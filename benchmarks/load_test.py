@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+BugYou End-to-End Load Test
+Boots the app against a local Postgres and the Piston stand-in, drives a weighted
+mix of API calls at a fixed concurrency and reports throughput and latency percentiles
+
+    # Local Postgres (schema + benchmark challenges/users are created automatically)
+    python benchmarks/load_test.py --database-url postgresql://postgres@localhost/bugyou_bench \\
+        --concurrency 32 --duration 60 --piston-latency-ms 150 --output results.json
+
+    # Against an already running server (no booting, no seeding)
+    python benchmarks/load_test.py --url http://localhost:5000 --duration 30
+
+    # Fail (exit 1) if p95 or throughput regressed more than 15% against an earlier run
+    python benchmarks/load_test.py ... --baseline results.json --tolerance 0.15
+
+Each of --concurrency workers loops until --duration is over: pick an endpoint by
+--mix weight, send one request, record its latency. The first --warmup seconds
+are not recorded.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import signal
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from datetime import datetime
+
+import requests
+
+from piston_stub import start_stub
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+
+ENDPOINTS = ('challenges', 'challenge', 'execute', 'validate', 'complete', 'leaderboard')
+DEFAULT_MIX = 'challenges=15,challenge=30,execute=25,validate=10,complete=5,leaderboard=15'
+
+BENCH_TITLE_PREFIX = 'Bench: '
+BENCH_USER_PREFIX = 'bench_user_'
+
+# Single-argument Python functions so the generated driver passes each input as one value
+BENCH_CHALLENGES = [
+    {
+        'difficulty': 'basic',
+        'title': 'Sum of a list',
+        'buggy_code': "def sum_list(nums):\n    total = 0\n    for i in range(1, len(nums)):\n        total += nums[i]\n    return total\n",
+        'reference_solution': "def sum_list(nums):\n    total = 0\n    for n in nums:\n        total += n\n    return total\n",
+        'tests': [('[1, 2, 3]', '6'), ('[5]', '5'), ('[]', '0'), ('[-1, 1]', '0'), ('[10, 20, 30, 40]', '100')],
+        'hidden': [('[100]', '100'), ('[1, 1, 1, 1, 1]', '5')],
+    },
+    {
+        'difficulty': 'basic',
+        'title': 'Largest value',
+        'buggy_code': "def largest(nums):\n    best = 0\n    for n in nums:\n        if n > best:\n            best = n\n    return best\n",
+        'reference_solution': "def largest(nums):\n    best = nums[0]\n    for n in nums[1:]:\n        if n > best:\n            best = n\n    return best\n",
+        'tests': [('[1, 5, 3]', '5'), ('[7]', '7'), ('[2, 2]', '2'), ('[0, 9, 4]', '9'), ('[3, 1]', '3')],
+        'hidden': [('[-4, -2, -9]', '-2'), ('[-1]', '-1')],
+    },
+    {
+        'difficulty': 'intermediate',
+        'title': 'Reverse the words',
+        'buggy_code': "def reverse_words(text):\n    return ' '.join(text.split(' ')[::-1][1:])\n",
+        'reference_solution': "def reverse_words(text):\n    return ' '.join(text.split()[::-1])\n",
+        'tests': [('"hello world"', 'world hello'), ('"a b c"', 'c b a'), ('"one"', 'one'),
+                  ('"fix the bug"', 'bug the fix'), ('"x y"', 'y x')],
+        'hidden': [('"  spaced   out  "', 'out spaced'), ('"keep calm and debug"', 'debug and calm keep')],
+    },
+    {
+        'difficulty': 'intermediate',
+        'title': 'Count vowels',
+        'buggy_code': "def count_vowels(text):\n    return sum(1 for c in text if c in 'aeio')\n",
+        'reference_solution': "def count_vowels(text):\n    return sum(1 for c in text.lower() if c in 'aeiou')\n",
+        'tests': [('"hello"', '2'), ('"sky"', '0'), ('"queue"', '4'), ('"bug"', '1'), ('"aeiou"', '5')],
+        'hidden': [('"AEIOU"', '5'), ('"Unusual"', '4')],
+    },
+    {
+        'difficulty': 'advanced',
+        'title': 'Longest increasing run',
+        'buggy_code': "def longest_run(nums):\n    best = run = 1\n    for i in range(1, len(nums)):\n        run = run + 1 if nums[i] > nums[i - 1] else 1\n    return best\n",
+        'reference_solution': "def longest_run(nums):\n    if not nums:\n        return 0\n    best = run = 1\n    for i in range(1, len(nums)):\n        run = run + 1 if nums[i] > nums[i - 1] else 1\n        best = max(best, run)\n    return best\n",
+        'tests': [('[1, 2, 3]', '3'), ('[3, 2, 1]', '1'), ('[1, 3, 2, 4, 5, 6]', '4'), ('[5]', '1'), ('[1, 1, 2]', '2')],
+        'hidden': [('[]', '0'), ('[1, 2, 1, 2, 3, 4, 0]', '4')],
+    },
+]
+
+
+# ────────────── Setup ──────────────
+def prepare_database(database_url, user_count):
+    """Create the schema if needed and (re)seed the benchmark challenges and users"""
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    conn = psycopg2.connect(database_url)
+    try:
+        with conn, conn.cursor() as cursor:
+            with open(SCHEMA_PATH) as f:
+                cursor.execute(f.read())
+            cursor.execute("DELETE FROM users WHERE username LIKE %s", (BENCH_USER_PREFIX + '%',))
+            execute_values(cursor, "INSERT INTO users (username, password, emailaddress, fullname) VALUES %s", [
+                (f"{BENCH_USER_PREFIX}{i}", 'not-a-bcrypt-hash', f"{BENCH_USER_PREFIX}{i}@bench.local", f"Bench User {i}")
+                for i in range(user_count)
+            ])
+
+            challenges = []
+            for spec in BENCH_CHALLENGES:
+                table_name = f"python_{spec['difficulty']}"
+                cursor.execute(f"DELETE FROM {table_name} WHERE title = %s", (BENCH_TITLE_PREFIX + spec['title'],))
+                columns = ['title', 'problem_statement', 'buggy_code', 'reference_solution']
+                values = [BENCH_TITLE_PREFIX + spec['title'], spec['title'], spec['buggy_code'], spec['reference_solution']]
+                for i, (test_input, expected) in enumerate(spec['tests'], 1):
+                    columns += [f'test_case_{i}_input', f'test_case_{i}_expected']
+                    values += [test_input, expected]
+                for i, (test_input, expected) in enumerate(spec['hidden'], 1):
+                    columns += [f'hidden_test_{i}_input', f'hidden_test_{i}_expected']
+                    values += [test_input, expected]
+                cursor.execute(
+                    f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(values))}) "
+                    f"RETURNING challenge_id", values
+                )
+                challenges.append({
+                    'language': 'python',
+                    'difficulty': spec['difficulty'],
+                    'challenge_id': cursor.fetchone()[0],
+                    'title': spec['title'],
+                    'buggy_code': spec['buggy_code'],
+                    'reference_solution': spec['reference_solution'],
+                    'test_cases': [{'input': i, 'expected_output': e} for i, e in spec['tests']],
+                })
+    finally:
+        conn.close()
+    print(f"🌱 Seeded {len(challenges)} challenges and {user_count} users")
+    return challenges
+
+
+def boot_server(args, piston_url):
+    """Start start_server.py against the local database and executor, wait until healthy"""
+    env = dict(os.environ,
+               BUGYOU_DATABASE_URL=args.database_url,
+               BUGYOU_PISTON_API=piston_url,
+               BUGYOU_METRICS_DIR=tempfile.mkdtemp(prefix='bugyou-bench-metrics-'))
+    command = [sys.executable, os.path.join(ROOT_DIR, 'start_server.py'),
+               '--host', '127.0.0.1', '--port', str(args.port),
+               '--workers', str(args.workers), '--threads', str(args.threads)]
+    log_path = os.path.join(tempfile.gettempdir(), f"bugyou-bench-server-{args.port}.log")
+    log = open(log_path, 'w')
+    process = subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT, env=env, cwd=ROOT_DIR)
+    url = f"http://127.0.0.1:{args.port}"
+    print(f"🚀 Booting server ({args.workers} workers x {args.threads} threads), log: {log_path}")
+
+    deadline = time.time() + args.boot_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}, see {log_path}")
+        try:
+            if requests.get(f"{url}/api/health", timeout=2).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    stop_server(process)
+    raise RuntimeError(f"Server not healthy after {args.boot_timeout}s, see {log_path}")
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def discover_challenges(url):
+    """Use whatever Python challenges an already running server has (for --url runs)"""
+    listing = requests.get(f"{url}/api/challenges", timeout=30).json().get('challenges', [])
+    challenges = []
+    for summary in listing:
+        if summary['language'] != 'python':
+            continue
+        detail = requests.get(
+            f"{url}/api/challenge/python/{summary['difficulty']}/{summary['challenge_id']}", timeout=30
+        ).json().get('challenge')
+        if detail and detail.get('buggy_code'):
+            challenges.append({
+                'language': 'python',
+                'difficulty': summary['difficulty'],
+                'challenge_id': summary['challenge_id'],
+                'title': detail['title'],
+                'buggy_code': detail['buggy_code'],
+                'reference_solution': detail.get('reference_solution') or detail['buggy_code'],
+                'test_cases': detail['test_cases'],
+            })
+    return challenges
+
+
+# ────────────── Workload ──────────────
+def parse_mix(mix):
+    """'execute=3,leaderboard=1' -> {'execute': 3.0, 'leaderboard': 1.0}"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' in mix (choose from {', '.join(ENDPOINTS)})")
+        weights[name] = float(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+class Workload:
+    """Builds one realistic request for a given endpoint"""
+
+    def __init__(self, url, challenges, usernames, fixed_ratio):
+        self.url = url
+        self.challenges = challenges
+        self.usernames = usernames
+        self.fixed_ratio = fixed_ratio
+
+    def _code(self, challenge):
+        # Mix of still-buggy and fixed submissions, like a real session
+        if random.random() < self.fixed_ratio:
+            return challenge['reference_solution']
+        return challenge['buggy_code']
+
+    def request(self, session, endpoint):
+        challenge = random.choice(self.challenges)
+        if endpoint == 'challenges':
+            return session.get(f"{self.url}/api/challenges", timeout=60)
+        if endpoint == 'challenge':
+            return session.get(f"{self.url}/api/challenge/{challenge['language']}/{challenge['difficulty']}/"
+                               f"{challenge['challenge_id']}", params={'username': random.choice(self.usernames)},
+                               timeout=60)
+        if endpoint == 'execute':
+            return session.post(f"{self.url}/api/execute", json={
+                'code': self._code(challenge),
+                'language': challenge['language'],
+                'test_cases': challenge['test_cases'],
+                'challenge_id': challenge['challenge_id'],
+                'difficulty': challenge['difficulty'],
+            }, timeout=60)
+        if endpoint == 'validate':
+            return session.post(f"{self.url}/api/validate", json={
+                'code': self._code(challenge),
+                'language': challenge['language'],
+                'challenge_id': challenge['challenge_id'],
+                'difficulty': challenge['difficulty'],
+            }, timeout=60)
+        if endpoint == 'complete':
+            return session.post(f"{self.url}/api/challenge/complete", json={
+                'username': random.choice(self.usernames),
+                'language': challenge['language'],
+                'difficulty': challenge['difficulty'],
+                'challenge_id': challenge['challenge_id'],
+                'challenge_title': challenge['title'],
+                'time_taken': random.randint(30, 900),
+                'score': random.randint(5, 40),
+            }, timeout=60)
+        return session.get(f"{self.url}/api/leaderboard", params={'limit': 50}, timeout=60)
+
+
+class Recorder:
+    """Thread-safe per-endpoint latency samples"""
+
+    def __init__(self):
+        self.samples = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+        self.statuses = {name: {} for name in ENDPOINTS}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds, status):
+        with self._lock:
+            self.samples[endpoint].append(seconds)
+            self.statuses[endpoint][status] = self.statuses[endpoint].get(status, 0) + 1
+            if status == 'exception' or status >= 400:
+                self.errors[endpoint] += 1
+
+
+def run_load(workload, weights, concurrency, duration, warmup):
+    """Closed loop: every worker sends its next request as soon as the previous one returns"""
+    recorder = Recorder()
+    names = list(weights)
+    name_weights = [weights[name] for name in names]
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+
+    def worker():
+        session = requests.Session()
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            endpoint = random.choices(names, weights=name_weights)[0]
+            try:
+                status = workload.request(session, endpoint).status_code
+            except requests.RequestException:
+                status = 'exception'
+            finished = time.perf_counter()
+            if now >= measure_from and finished <= deadline:
+                recorder.record(endpoint, finished - now, status)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return recorder
+
+
+# ────────────── Reporting ──────────────
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(math.ceil(fraction * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def summarize(samples, errors, duration):
+    values = sorted(samples)
+    to_ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / duration, 2),
+        'mean_ms': to_ms(sum(values) / len(values)) if values else None,
+        'p50_ms': to_ms(percentile(values, 0.50)),
+        'p95_ms': to_ms(percentile(values, 0.95)),
+        'p99_ms': to_ms(percentile(values, 0.99)),
+        'max_ms': to_ms(values[-1]) if values else None,
+    }
+
+
+def build_report(recorder, args, weights):
+    endpoints = {}
+    for name in ENDPOINTS:
+        if recorder.samples[name]:
+            endpoints[name] = summarize(recorder.samples[name], recorder.errors[name], args.duration)
+            endpoints[name]['statuses'] = {str(k): v for k, v in recorder.statuses[name].items()}
+    all_samples = [s for samples in recorder.samples.values() for s in samples]
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'config': {
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'warmup_s': args.warmup,
+            'mix': weights,
+            'fixed_ratio': args.fixed_ratio,
+            'piston_latency_ms': args.piston_latency_ms,
+            'piston_jitter_ms': args.piston_jitter_ms,
+            'piston_slots': args.piston_slots,
+            'workers': args.workers if not args.url else None,
+            'threads': args.threads if not args.url else None,
+        },
+        'total': summarize(all_samples, sum(recorder.errors.values()), args.duration),
+        'endpoints': endpoints,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_report(report):
+    print()
+    print(f"{'endpoint':<14}{'reqs':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    print("-" * 70)
+    rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+    for name, stats in rows:
+        print(f"{name:<14}{stats['requests']:>8}{stats['errors']:>8}{stats['throughput_rps']:>10.1f}"
+              f"{_fmt(stats['p50_ms'])}{_fmt(stats['p95_ms'])}{_fmt(stats['p99_ms'])}")
+
+
+def _fmt(value):
+    return f"{value:>10.1f}" if value is not None else f"{'-':>10}"
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """List regressions: p95 latency up or throughput down by more than tolerance"""
+    regressions = []
+    for name, stats in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        if before['p95_ms'] and stats['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {stats['p95_ms']}ms")
+        if before['throughput_rps'] and stats['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {stats['throughput_rps']} rps")
+    return regressions
+
+
+# ────────────── Main ──────────────
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load-test the BugYou API end to end')
+    target = parser.add_argument_group('target')
+    target.add_argument('--url', help='test an already running server instead of booting one')
+    target.add_argument('--database-url', default=os.environ.get('BUGYOU_BENCH_DATABASE_URL'),
+                        help='local Postgres to boot the server against (is seeded with benchmark data)')
+    target.add_argument('--port', type=int, default=5055)
+    target.add_argument('--workers', type=int, default=4)
+    target.add_argument('--threads', type=int, default=8)
+    target.add_argument('--boot-timeout', type=float, default=60)
+    target.add_argument('--users', type=int, default=200, help='benchmark users to seed')
+
+    executor = parser.add_argument_group('piston stand-in')
+    executor.add_argument('--piston-latency-ms', type=float, default=150.0)
+    executor.add_argument('--piston-jitter-ms', type=float, default=50.0)
+    executor.add_argument('--piston-slots', type=int, default=16)
+
+    load = parser.add_argument_group('load')
+    load.add_argument('--concurrency', type=int, default=16)
+    load.add_argument('--duration', type=float, default=30, help='measured seconds')
+    load.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before measuring')
+    load.add_argument('--mix', default=DEFAULT_MIX, help=f'endpoint weights (default: {DEFAULT_MIX})')
+    load.add_argument('--fixed-ratio', type=float, default=0.5,
+                      help='share of execute/validate calls that submit the fixed code')
+
+    output = parser.add_argument_group('results')
+    output.add_argument('--output', help='write the JSON report here')
+    output.add_argument('--baseline', help='earlier JSON report to compare against')
+    output.add_argument('--tolerance', type=float, default=0.15,
+                        help='allowed p95/throughput regression against --baseline (fraction)')
+    args = parser.parse_args(argv)
+    if not args.url and not args.database_url:
+        parser.error('pass --database-url (or BUGYOU_BENCH_DATABASE_URL) to boot a server, or --url to reuse one')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    weights = parse_mix(args.mix)
+    server = None
+    process = None
+    try:
+        if args.url:
+            url = args.url.rstrip('/')
+            challenges = discover_challenges(url)
+            usernames = [f"{BENCH_USER_PREFIX}{i}" for i in range(args.users)]
+        else:
+            challenges = prepare_database(args.database_url, args.users)
+            usernames = [f"{BENCH_USER_PREFIX}{i}" for i in range(args.users)]
+            server, piston_url = start_stub(latency_ms=args.piston_latency_ms, jitter_ms=args.piston_jitter_ms,
+                                            slots=args.piston_slots)
+            print(f"🧪 Piston stand-in at {piston_url}")
+            process, url = boot_server(args, piston_url)
+        if not challenges:
+            print("❌ No Python challenges with buggy code to submit against")
+            return 1
+
+        print(f"🔥 {args.concurrency} workers for {args.warmup:.0f}s warm-up + {args.duration:.0f}s against {url}")
+        recorder = run_load(Workload(url, challenges, usernames, args.fixed_ratio),
+                            weights, args.concurrency, args.duration, args.warmup)
+        report = build_report(recorder, args, weights)
+        print_report(report)
+
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"\n💾 Results written to {args.output}")
+
+        if args.baseline:
+            with open(args.baseline) as f:
+                regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+            if regressions:
+                print(f"\n❌ Regressions beyond {args.tolerance:.0%}:")
+                for line in regressions:
+                    print(f"   {line}")
+                return 1
+            print(f"\n✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+        return 0
+    finally:
+        if process is not None:
+            stop_server(process)
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
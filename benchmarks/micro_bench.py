@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+BugYou Micro-benchmarks
+Ops/sec and allocations of the per-submission CPU path (literal conversion,
+signature discovery, driver generation, result grading) on generated corpora
+
+    python benchmarks/micro_bench.py                       # every benchmark, every size
+    python benchmarks/micro_bench.py --filter cpp_input    # only matching benchmarks
+    python benchmarks/micro_bench.py --sizes small,large --output micro.json
+    python benchmarks/micro_bench.py --history benchmarks/results/micro.jsonl
+
+Each benchmark runs at three input sizes (small = a typical submission,
+large = 10k-element arrays, 1000 test cases, 10k-line sources). With --history every run is
+appended as one JSON line and compared with the previous line, so slowdowns and
+allocation growth show up as a percentage next to the numbers.
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'backend'))
+
+import app  # noqa: E402  (needs backend/ on sys.path)
+import result_frames  # noqa: E402
+
+SIZES = {
+    # name: (array length, 2D side, test cases, source lines)
+    'small': (10, 4, 5, 40),
+    'medium': (1_000, 30, 100, 1_000),
+    'large': (10_000, 100, 1_000, 10_000),
+}
+
+
+# ────────────── Corpora ──────────────
+def int_array(n, rng):
+    return [rng.randint(-10_000, 10_000) for _ in range(n)]
+
+
+def nested_array(side, rng):
+    return [int_array(side, rng) for _ in range(side)]
+
+
+def py_literal(value):
+    """Test inputs arrive as strings like '[1, 2, 3]'"""
+    return repr(value)
+
+
+def test_cases(count, n, rng):
+    return [{'input': py_literal(int_array(n, rng)), 'expected_output': str(rng.randint(0, 100))}
+            for _ in range(count)]
+
+
+def python_source(lines):
+    filler = ['# helper notes for the grader', 'LIMIT = 10 ** 6', 'class Helper:',
+              '    """Utility class"""', '    value = 0']
+    body = [filler[i % len(filler)] if filler[i % len(filler)] != 'class Helper:' else f'class Helper{i}:'
+            for i in range(lines)]
+    return '\n'.join(body) + '\n\ndef solve(nums, target):\n    return sum(nums) - target\n'
+
+
+def cpp_source(lines):
+    body = [f'// step {i}: keep the invariant that the prefix is sorted' for i in range(lines)]
+    return '#include <vector>\n' + '\n'.join(body) + '\nint solve(vector<int>& nums, int target) {\n    return 0;\n}\n'
+
+
+def java_source(lines):
+    body = [f'    // step {i}: keep the invariant that the prefix is sorted' for i in range(lines)]
+    return '\n'.join(body) + '\n    public static int solve(int[] nums, int target) {\n        return 0;\n    }\n'
+
+
+def js_source(lines):
+    body = [f'// step {i}: keep the invariant that the prefix is sorted' for i in range(lines)]
+    return '\n'.join(body) + '\nfunction solve(nums, target) {\n  return 0;\n}\n'
+
+
+def program_output(cases, pass_ratio, marker, rng):
+    """Harness output: a debug print and one result frame per test"""
+    lines = []
+    for i, case in enumerate(cases):
+        value = int(case['expected_output']) if rng.random() < pass_ratio else -1
+        lines.append(f'debug line for test {i}')
+        lines.append(marker + json.dumps({'i': i, 'status': 'ok', 'value': value, 'stdout': 'debug\n'}))
+    return '\n'.join(lines) + '\n'
+
+
+def build_benchmarks(size_name):
+    """(name, callable) pairs for one input size, with corpora generated up front"""
+    n, side, count, lines = SIZES[size_name]
+    rng = random.Random(1234)  # same corpora on every run
+    flat = int_array(n, rng)
+    nested = nested_array(side, rng)
+    flat_str = py_literal(flat)
+    nested_str = py_literal(nested)
+    two_arrays_str = f"{py_literal(flat)}, {py_literal(int_array(n, rng))}"
+    cases = test_cases(count, min(n, 50), rng)
+    marker = result_frames.new_frame_marker()
+    output = program_output(cases, 0.8, marker, rng)
+    sources = {
+        'python': python_source(lines),
+        'cpp': cpp_source(lines),
+        'java': java_source(lines),
+        'javascript': js_source(lines),
+    }
+    snippets = {
+        'python': app.build_driver_snippet('solve', ['nums'], 'python'),
+        'cpp': app.build_driver_snippet('solve', ['nums'], 'cpp', 'vector<int>'),
+        'java': app.build_driver_snippet('solve', ['nums'], 'java'),
+        'javascript': app.build_driver_snippet('solve', ['nums'], 'javascript'),
+    }
+
+    benchmarks = [
+        ('python_input_literal/flat', lambda: app.python_input_literal(flat_str)),
+        ('cpp_input_literal/flat', lambda: app.cpp_input_literal(flat_str)),
+        ('cpp_input_literal/nested', lambda: app.cpp_input_literal(nested_str, 2)),
+        ('cpp_input_literal/two_arrays', lambda: app.cpp_input_literal(two_arrays_str, 2)),
+        ('cpp_input_literal/list', lambda: app.cpp_input_literal(nested)),
+        ('java_input_literal/flat', lambda: app.java_input_literal(flat_str)),
+        ('java_input_literal/nested', lambda: app.java_input_literal(nested_str)),
+        ('java_batch_input_literal/flat', lambda: app.java_batch_input_literal(flat_str)),
+        ('java_batch_input_literal/list', lambda: app.java_batch_input_literal(flat)),
+        ('js_input_literal/flat', lambda: app.js_input_literal(flat_str)),
+        ('js_input_literal/nested', lambda: app.js_input_literal(nested_str)),
+        ('discover_python_signature', lambda: app.discover_python_signature(sources['python'])),
+        ('discover_cpp_signature', lambda: app.discover_cpp_signature(sources['cpp'])),
+        ('discover_java_signature', lambda: app.discover_java_signature(sources['java'])),
+        ('discover_js_signature', lambda: app.discover_js_signature(sources['javascript'])),
+        ('build_driver_snippet/cpp', lambda: app.build_driver_snippet('solve', ['nums'], 'cpp', 'vector<int>')),
+        ('build_driver_snippet/javascript', lambda: app.build_driver_snippet('solve', ['a', 'b'], 'javascript')),
+        ('parse_frames', lambda: result_frames.parse_frames(output, marker)),
+        ('grade_frames', lambda: result_frames.grade_frames(result_frames.parse_frames(output, marker), cases, 'python')),
+    ]
+    for language, snippet in snippets.items():
+        benchmarks.append((f'generate_batch_driver/{language}',
+                           lambda language=language, snippet=snippet: app.generate_batch_driver(language, snippet, cases, marker)))
+    return benchmarks
+
+
+# ────────────── Measuring ──────────────
+def measure_speed(fn, min_time):
+    """Ops/sec: grow the batch until one batch takes min_time, then take the best of 3 batches"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    best = elapsed
+    for _ in range(2):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return number / best, best / number
+
+
+def measure_allocations(fn, runs=3):
+    """Peak memory allocated while one call runs (tracemalloc, kept apart from the timing)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(runs):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(sizes, pattern, min_time):
+    results = {}
+    for size_name in sizes:
+        for name, fn in build_benchmarks(size_name):
+            if pattern and pattern not in name:
+                continue
+            key = f"{name}[{size_name}]"
+            ops, seconds = measure_speed(fn, min_time)
+            peak = measure_allocations(fn)
+            results[key] = {
+                'ops_per_sec': round(ops, 1),
+                'us_per_op': round(seconds * 1_000_000, 2),
+                'peak_bytes': peak,
+            }
+            print(f"{key:<48}{ops:>14,.1f} ops/s{seconds * 1_000_000:>14,.1f} us{peak / 1024:>12,.1f} KiB peak")
+    return results
+
+
+# ────────────── History ──────────────
+def load_previous(history_path):
+    if not history_path or not os.path.exists(history_path):
+        return None
+    last = None
+    with open(history_path) as f:
+        for line in f:
+            if line.strip():
+                last = line
+    return json.loads(last) if last else None
+
+
+def print_comparison(results, previous):
+    print(f"\nCompared with run {previous.get('git_commit')} ({previous.get('timestamp')}):")
+    for key, stats in results.items():
+        before = previous['results'].get(key)
+        if not before:
+            continue
+        speed = (stats['ops_per_sec'] / before['ops_per_sec'] - 1) * 100 if before['ops_per_sec'] else 0.0
+        memory = (stats['peak_bytes'] / before['peak_bytes'] - 1) * 100 if before['peak_bytes'] else 0.0
+        flag = '  ⚠️' if speed < -10 or memory > 10 else ''
+        print(f"  {key:<46}{speed:>+8.1f}% ops/s{memory:>+8.1f}% peak{flag}")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-benchmark the per-submission CPU path')
+    parser.add_argument('--sizes', default=','.join(SIZES), help=f"comma separated ({', '.join(SIZES)})")
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timing batch')
+    parser.add_argument('--output', help='write this run as JSON')
+    parser.add_argument('--history', help='JSON lines file: compare with its last run, then append this one')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [s.strip() for s in args.sizes.split(',') if s.strip()]
+    unknown = [s for s in sizes if s not in SIZES]
+    if unknown:
+        print(f"❌ Unknown size(s): {', '.join(unknown)}")
+        return 1
+
+    results = run(sizes, args.filter, args.min_time)
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'git_commit': _git_commit(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version()},
+        'results': results,
+    }
+
+    previous = load_previous(args.history)
+    if previous:
+        print_comparison(results, previous)
+    if args.history:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(report) + '\n')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results written to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+BugYou Piston Stand-in
+Local Piston-compatible executor for benchmarks, with configurable latency and job slots
+
+Implements the two endpoints the backend uses (POST /api/v2/piston/execute and
+GET /api/v2/piston/runtimes). Python programs are really executed in a
+subprocess so /api/execute and /api/validate see genuine pass/fail results;
+other languages get an empty, successful run. Every job waits for a slot
+(like Piston's job queue) and then sleeps latency +/- jitter before running.
+
+    python benchmarks/piston_stub.py --port 2000 --latency-ms 150 --jitter-ms 50 --slots 8
+    BUGYOU_PISTON_API=http://127.0.0.1:2000/api/v2/piston python start_server.py
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+API_PREFIX = '/api/v2/piston'
+
+RUNTIMES = [
+    {'language': 'python', 'version': '3.10.0', 'aliases': ['py', 'python3']},
+    {'language': 'javascript', 'version': '18.15.0', 'aliases': ['js', 'node']},
+    {'language': 'java', 'version': '15.0.2', 'aliases': []},
+    {'language': 'c++', 'version': '10.2.0', 'aliases': ['cpp', 'g++']},
+]
+
+
+class PistonStub:
+    """Execution behaviour shared by all request handler threads"""
+
+    def __init__(self, latency_ms=100.0, jitter_ms=0.0, slots=8, run_timeout=5.0, execute_python=True):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.run_timeout = run_timeout
+        self.execute_python = execute_python
+        self._slots = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self.jobs = 0
+
+    def execute(self, payload):
+        queued = time.perf_counter()
+        with self._slots:
+            started = time.perf_counter()
+            delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(delay, 0.0) / 1000)
+            # Like Piston, a request may lower the run time limit (milliseconds)
+            timeout = min(self.run_timeout, payload.get('run_timeout', self.run_timeout * 1000) / 1000)
+            if payload.get('language') == 'python' and self.execute_python:
+                stdout, stderr, code, signal = self._run_python(payload['files'][0]['content'], timeout)
+            else:
+                stdout, stderr, code, signal = '', '', 0, None
+            finished = time.perf_counter()
+        with self._lock:
+            self.jobs += 1
+        return {
+            'language': payload.get('language'),
+            'version': payload.get('version'),
+            'run': {
+                'stdout': stdout,
+                'stderr': stderr,
+                'output': stdout + stderr,
+                'code': code,
+                'signal': signal,
+                # Milliseconds, like Piston; excludes time spent waiting for a slot
+                'wall_time': int((finished - started) * 1000),
+                'queue_time': int((started - queued) * 1000),
+            },
+        }
+
+    def _run_python(self, source, timeout):
+        try:
+            proc = subprocess.run([sys.executable, '-c', source], capture_output=True,
+                                  text=True, timeout=timeout)
+            return proc.stdout, proc.stderr, proc.returncode, None
+        except subprocess.TimeoutExpired as e:
+            stdout = e.stdout.decode('utf-8', 'replace') if isinstance(e.stdout, bytes) else (e.stdout or '')
+            return stdout, '', None, 'SIGKILL'
+
+
+def make_handler(stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == f'{API_PREFIX}/runtimes':
+                self._reply(200, RUNTIMES)
+            else:
+                self._reply(404, {'message': 'Not found'})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                self._reply(400, {'message': 'Invalid JSON'})
+                return
+            if self.path != f'{API_PREFIX}/execute':
+                self._reply(404, {'message': 'Not found'})
+            elif not payload.get('files'):
+                self._reply(400, {'message': 'files is required'})
+            else:
+                self._reply(200, stub.execute(payload))
+
+        def log_message(self, format, *args):
+            pass  # one line per job would dominate the benchmark output
+
+    return Handler
+
+
+def start_stub(host='127.0.0.1', port=0, **options):
+    """Start the stand-in on a background thread; returns (server, base_url)"""
+    stub = PistonStub(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(stub))
+    server.daemon_threads = True
+    server.stub = stub
+    threading.Thread(target=server.serve_forever, name='piston-stub', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{API_PREFIX}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run a local Piston-compatible executor for benchmarks')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=100.0,
+                        help='time each job takes before its program runs')
+    parser.add_argument('--jitter-ms', type=float, default=0.0,
+                        help='uniform +/- variation added to the latency')
+    parser.add_argument('--slots', type=int, default=8,
+                        help='jobs executed at once; the rest queue')
+    parser.add_argument('--no-execute', action='store_true',
+                        help='do not run Python programs, return empty output')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server, url = start_stub(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                             slots=args.slots, execute_python=not args.no_execute)
+    print(f"🧪 Piston stand-in listening on {url} "
+          f"(latency {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms, {args.slots} slots)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Stopped after {server.stub.jobs} jobs")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+-- BugYou schema for benchmark databases
+-- Mirrors the tables and columns backend/database_config.py and backend/app.py query.
+-- Safe to re-run: everything is created only if missing.
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id SERIAL PRIMARY KEY,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    password TEXT,
+    emailaddress VARCHAR(255) UNIQUE,
+    fullname VARCHAR(255),
+    xp INTEGER NOT NULL DEFAULT 0,
+    level INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS user_completed_challenges (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    language VARCHAR(20) NOT NULL,
+    difficulty VARCHAR(20) NOT NULL,
+    challenge_id INTEGER NOT NULL,
+    completed_at TIMESTAMP DEFAULT NOW(),
+    time_taken INTEGER DEFAULT 0,
+    UNIQUE (user_id, language, difficulty, challenge_id)
+);
+
+CREATE OR REPLACE VIEW user_solved_problems AS
+    SELECT u.username, ucc.language, ucc.difficulty, ucc.challenge_id, ucc.completed_at, ucc.time_taken
+    FROM user_completed_challenges ucc
+    JOIN users u ON u.user_id = ucc.user_id;
+
+CREATE TABLE IF NOT EXISTS leaderboard (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER UNIQUE NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    username VARCHAR(50) NOT NULL,
+    total_score INTEGER DEFAULT 0,
+    total_solved INTEGER DEFAULT 0,
+    total_xp INTEGER DEFAULT 0,
+    level INTEGER DEFAULT 1,
+    best_language VARCHAR(20),
+    best_difficulty VARCHAR(20),
+    streak_days INTEGER DEFAULT 0,
+    rank_position INTEGER,
+    last_activity TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- One table per language/difficulty (CHALLENGE_TABLES)
+DO $$
+DECLARE
+    table_name TEXT;
+BEGIN
+    FOREACH table_name IN ARRAY ARRAY[
+        'python_basic', 'python_intermediate', 'python_advanced',
+        'javascript_basic', 'javascript_intermediate', 'javascript_advanced',
+        'java_basic', 'java_intermediate', 'java_advanced',
+        'cpp_basic', 'cpp_intermediate', 'cpp_advanced'
+    ] LOOP
+        EXECUTE format('
+            CREATE TABLE IF NOT EXISTS %I (
+                challenge_id SERIAL PRIMARY KEY,
+                title VARCHAR(255) NOT NULL,
+                problem_statement TEXT,
+                buggy_code TEXT,
+                reference_solution TEXT,
+                solution_explanation TEXT,
+                hint_1 TEXT, hint_2 TEXT, hint_3 TEXT,
+                learning_objectives TEXT,
+                max_score INTEGER DEFAULT 100,
+                test_case_1_input TEXT, test_case_1_expected TEXT,
+                test_case_2_input TEXT, test_case_2_expected TEXT,
+                test_case_3_input TEXT, test_case_3_expected TEXT,
+                test_case_4_input TEXT, test_case_4_expected TEXT,
+                test_case_5_input TEXT, test_case_5_expected TEXT,
+                hidden_test_1_input TEXT, hidden_test_1_expected TEXT,
+                hidden_test_2_input TEXT, hidden_test_2_expected TEXT,
+                test_schema JSONB,
+                canonical_verdicts JSONB,
+                success_rate NUMERIC(5, 2) DEFAULT 0,
+                avg_attempts NUMERIC(6, 2) DEFAULT 0
+            )', table_name);
+        -- Tables created before these columns existed (database_config.py migrate)
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS test_schema JSONB', table_name);
+        EXECUTE format('ALTER TABLE %I ADD COLUMN IF NOT EXISTS canonical_verdicts JSONB', table_name);
+    END LOOP;
+END $$;
+
+-- Level-up trigger (same as database_config.create_xp_trigger)
+CREATE OR REPLACE FUNCTION handle_xp_and_level()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF NEW.xp >= 100 THEN
+    NEW.level := NEW.level + 1;
+    NEW.xp := NEW.xp - 100;
+  END IF;
+  RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS xp_level_trigger ON users;
+CREATE TRIGGER xp_level_trigger
+BEFORE UPDATE ON users
+FOR EACH ROW
+EXECUTE FUNCTION handle_xp_and_level();
@@ -1745,36 +1745,15 @@ async function submitSolution() {
         // Get username from localStorage
         const username = localStorage.getItem('currentUser') || localStorage.getItem('username');
         
-        // Check if we can use cached results for visible tests
-        const canUseCachedResults = (code === lastRunCode && 
-                                   lastRunResults.length > 0 && 
-                                   lastRunAllPassed && 
-                                   testCases.length > 0);
-        
-        let requestData;
-        if (canUseCachedResults) {
-            console.log('🚀 Using cached visible test results for submission');
-            // Only send hidden test cases for validation
-            const hiddenTestCases = currentChallenge.hidden_test_cases || [];
-            requestData = {
-                code: code,
-                language: currentLanguage,
-                challenge_id: currentChallenge.challenge_id,
-                difficulty: currentChallenge.difficulty,
-                username: username,
-                test_cases: hiddenTestCases,  // Only hidden tests
-                use_cached_visible: true  // Flag to indicate we're using cached visible results
-            };
-        } else {
-            console.log('🔄 Running full validation (no cached results available)');
-            requestData = {
-                code: code,
-                language: currentLanguage,
-                challenge_id: currentChallenge.challenge_id,
-                difficulty: currentChallenge.difficulty,
-                username: username
-            };
-        }
+        // The server reuses the visible test results of the last Run of this exact code
+        // and only executes the tests that run did not cover
+        const requestData = {
+            code: code,
+            language: currentLanguage,
+            challenge_id: currentChallenge.challenge_id,
+            difficulty: currentChallenge.difficulty,
+            username: username
+        };
 
         console.log('Submitting solution...', requestData);
 
@@ -1803,15 +1782,7 @@ async function submitSolution() {
             
             // Update test results first
             if (Array.isArray(data.test_results)) {
-                if (canUseCachedResults) {
-                    // Combine cached visible results with new hidden results
-                    const visibleResults = lastRunResults.slice(0, testCases.length);
-                    const hiddenResults = data.test_results;
-                    testResults = [...visibleResults, ...hiddenResults];
-                    console.log(`Combined ${visibleResults.length} cached visible + ${hiddenResults.length} new hidden results`);
-                } else {
-                    testResults = data.test_results;
-                }
+                testResults = data.test_results;
                 console.log("passed");
                 updateTestResults();
             }
@@ -2118,7 +2089,9 @@ async function runTests() {
         const requestData = {
             code: code,
             language: currentLanguage,
-            test_cases: testCases
+            test_cases: testCases,
+            // Lets the server record these results for the submit that follows
+            username: localStorage.getItem('currentUser') || localStorage.getItem('username')
         };
         // Add challenge_id and difficulty if available
         if (currentChallenge && currentChallenge.challenge_id) {
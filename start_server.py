@@ -2,50 +2,159 @@
 """
 BugYou Server Startup Script
 Run this from the project root to start the BugYou platform
+
+Production mode (default) runs the app under gunicorn with several worker
+processes, each serving requests on a small thread pool. The app is imported
+once in the master before forking so workers share its memory copy-on-write.
+
+    python start_server.py                       # production, auto-sized workers
+    python start_server.py --workers 4 --threads 8 --port 5001
+    python start_server.py --dev                 # Flask debug server with reloader
+
+Signals (sent to the master process):
+    TERM / INT  graceful shutdown: stop accepting, drain in-flight requests
+    HUP         graceful reload: start fresh workers, then retire the old ones
+    TTIN / TTOU add / remove one worker
 """
 
 import os
 import sys
+import argparse
+import multiprocessing
 import subprocess
+import tempfile
 
-def start_bugyou():
-    """Start the BugYou platform"""
-    
-    print("🚀 Starting BugYou Debugging Platform...")
-    print("=" * 50)
-    
-    # Change to backend directory
-    backend_dir = os.path.join(os.path.dirname(__file__), 'backend')
-    
-    if not os.path.exists(backend_dir):
-        print("❌ Error: Backend directory not found!")
-        print("Make sure you're running this from the project root.")
-        return False
-    
-    # Check if requirements are installed
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def parse_args(argv=None):
+    """Command line options (each one can also be set through a BUGYOU_* environment variable)"""
+    default_workers = multiprocessing.cpu_count() * 2 + 1
+    parser = argparse.ArgumentParser(description='Start the BugYou debugging platform')
+    parser.add_argument('--dev', action='store_true',
+                        default=os.environ.get('BUGYOU_DEV') == '1',
+                        help='run the single-process Flask development server (reloader + debugger)')
+    parser.add_argument('--host', default=os.environ.get('BUGYOU_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=_env_int('BUGYOU_PORT', 5000))
+    parser.add_argument('--workers', type=int, default=_env_int('BUGYOU_WORKERS', default_workers),
+                        help=f'worker processes (default: 2 x CPUs + 1 = {default_workers})')
+    parser.add_argument('--threads', type=int, default=_env_int('BUGYOU_THREADS', 4),
+                        help='request threads per worker; most time is spent waiting on Piston/Postgres')
+    parser.add_argument('--timeout', type=int, default=_env_int('BUGYOU_TIMEOUT', 60),
+                        help='seconds before a silent worker is killed and replaced')
+    parser.add_argument('--graceful-timeout', type=int, default=_env_int('BUGYOU_GRACEFUL_TIMEOUT', 30),
+                        help='seconds in-flight requests get to finish on TERM/HUP')
+    parser.add_argument('--max-requests', type=int, default=_env_int('BUGYOU_MAX_REQUESTS', 0),
+                        help='recycle a worker after this many requests (0 = never)')
+    return parser.parse_args(argv)
+
+
+def check_dependencies(production):
+    """Make sure the packages the chosen mode needs are importable"""
     try:
         import flask
         import psycopg2
         import requests
+        if production:
+            import gunicorn
         print("✅ Dependencies found")
+        return True
     except ImportError as e:
         print(f"❌ Missing dependency: {e}")
         print("💡 Run: pip install -r backend/requirements.txt")
+        if production:
+            print("💡 Or start the development server with: python start_server.py --dev")
         return False
-    
-    # Change to backend directory and run the server
-    os.chdir(backend_dir)
-    
-    print(f"📁 Changed to backend directory: {backend_dir}")
-    print("🔌 Starting Flask server...")
-    print("📍 Frontend will be available at: http://localhost:5000")
-    print("🔗 API Health check: http://localhost:5000/api/health")
-    print("\nPress Ctrl+C to stop the server")
-    print("=" * 50)
-    
+
+
+def gunicorn_options(args):
+    """Translate our options into gunicorn settings"""
+    return {
+        'bind': f'{args.host}:{args.port}',
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10 if args.max_requests else 0,
+        # Import app.py and warm its static manifest once in the master, share both copy-on-write
+        'preload_app': True,
+        'accesslog': '-',
+        'errorlog': '-',
+        'when_ready': _when_ready,
+        'pre_fork': _pre_fork,
+        'post_fork': _post_fork,
+        'worker_exit': _worker_exit,
+    }
+
+
+def _when_ready(server):
+    print(f"🚀 BugYou master ready (pid {os.getpid()}), spawning workers...")
+
+
+def _pre_fork(server, worker):
+    # Never let a worker inherit the master's database sockets
+    from database_config import close_connection_pool
+    close_connection_pool()
+
+
+def _post_fork(server, worker):
+    print(f"👷 Worker {worker.pid} started")
+
+
+def _worker_exit(server, worker):
+    from database_config import close_connection_pool
+    close_connection_pool()
+    print(f"👋 Worker {worker.pid} drained and exited")
+
+
+def run_production(args):
+    """Run the app under gunicorn with preloaded, forked workers"""
+    from gunicorn.app.base import BaseApplication
+
+    class BugYouApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app import warm_up
+            from wsgi import app
+            warm_up()
+            return app
+
+    # The app sizes per-thread limits (e.g. logins waiting on bcrypt) from the request threads
+    os.environ['BUGYOU_THREADS'] = str(args.threads)
+    # Workers share metrics through snapshot files so /metrics covers the whole server
+    metrics_dir = os.environ.setdefault('BUGYOU_METRICS_DIR', tempfile.mkdtemp(prefix='bugyou-metrics-'))
+    os.makedirs(metrics_dir, exist_ok=True)
+    for filename in os.listdir(metrics_dir):
+        if filename.startswith('metrics-'):
+            os.remove(os.path.join(metrics_dir, filename))
+
+    print(f"🔌 Starting production server: {args.workers} workers x {args.threads} threads")
+    BugYouApplication(gunicorn_options(args)).run()
+    return True
+
+
+def run_development(args):
+    """Run Flask's single-process debug server (reloader + debugger)"""
+    print("🔌 Starting Flask development server...")
     try:
         # Run the Flask app
-        subprocess.run([sys.executable, 'app.py'], check=True)
+        env = dict(os.environ, BUGYOU_HOST=args.host, BUGYOU_PORT=str(args.port))
+        subprocess.run([sys.executable, 'app.py'], check=True, env=env)
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
     except subprocess.CalledProcessError as e:
@@ -54,8 +163,38 @@ def start_bugyou():
     except FileNotFoundError:
         print("❌ Error: app.py not found in backend directory!")
         return False
-    
     return True
 
+
+def start_bugyou(argv=None):
+    """Start the BugYou platform"""
+    args = parse_args(argv)
+
+    print("🚀 Starting BugYou Debugging Platform...")
+    print("=" * 50)
+
+    if not os.path.exists(BACKEND_DIR):
+        print("❌ Error: Backend directory not found!")
+        print("Make sure you're running this from the project root.")
+        return False
+
+    if not check_dependencies(production=not args.dev):
+        return False
+
+    # Change to backend directory and run the server
+    os.chdir(BACKEND_DIR)
+    sys.path.insert(0, BACKEND_DIR)
+
+    print(f"📁 Changed to backend directory: {BACKEND_DIR}")
+    print(f"📍 Frontend will be available at: http://localhost:{args.port}")
+    print(f"🔗 API Health check: http://localhost:{args.port}/api/health")
+    print("\nPress Ctrl+C to stop the server")
+    print("=" * 50)
+
+    if args.dev:
+        return run_development(args)
+    return run_production(args)
+
+
 if __name__ == "__main__":
-    start_bugyou() 
\ No newline at end of file
+    sys.exit(0 if start_bugyou() else 1)